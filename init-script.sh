@@ -14,6 +14,35 @@ until check_chroma; do
 done
 echo "¡ChromaDB está listo!"
 
+# Servidor de embeddings compartido (EMBEDDING_BACKEND=server)
+if [ "${EMBEDDING_BACKEND:-local}" = "server" ]; then
+    EMBEDDING_SOCKET_PATH=${EMBEDDING_SOCKET_PATH:-/tmp/rick_morty_embeddings.sock}
+    EMBEDDING_SERVER_START_TIMEOUT=${EMBEDDING_SERVER_START_TIMEOUT:-120}
+    echo "Iniciando servidor de embeddings en $EMBEDDING_SOCKET_PATH..."
+    # Un socket de una ejecución anterior no indica que el servidor esté listo
+    rm -f "$EMBEDDING_SOCKET_PATH"
+    python -m src.embedding_server --socket "$EMBEDDING_SOCKET_PATH" &
+    EMBEDDING_SERVER_PID=$!
+    WAITED=0
+    until [ -S "$EMBEDDING_SOCKET_PATH" ]; do
+        if ! kill -0 "$EMBEDDING_SERVER_PID" 2>/dev/null; then
+            echo "El servidor de embeddings terminó antes de estar listo"
+            exit 1
+        fi
+        if [ "$WAITED" -ge "$EMBEDDING_SERVER_START_TIMEOUT" ]; then
+            echo "El servidor de embeddings no respondió en ${EMBEDDING_SERVER_START_TIMEOUT} segundos"
+            kill "$EMBEDDING_SERVER_PID" 2>/dev/null || true
+            exit 1
+        fi
+        WAITED=$((WAITED + 1))
+        sleep 1
+    done
+    echo "¡Servidor de embeddings listo!"
+fi
+
+# Migrar la colección única a colecciones por tipo y eliminarla (no hace nada si no existe)
+python -m src.migrate_collections
+
 # Verificar si la base de datos ya está inicializada
 echo "Verificando estado de la base de datos..."
 python << END
@@ -38,7 +67,12 @@ END
 DB_COUNT=$(cat /tmp/db_count)
 
 # Inicializar la base de datos si está vacía
-if [ "$DB_COUNT" -eq "0" ]; then
+SNAPSHOT_PATH=${INDEX_SNAPSHOT_PATH:-rick_morty_index.snapshot}
+if [ "$DB_COUNT" -eq "0" ] && [ -f "$SNAPSHOT_PATH" ]; then
+    echo "Importando snapshot del índice $SNAPSHOT_PATH..."
+    python -m src.snapshot import "$SNAPSHOT_PATH"
+    echo "¡Base de datos restaurada desde el snapshot!"
+elif [ "$DB_COUNT" -eq "0" ]; then
     echo "Inicializando base de datos..."
     python -m src.init_db
     echo "¡Base de datos inicializada correctamente!"
@@ -46,6 +80,14 @@ else
     echo "La base de datos ya está inicializada con $DB_COUNT documentos."
 fi
 
+# Precalcular respuestas frecuentes antes de recibir tráfico. Las respuestas ya
+# calculadas para el índice servido se conservan, así que solo el primer arranque
+# (o el primero tras un cambio de índice) espera a todas
+if [ "${WARM_CACHE:-true}" = "true" ]; then
+    echo "Precalculando respuestas frecuentes..."
+    python -m src.warm_cache || echo "No se pudieron precalcular las respuestas; la API arranca sin ellas"
+fi
+
 # Iniciar la aplicación
 echo "Iniciando aplicación FastAPI..."
 exec uvicorn src.api.main:app --host 0.0.0.0 --port 8000 --proxy-headers
\ No newline at end of file
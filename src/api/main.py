@@ -1,7 +1,15 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
 from starlette.middleware.cors import CORSMiddleware 
+from typing import Optional
+import asyncio
+import os
+import secrets
 from .models import Query, Response
 from ..modules.rag_engine import RAGEngine
+from ..utils.profiling import RequestProfiler
+from ..config.settings import get_settings
+
+settings = get_settings()
 
 """
 FastAPI application for Rick & Morty RAG (Retrieval-Augmented Generation) system.
@@ -11,6 +19,14 @@ This module provides endpoints for question answering using RAG architecture.
 app = FastAPI(title="Rick & Morty RAG API")
 # Inicializar RAG Engine
 rag_engine = None
+profiler = RequestProfiler(
+    settings.PROFILING_DIR,
+    max_files=settings.PROFILING_MAX_FILES,
+    sample_rate=settings.PROFILING_SAMPLE_RATE,
+    mode=settings.PROFILING_MODE,
+    interval=settings.PROFILING_INTERVAL,
+    enabled=settings.PROFILING_ENABLED
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,6 +37,22 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    """
+    Profiles /qa requests on demand (Settings.PROFILING_HEADER) or by sampling
+    (Settings.PROFILING_SAMPLE_RATE). The profile covers retrieval, generation and
+    response serialization; its file name is returned in the X-Profile-File header.
+    """
+    if request.url.path != "/qa" or not profiler.should_profile(request.headers.get(settings.PROFILING_HEADER)):
+        return await call_next(request)
+
+    with profiler.profile("qa") as session:
+        response = await call_next(request)
+    if session.path:
+        response.headers["X-Profile-File"] = os.path.basename(session.path)
+    return response
+
 @app.on_event("startup")
 async def startup_event():
     """
@@ -52,7 +84,7 @@ async def question_answering(query: Query):
     @raises HTTPException: If there's an error processing the query
     """
     try:
-        result = await rag_engine.process_query(query.question)
+        result = await rag_engine.process_query(query.question, query.conversation_id)
         return Response(**result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -69,5 +101,81 @@ async def get_status():
     docs = rag_engine.retriever.get_all_documents()
     return {
         "total_documents": rag_engine.retriever.count_documents(),
-        "sample_docs": docs['documents'][:5] if docs else None
-    }    
\ No newline at end of file
+        "sample_docs": docs['documents'][:5] if docs else None,
+        "retrieval_cache": rag_engine.retriever.cache_stats(),
+        # Consulta al servidor de embeddings por socket: fuera del event loop
+        "embedding_service": await asyncio.to_thread(rag_engine.retriever.embedding_stats),
+        "generation": rag_engine.generator.generation_stats()
+    }    
+
+
+def require_admin(x_admin_key: Optional[str] = Header(None)):
+    """
+    Guards the admin endpoints with Settings.ADMIN_API_KEY.
+    
+    @raises HTTPException: 403 if the admin API is disabled, 401 if the key is wrong
+    """
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="API de administración deshabilitada (ADMIN_API_KEY)")
+    if not secrets.compare_digest(x_admin_key or "", settings.ADMIN_API_KEY):
+        raise HTTPException(status_code=401, detail="Clave de administración inválida")
+
+@app.post("/admin/reindex", status_code=202, dependencies=[Depends(require_admin)])
+async def start_reindex():
+    """
+    Starts a zero-downtime reindex in the background: a new versioned collection
+    set is built, validated and then served through the collection alias.
+    
+    @return: Job state; poll GET /admin/reindex/{job_id} for progress
+    @rtype: dict
+    @raises HTTPException: 409 if a reindex is already running (in any worker)
+    """
+    try:
+        job = await rag_engine.reindexer.start()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return job.to_dict()
+
+@app.get("/admin/reindex/{job_id}", dependencies=[Depends(require_admin)])
+async def get_reindex(job_id: str):
+    """
+    Reports the progress of a reindex job.
+    
+    @param job_id: Job identifier returned by POST /admin/reindex
+    @return: Job state
+    @rtype: dict
+    @raises HTTPException: 404 if the job does not exist
+    """
+    job = rag_engine.reindexer.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Reindexado no encontrado")
+    return job.to_dict()
+
+@app.get("/admin/collections", dependencies=[Depends(require_admin)])
+async def get_collections():
+    """
+    Lists the collection sets in the store and the alias state.
+    
+    @return: Alias state and collection sets with their counts
+    @rtype: dict
+    """
+    # Lee archivos y cuenta documentos en Chroma: fuera del event loop
+    return {
+        "alias": await asyncio.to_thread(rag_engine.retriever.alias.state),
+        "versions": await asyncio.to_thread(rag_engine.reindexer.versions)
+    }
+
+@app.post("/admin/rollback", dependencies=[Depends(require_admin)])
+async def rollback_collections():
+    """
+    Serves the previous collection set again.
+    
+    @return: New alias state
+    @rtype: dict
+    @raises HTTPException: 409 if a reindex is running (in any worker) or there is no previous version
+    """
+    try:
+        # Abre colecciones y carga backends: fuera del event loop
+        return await asyncio.to_thread(rag_engine.reindexer.rollback)
+    except (RuntimeError, ValueError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
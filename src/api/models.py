@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from typing import List, Optional
 import json
+import os
 from datetime import datetime
 
 class Query(BaseModel):
@@ -9,8 +10,11 @@ class Query(BaseModel):
     
     @param question: The question text
     @type question: str
+    @param conversation_id: Optional identifier of an ongoing conversation
+    @type conversation_id: str
     """
     question: str
+    conversation_id: Optional[str] = None
 
 class Source(BaseModel):
     """
@@ -33,43 +37,86 @@ class Response(BaseModel):
     @param confidence: Confidence score of the answer
     @param sources: List of sources used to generate the answer
     @param context_used: Optional context information used for generation
+    @param conversation_id: Identifier of the conversation the answer belongs to
+    @param model: Model that generated the answer ("cache" for cached answers, None if no model was called)
     """
     answer: str
     confidence: float
     sources: List[Source]
     context_used: Optional[str] = None
+    conversation_id: Optional[str] = None
+    model: Optional[str] = None
 
 
 
 class ConversationManager:
+    """
+    Persists conversation messages and their rolling summaries.
+
+    Summaries are stored in a sibling file (``<name>_summaries.json``) so the
+    message log keeps its original format.
+    """
     def __init__(self, file_path='conversations.json'):
         self.file_path = file_path
-        self.conversations = self._load_conversations()
+        root, ext = os.path.splitext(file_path)
+        self.summary_path = f"{root}_summaries{ext or '.json'}"
+        self.conversations = self._load_json(self.file_path)
+        self.summaries = self._load_json(self.summary_path)
 
-    def _load_conversations(self):
+    def _load_json(self, path):
         try:
-            with open(self.file_path, 'r') as f:
+            with open(path, 'r') as f:
                 return json.load(f)
-        except FileNotFoundError:
+        except (FileNotFoundError, json.JSONDecodeError):
             return {}
 
     def _save_conversations(self):
         with open(self.file_path, 'w') as f:
             json.dump(self.conversations, f, indent=2)
 
-    def add_message(self, conversation_id, role, content):
+    def _save_summaries(self):
+        with open(self.summary_path, 'w') as f:
+            json.dump(self.summaries, f, indent=2)
+
+    def add_message(self, conversation_id, role, content, model=None):
         if conversation_id not in self.conversations:
             self.conversations[conversation_id] = []
         
-        self.conversations[conversation_id].append({
+        message = {
             'role': role,
             'content': content,
             'timestamp': datetime.now().isoformat()
-        })
+        }
+        if model:
+            message['model'] = model
+        self.conversations[conversation_id].append(message)
         self._save_conversations()
 
     def get_conversation(self, conversation_id):
         return self.conversations.get(conversation_id, [])
 
     def get_all_conversations(self):
-        return self.conversations
\ No newline at end of file
+        return self.conversations
+
+    def get_summary(self, conversation_id):
+        """
+        Returns the rolling summary of a conversation.
+
+        @return: Dictionary with the summary 'text' and the number of messages it 'covers'
+        @rtype: Dict
+        """
+        return self.summaries.get(conversation_id, {'text': '', 'covers': 0})
+
+    def set_summary(self, conversation_id, text, covers):
+        """
+        Stores the rolling summary of a conversation.
+
+        @param text: Summary text
+        @param covers: Number of leading messages already folded into the summary
+        """
+        self.summaries[conversation_id] = {
+            'text': text,
+            'covers': covers,
+            'timestamp': datetime.now().isoformat()
+        }
+        self._save_summaries()
\ No newline at end of file
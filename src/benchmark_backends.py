@@ -0,0 +1,103 @@
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import numpy as np
+from chromadb.api.client import SharedSystemClient
+from src.modules.retrieval_cache import normalize_query
+from src.modules.retriever import DOCUMENT_TYPES, Retriever
+from src.modules.search_backends import create_backend
+
+
+def _synthetic_corpus(size: int, dim: int, rng: np.random.Generator):
+    vectors = rng.standard_normal((size, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"doc_{i}" for i in range(size)]
+    documents = [f"Documento sintético {i}" for i in range(size)]
+    metadatas = [{"type": DOCUMENT_TYPES[i % len(DOCUMENT_TYPES)], "season": f"S{i % 5 + 1:02d}"} for i in range(size)]
+    return ids, documents, metadatas, vectors
+
+
+def _use_backend(retriever: Retriever, name: str, dtype: str):
+    """
+    Serves the retriever's per-type collections through another search backend.
+    """
+    backends = {
+        doc_type: create_backend(name, collection, dtype, retriever.spaces[doc_type])
+        for doc_type, collection in retriever.collections.items()
+    }
+    for backend in backends.values():
+        if hasattr(backend, "load"):
+            backend.load()
+    retriever.backends = backends
+    retriever.search_cache.clear()
+
+
+def _time_searches(retriever: Retriever, queries: np.ndarray) -> list:
+    """
+    Times Retriever.search: the same per-type sub-queries issued for a question.
+    Query embeddings are precomputed, so only the search is measured.
+    """
+    latencies = []
+    for i, query in enumerate(queries):
+        text = f"pregunta sintética {i}"
+        retriever.embedding_cache.put(normalize_query(text), [query.tolist()])
+        started = time.perf_counter()
+        retriever.search(text)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def run_benchmark(sizes: list, dim: int, n_queries: int, dtype: str):
+    rng = np.random.default_rng(42)
+    cwd = os.getcwd()
+    print(f"{'docs':>8} | {'chroma p50 ms':>13} | {'numpy p50 ms':>12} | {'chroma build s':>14} | ganador")
+    crossover = None
+
+    for size in sizes:
+        ids, documents, metadatas, vectors = _synthetic_corpus(size, dim, rng)
+        queries = rng.standard_normal((n_queries, dim)).astype(np.float32)
+
+        # Un Retriever propio en un directorio temporal: colecciones por tipo, como en producción
+        workdir = tempfile.mkdtemp(prefix="benchmark_backends_")
+        os.chdir(workdir)
+        try:
+            retriever = Retriever()
+            started = time.perf_counter()
+            for start in range(0, size, 5000):
+                end = start + 5000
+                retriever.upsert(ids=ids[start:end], embeddings=vectors[start:end].tolist(),
+                                 documents=documents[start:end], metadatas=metadatas[start:end])
+            build_time = time.perf_counter() - started
+
+            _use_backend(retriever, "chroma", dtype)
+            chroma_p50 = statistics.median(_time_searches(retriever, queries))
+            _use_backend(retriever, "numpy", dtype)
+            numpy_p50 = statistics.median(_time_searches(retriever, queries))
+            retriever.executor.shutdown()
+        finally:
+            os.chdir(cwd)
+            SharedSystemClient.clear_system_cache()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        winner = "numpy" if numpy_p50 <= chroma_p50 else "chroma"
+        if winner == "chroma" and crossover is None:
+            crossover = size
+        print(f"{size:>8} | {chroma_p50:>13.2f} | {numpy_p50:>12.2f} | {build_time:>14.2f} | {winner}")
+
+    if crossover:
+        print(f"\nChroma empieza a ganar a partir de ~{crossover} documentos")
+    else:
+        print("\nNumPy fue más rápido en todos los tamaños probados")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara la latencia de búsqueda de Chroma y del backend NumPy")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000, 50000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    args = parser.parse_args()
+    run_benchmark(args.sizes, args.dim, args.queries, args.dtype)
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
+from typing import Dict, Union
 #- Agregar configuración para API Rick and Morty
 #- Ajustar configuraciones para Docker
 class Settings(BaseSettings):
@@ -10,11 +11,144 @@ class Settings(BaseSettings):
     @param COHERE_API_KEY: API key for Cohere
     @param ENVIRONMENT: Current environment (default: "development")
     @param MODEL_NAME: Name of the Cohere model to use
+    @param FALLBACK_MODEL_NAME: Faster Cohere model used for hedged requests (empty disables hedging)
+    @param GENERATION_HEDGE_DELAY: Seconds to wait for MODEL_NAME before hedging with the fallback model
+    @param GENERATION_TIMEOUT: Total latency budget of a generation in seconds
+    @param HISTORY_RECENT_MESSAGES: Number of most recent messages included verbatim in the prompt
+    @param HISTORY_MESSAGE_MAX_CHARS: Maximum characters kept per recent message in the prompt
+    @param HISTORY_UNSUMMARIZED_MAX_MESSAGES: Maximum older messages not yet folded into the summary (it is updated in the background) included besides the recent ones
+    @param HISTORY_SUMMARY_MAX_CHARS: Maximum characters of the rolling conversation summary
+    @param HISTORY_SUMMARY_MAX_TOKENS: Token limit for each incremental summary update
+    @param EMBEDDING_MODEL_ID: Identifier of the embedding model, recorded in index snapshots
+    @param EMBEDDING_BACKEND: Where embeddings are computed: "local" (model loaded in-process) or "server" (shared embedding server)
+    @param EMBEDDING_SOCKET_PATH: Unix socket of the shared embedding server
+    @param EMBEDDING_BATCH_MAX_SIZE: Maximum texts merged into one batched inference by the embedding server
+    @param EMBEDDING_BATCH_MAX_WAIT_MS: Milliseconds the embedding server waits for more requests before running a batch
+    @param EMBEDDING_SERVER_TIMEOUT: Seconds a client waits for the embedding server
+    @param INDEX_SNAPSHOT_PATH: Default index snapshot file for export/import
+    @param COLLECTION_NAME: Base name of the per-type collections (and of the legacy single collection); also the alias resolved to the versioned set being served
+    @param COLLECTION_ALIAS_PATH: File mapping COLLECTION_NAME to the active and previous collection sets
+    @param HNSW_SPACE: Distance space of every collection ("l2", "cosine" or "ip"), applied when a collection is created; existing collections keep theirs until a reindex
+    @param COLLECTION_HNSW: HNSW parameters (M, construction_ef, search_ef) per document type, applied when a collection is created
+    @param SEARCH_RESULTS: Results retrieved per document type for a question
+    @param SEARCH_BACKEND: Vector search backend used by the Retriever ("chroma" or "numpy")
+    @param SEARCH_BACKEND_DTYPE: Embedding storage type of the NumPy backend ("float32" or "float16")
+    @param RETRIEVAL_MAX_WORKERS: Threads used to run retrieval sub-queries off the event loop
+    @param RETRIEVAL_QUERY_TIMEOUT: Seconds before a retrieval sub-query is abandoned
+    @param RETRIEVAL_MAX_PENDING: Retrieval jobs admitted to the thread pool at once, counting abandoned ones still running; beyond it sub-queries are rejected
+    @param COLLECTION_VERSION_PATH: File holding the collection generation counters
+    @param EMBEDDING_CACHE_SIZE: Query embeddings kept in the LRU cache
+    @param SEARCH_CACHE_SIZE: Search results kept in the LRU cache
+    @param SEARCH_CACHE_TTL: Seconds a cached search result stays valid (0: until evicted or the collection changes)
+    @param CONFIDENCE_MIN_SIMILARITY: Cosine similarity (not a distance, whatever HNSW_SPACE is) mapped to confidence 0; hand-picked for the default embedding model
+    @param CONFIDENCE_MAX_SIMILARITY: Cosine similarity mapped to confidence 1; hand-picked for the default embedding model
+    @param CONFIDENCE_THRESHOLD: Below this confidence the canned "classified" reply is returned without calling the LLM
+    @param RELATIONS_PATH: Character–episode relation graph persisted next to the vector store
+        (versioned collection sets use relations_<set>.npz in the same directory)
+    @param RELATION_N_RESULTS: Retrieved documents per type when the relation graph answers the question
+    @param INGEST_BATCH_SIZE: Documents processed per batch during ingestion
+    @param TRANSCRIPT_CHUNK_CHARS: Maximum characters per transcript document
+    @param TRANSCRIPT_CHUNK_OVERLAP: Characters shared by consecutive transcript documents
+    @param REINDEX_BATCH_SIZE: Documents embedded per batch by a background reindex (with EMBEDDING_BACKEND="server", at most half of EMBEDDING_BATCH_MAX_SIZE)
+    @param REINDEX_BATCH_PAUSE: Seconds a background reindex yields between batches
+    @param REINDEX_MIN_COUNT_RATIO: Minimum size of a new version relative to the served one to switch to it
+    @param REINDEX_LOCK_PATH: Lock file that lets a single process (API worker) reindex or roll back at a time
+    @param ADMIN_API_KEY: Key required in the X-Admin-Key header by the admin endpoints (empty disables them)
+    @param DEBUG_PRINTS: Whether the verbose debug traces (prompts, answers, batch contents) are printed
+    @param PROFILING_ENABLED: Master switch of the /qa request profiler
+    @param PROFILING_HEADER: Request header that asks for a profile of that request (e.g. "X-Profile: 1")
+    @param PROFILING_SAMPLE_RATE: Fraction of /qa requests profiled without being asked to
+    @param PROFILING_MODE: "sample" (collapsed stacks for flamegraphs) or "cprofile" (pstats)
+    @param PROFILING_INTERVAL: Seconds between stack samples in "sample" mode
+    @param PROFILING_DIR: Directory the profiles are written to
+    @param PROFILING_MAX_FILES: Maximum number of profiles kept; the oldest are deleted
+    @param RESPONSE_CACHE_PATH: File with precomputed answers and the index they were built from, loaded at startup and reloaded when it changes
+    @param WARM_CACHE: Whether frequent answers are precomputed before the API starts (init-script.sh) and after each reindex
+    @param WARM_CACHE_REQUESTS_PER_MINUTE: Rate limit of the cache warming job
+    @param WARM_CACHE_MIN_FREQUENCY: Minimum times a logged question must appear to be precomputed
+    @param WARM_CACHE_MAX_MINED: Maximum number of questions mined from conversation logs
     """
     COHERE_API_KEY: str
     ENVIRONMENT: str = "development"
     MODEL_NAME: str = "command-r-plus-04-2024"
 
+    # Generación con presupuesto de latencia
+    FALLBACK_MODEL_NAME: str = "command-r7b-12-2024"
+    GENERATION_HEDGE_DELAY: float = 3.0
+    GENERATION_TIMEOUT: float = 15.0
+
+    # Historial de conversación (presupuesto fijo por prompt)
+    HISTORY_RECENT_MESSAGES: int = 4
+    HISTORY_MESSAGE_MAX_CHARS: int = 300
+    HISTORY_UNSUMMARIZED_MAX_MESSAGES: int = 4
+    HISTORY_SUMMARY_MAX_CHARS: int = 600
+    HISTORY_SUMMARY_MAX_TOKENS: int = 150
+
+    # Búsqueda vectorial
+    COLLECTION_NAME: str = "rick_morty"
+    COLLECTION_ALIAS_PATH: str = "chroma_db/collection_alias.json"
+    HNSW_SPACE: str = "l2"
+    COLLECTION_HNSW: Dict[str, Dict[str, Union[int, float, str]]] = {
+        "episode": {"hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 50},
+        "character": {"hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 50},
+        "transcript": {"hnsw:M": 32, "hnsw:construction_ef": 200, "hnsw:search_ef": 100},
+    }
+    SEARCH_RESULTS: Dict[str, int] = {"episode": 5, "character": 3, "transcript": 5}
+    SEARCH_BACKEND: str = "chroma"
+    SEARCH_BACKEND_DTYPE: str = "float32"
+    RETRIEVAL_MAX_WORKERS: int = 8
+    RETRIEVAL_QUERY_TIMEOUT: float = 2.0
+    RETRIEVAL_MAX_PENDING: int = 16
+    COLLECTION_VERSION_PATH: str = "chroma_db/collection_version.json"
+    EMBEDDING_CACHE_SIZE: int = 4096
+    SEARCH_CACHE_SIZE: int = 1024
+    SEARCH_CACHE_TTL: float = 0.0
+
+    # Confianza basada en distancias
+    CONFIDENCE_MIN_SIMILARITY: float = 0.15
+    CONFIDENCE_MAX_SIMILARITY: float = 0.65
+    CONFIDENCE_THRESHOLD: float = 0.1
+
+    # Grafo de relaciones personaje-episodio
+    RELATIONS_PATH: str = "chroma_db/relations.npz"
+    RELATION_N_RESULTS: int = 2
+
+    # Ingesta
+    EMBEDDING_MODEL_ID: str = "all-MiniLM-L6-v2"
+    EMBEDDING_BACKEND: str = "local"
+    EMBEDDING_SOCKET_PATH: str = "/tmp/rick_morty_embeddings.sock"
+    EMBEDDING_BATCH_MAX_SIZE: int = 64
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0
+    EMBEDDING_SERVER_TIMEOUT: float = 10.0
+    INDEX_SNAPSHOT_PATH: str = "rick_morty_index.snapshot"
+    INGEST_BATCH_SIZE: int = 500
+    TRANSCRIPT_CHUNK_CHARS: int = 1500
+    TRANSCRIPT_CHUNK_OVERLAP: int = 200
+
+    # Reindexado sin caída (colecciones blue/green)
+    REINDEX_BATCH_SIZE: int = 100
+    REINDEX_BATCH_PAUSE: float = 0.05
+    REINDEX_MIN_COUNT_RATIO: float = 0.9
+    REINDEX_LOCK_PATH: str = "chroma_db/reindex.lock"
+    ADMIN_API_KEY: str = ""
+
+    # Diagnóstico: trazas de depuración y profiling de /qa
+    DEBUG_PRINTS: bool = True
+    PROFILING_ENABLED: bool = False
+    PROFILING_HEADER: str = "X-Profile"
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_MODE: str = "sample"
+    PROFILING_INTERVAL: float = 0.001
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MAX_FILES: int = 50
+
+    # Cache de respuestas precalculadas
+    RESPONSE_CACHE_PATH: str = "response_cache.json"
+    WARM_CACHE: bool = True
+    WARM_CACHE_REQUESTS_PER_MINUTE: int = 20
+    WARM_CACHE_MIN_FREQUENCY: int = 2
+    WARM_CACHE_MAX_MINED: int = 200
+
     model_config = SettingsConfigDict(
         env_file='.env',
         env_file_encoding='utf-8',
@@ -0,0 +1,30 @@
+import argparse
+import asyncio
+from chromadb.utils import embedding_functions
+from src.config.settings import get_settings
+from src.modules.embedding_service import EmbeddingServer
+
+settings = get_settings()
+
+
+async def serve(socket_path: str, max_batch_size: int, max_wait_ms: float):
+    # El modelo se carga una sola vez para todos los procesos del host
+    server = EmbeddingServer(
+        embedding_functions.DefaultEmbeddingFunction(),
+        socket_path,
+        max_batch_size=max_batch_size,
+        max_wait=max_wait_ms / 1000
+    )
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor de embeddings compartido con micro-batching")
+    parser.add_argument("--socket", default=settings.EMBEDDING_SOCKET_PATH)
+    parser.add_argument("--max-batch-size", type=int, default=settings.EMBEDDING_BATCH_MAX_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=settings.EMBEDDING_BATCH_MAX_WAIT_MS)
+    args = parser.parse_args()
+    asyncio.run(serve(args.socket, args.max_batch_size, args.max_wait_ms))
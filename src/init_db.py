@@ -2,6 +2,10 @@ import asyncio
 from src.modules.rick_morty_api import RickMortyAPI
 from src.modules.retriever import Retriever
 from src.modules.data_loader import DataLoader
+from src.modules.relation_graph import RelationGraph
+from src.config.settings import get_settings
+
+settings = get_settings()
 
 async def init_database():
     print("Iniciando carga de datos...")
@@ -11,24 +15,34 @@ async def init_database():
     retriever = Retriever()
     data_loader = DataLoader()
     
-    # Obtener datos de la API
-    print("Obteniendo datos de la API...")
-    data = await api.fetch_all_data()
-    print(f"Datos obtenidos: {len(data['characters'])} personajes, {len(data['episodes'])} episodios")
+    # Obtener datos: archivos locales (leídos en streaming) si existen, si no la API
+    if data_loader.has_local_data():
+        print(f"Leyendo datos locales de {data_loader.data_dir}...")
+        data = data_loader.stream_all()
+    else:
+        print("Obteniendo datos de la API...")
+        data = await api.fetch_all_data()
+        print(f"Datos obtenidos: {len(data['characters'])} personajes, {len(data['episodes'])} episodios")
 
-    # Cargar transcripciones
-    print("Cargando transcripciones...")
-    transcriptions = data_loader.load_transcripts()
-    print(f"Transcripciones cargadas: {len(transcriptions)}")
+    # Grafo de relaciones personaje-episodio
+    print("Construyendo grafo de relaciones...")
+    relations_path = retriever.relations_path_for()
+    RelationGraph.from_api_data(data).save(relations_path)
+    print(f"Grafo guardado en {relations_path}")
 
-    # Procesar datos para embedding
-    print("Procesando datos...")
-    documents = api.process_data_for_embedding(data, transcriptions)
-    print(f"Documentos preparados: {len(documents)}")
+    # Indexar transcripciones (se leen bajo demanda, no quedan en memoria)
+    print("Indexando transcripciones...")
+    transcriptions = data_loader.transcript_index()
+    print(f"Transcripciones disponibles: {len(transcriptions)}")
 
-    # Cargar en ChromaDB
-    print("Cargando datos en ChromaDB...")
-    retriever.add_documents(documents)
+    # Procesar y cargar en ChromaDB por lotes para acotar el uso de memoria
+    print("Procesando y cargando datos en ChromaDB...")
+    documents = api.iter_documents_for_embedding(data, transcriptions)
+    total = 0
+    for batch in data_loader.iter_batches(documents, settings.INGEST_BATCH_SIZE):
+        retriever.add_documents(batch)
+        total += len(batch)
+    print(f"Documentos procesados: {total}")
     
     print("Verificando carga...")
     count = retriever.count_documents()
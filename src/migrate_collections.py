@@ -0,0 +1,71 @@
+import argparse
+from collections import Counter
+from src.modules.retriever import Retriever
+
+
+def migrate_collections(delete_legacy: bool = True, page_size: int = 500) -> int:
+    """
+    Copies the documents of the legacy single "rick_morty" collection into the
+    per-type collections, reusing the stored embeddings (no re-embedding).
+    Safe to run more than once: documents are upserted by id. Once every legacy
+    document is found in its type's collection, the legacy collection is deleted,
+    so later runs (e.g. on every boot) do nothing.
+
+    Only the unversioned collection set is migrated into: after a reindex switched
+    the alias to a versioned set, legacy documents are stale and are not mixed in.
+
+    @param delete_legacy: Whether to delete the legacy collection once validated
+    @param page_size: Documents copied per request
+    @return: Number of documents migrated
+    @rtype: int
+    @raises RuntimeError: If some document type was not fully migrated
+    """
+    retriever = Retriever()
+    legacy = retriever.legacy_collection()
+    if legacy is None:
+        print("No hay colección única para migrar")
+        return 0
+    if retriever.collection_name != retriever.alias.alias:
+        print(f"¡ADVERTENCIA! Se sirve la versión {retriever.collection_name}: la colección única "
+              f"'{legacy.name}' está desactualizada y no se migra. Eliminarla con delete_collection('{legacy.name}')")
+        return 0
+
+    total = legacy.count()
+    print(f"Migrando {total} documentos de '{legacy.name}' a colecciones por tipo...")
+    expected = Counter()
+    found = Counter()
+    for offset in range(0, total, page_size):
+        page = legacy.get(limit=page_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+        retriever.upsert(
+            ids=page["ids"],
+            embeddings=page["embeddings"],
+            documents=page["documents"],
+            metadatas=page["metadatas"]
+        )
+        # Verificar por tipo que cada documento quedó en su colección
+        ids_by_type = {}
+        for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+            ids_by_type.setdefault(metadata['type'], []).append(doc_id)
+        for doc_type, ids in ids_by_type.items():
+            expected[doc_type] += len(ids)
+            found[doc_type] += len(retriever.collections[doc_type].get(ids=ids, include=[])["ids"])
+        print(f"Progreso: {min(offset + page_size, total)}/{total}")
+
+    for doc_type, collection in retriever.collections.items():
+        print(f"  {collection.name}: {found[doc_type]}/{expected[doc_type]} migrados, {collection.count()} documentos")
+    missing = {doc_type: expected[doc_type] - found[doc_type] for doc_type in expected if found[doc_type] < expected[doc_type]}
+    if missing:
+        raise RuntimeError(f"Migración incompleta, documentos faltantes por tipo: {missing}")
+
+    if delete_legacy:
+        retriever.client.delete_collection(name=legacy.name)
+        print(f"Colección '{legacy.name}' eliminada")
+    print("¡Migración completada!")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migra la colección única a colecciones por tipo")
+    parser.add_argument("--keep-legacy", action="store_true", help="Conservar la colección única al terminar")
+    args = parser.parse_args()
+    migrate_collections(delete_legacy=not args.keep_legacy)
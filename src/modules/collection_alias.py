@@ -0,0 +1,122 @@
+from datetime import datetime
+from typing import Dict, Optional
+import json
+import os
+import threading
+
+
+class CollectionAlias:
+    """
+    Alias from the logical collection name (Settings.COLLECTION_NAME) to the
+    versioned collection set currently served, e.g. "rick_morty" -> "rick_morty_v3".
+
+    Chroma has no collection aliases, so the mapping lives in a small JSON file next
+    to the vector store, shared by every process. Switching rewrites the file
+    atomically and remembers the previous target for rollback. Without a file the
+    alias points to the unversioned set named like the alias itself.
+    """
+    def __init__(self, path: str, alias: str):
+        """
+        @param path: JSON file mapping aliases to their active and previous targets
+        @param alias: Logical collection name
+        """
+        self.path = path
+        self.alias = alias
+        self.lock = threading.Lock()
+        self._mtime = None
+        self._state = {}
+
+    def state(self) -> Dict:
+        """
+        Returns the alias state. The file is only re-read when its modification
+        time changes, so this is a single stat() per call.
+
+        @return: Dictionary with 'active', 'previous' and 'switched_at'
+        @rtype: Dict
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return {"active": self.alias, "previous": None, "switched_at": None}
+        if mtime != self._mtime:
+            with self.lock:
+                self._state = self._read().get(self.alias, {})
+                self._mtime = mtime
+        return {
+            "active": self._state.get("active", self.alias),
+            "previous": self._state.get("previous"),
+            "switched_at": self._state.get("switched_at")
+        }
+
+    def active(self) -> str:
+        """
+        @return: Name of the collection set currently served
+        @rtype: str
+        """
+        return self.state()["active"]
+
+    def switch(self, target: str) -> Dict:
+        """
+        Points the alias to a new collection set, keeping the current one as previous.
+
+        @param target: Collection set to serve
+        @return: New alias state
+        @rtype: Dict
+        """
+        with self.lock:
+            aliases = self._read()
+            current = aliases.get(self.alias, {}).get("active", self.alias)
+            aliases[self.alias] = {
+                "active": target,
+                "previous": current if current != target else aliases.get(self.alias, {}).get("previous"),
+                "switched_at": datetime.now().isoformat()
+            }
+            self._write(aliases)
+        return self.state()
+
+    def rollback(self) -> Dict:
+        """
+        Swaps the active and previous collection sets.
+
+        @return: New alias state
+        @rtype: Dict
+        @raises ValueError: If there is no previous collection set
+        """
+        previous = self.state()["previous"]
+        if not previous:
+            raise ValueError(f"No hay versión anterior de '{self.alias}' para restaurar")
+        return self.switch(previous)
+
+    def _read(self) -> Dict:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write(self, aliases: Dict):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(aliases, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._mtime = None
+
+
+def versioned_name(alias: str, version: int) -> str:
+    """
+    @return: Name of a versioned collection set, e.g. "rick_morty_v3"
+    @rtype: str
+    """
+    return f"{alias}_v{version}"
+
+
+def parse_version(alias: str, name: str) -> Optional[int]:
+    """
+    @return: Version number of a versioned collection set name, or None
+    @rtype: int
+    """
+    prefix = f"{alias}_v"
+    if name.startswith(prefix) and name[len(prefix):].isdigit():
+        return int(name[len(prefix):])
+    return None
@@ -1,20 +1,31 @@
 import json
+import mmap
 import os
-from typing import List, Dict
+import re
+from collections.abc import Mapping
+from itertools import islice
+from typing import List, Dict, Iterable, Iterator, Tuple
 
 class DataLoader:
     """
     Handles loading of Rick & Morty data from JSON files.
+    Besides the eager loaders, provides iterator-based loaders that stream large
+    files so memory usage stays bounded regardless of the input size.
     """
-    def __init__(self, data_dir: str = "src/data/raw", transcripts_dir: str = "src/data/raw"):
+    def __init__(self, data_dir: str = "src/data/raw", transcripts_dir: str = "src/data/raw", chunk_size: int = 1 << 16):
         """
         Initializes the DataLoader with the specified data directory.
         
         @param data_dir: Path to the directory containing data files
         @type data_dir: str
+        @param transcripts_dir: Path to the directory containing transcript files
+        @type transcripts_dir: str
+        @param chunk_size: Bytes read at a time when streaming JSON files
+        @type chunk_size: int
         """
         self.data_dir = data_dir
         self.transcripts_dir = transcripts_dir
+        self.chunk_size = chunk_size
 
     def load_episodes(self) -> List[Dict]:
         """
@@ -66,10 +77,255 @@ class DataLoader:
         @return: Diccionario con nombres de episodios como claves y transcripciones como valores
         @rtype: Dict[str, str]
         """
-        transcripts = {}
-        for filename in os.listdir(self.transcripts_dir):
+        return dict(self.iter_transcripts())
+
+    def iter_episodes(self) -> Iterator[Dict]:
+        """
+        Streams episodes from episodes.json one at a time.
+        
+        @return: Iterator of episode dictionaries
+        @rtype: Iterator[Dict]
+        """
+        return self._iter_json_array("episodes.json", "episodes")
+
+    def iter_characters(self) -> Iterator[Dict]:
+        """
+        Streams characters from characters.json one at a time.
+        
+        @return: Iterator of character dictionaries
+        @rtype: Iterator[Dict]
+        """
+        return self._iter_json_array("characters.json", "characters")
+
+    def has_local_data(self) -> bool:
+        """
+        @return: True if episodes.json and characters.json exist in data_dir
+        @rtype: bool
+        """
+        return all(os.path.exists(os.path.join(self.data_dir, name)) for name in ("episodes.json", "characters.json"))
+
+    def stream_all(self) -> "StreamingData":
+        """
+        Streaming counterpart of load_all(): every access to 'episodes' or
+        'characters' returns a new iterator over the file, so ingestion can make
+        several passes without holding the data in memory.
+        
+        @return: Lazy mapping with 'episodes' and 'characters'
+        @rtype: StreamingData
+        """
+        return StreamingData(self)
+
+    def iter_transcripts(self) -> Iterator[Tuple[str, str]]:
+        """
+        Lee las transcripciones de a una.
+        
+        @return: Iterador de tuplas (nombre del episodio, transcripción)
+        @rtype: Iterator[Tuple[str, str]]
+        """
+        index = self.transcript_index()
+        for episode_name in index:
+            yield episode_name, index[episode_name]
+
+    def transcript_index(self) -> "TranscriptIndex":
+        """
+        Returns a lazy mapping of episode names to transcripts. Only file paths are
+        kept in memory; each transcript is read when it is accessed.
+        
+        @return: Lazy transcript mapping
+        @rtype: TranscriptIndex
+        """
+        return TranscriptIndex(self.transcripts_dir)
+
+    @staticmethod
+    def iter_batches(items: Iterable, batch_size: int) -> Iterator[List]:
+        """
+        Groups any iterable into lists of at most batch_size items.
+        
+        @param items: Items to group
+        @param batch_size: Maximum size of each batch
+        @return: Iterator of batches
+        @rtype: Iterator[List]
+        """
+        iterator = iter(items)
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def _iter_json_array(self, filename: str, key: str) -> Iterator[Dict]:
+        """
+        Incrementally parses the array stored under `key` in a JSON object file,
+        reading it in chunks so the whole document is never held in memory.
+        
+        @param filename: File inside data_dir
+        @param key: Top-level key containing the array
+        @return: Iterator of array elements
+        @rtype: Iterator[Dict]
+        """
+        path = os.path.join(self.data_dir, filename)
+        if not os.path.exists(path):
+            print(f"Archivo {filename} no encontrado")
+            return
+
+        decoder = json.JSONDecoder()
+        # "key" seguido de ':' y '[': no confundir con un valor que coincida con la clave
+        marker = re.compile(re.escape(json.dumps(key)) + r"\s*:\s*\[")
+        with open(path, "r", encoding="utf-8") as f:
+            buffer = ""
+            eof = False
+
+            def fill() -> bool:
+                nonlocal buffer, eof
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    eof = True
+                    return False
+                buffer += chunk
+                return True
+
+            # Avanzar hasta el inicio del arreglo: "key" : [
+            while True:
+                match = marker.search(buffer)
+                if match:
+                    buffer = buffer[match.end():]
+                    break
+                if not fill():
+                    raise ValueError(f"No se encontró la clave '{key}' en {filename}")
+
+            pos = 0
+            while True:
+                # Saltar espacios y separadores entre elementos
+                while True:
+                    while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                        pos += 1
+                    if pos < len(buffer) or not fill():
+                        break
+                if pos >= len(buffer):
+                    raise ValueError(f"Arreglo '{key}' incompleto en {filename}")
+                if buffer[pos] == "]":
+                    return
+
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                    complete = end < len(buffer) or eof
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    complete = False
+                if not complete:
+                    # Elemento partido entre bloques: leer más y reintentar
+                    buffer = buffer[pos:]
+                    pos = 0
+                    fill()
+                    continue
+                yield item
+                buffer = buffer[end:]
+                pos = 0
+
+
+class StreamingData(Mapping):
+    """
+    Read-only mapping with the same keys as RickMortyAPI.fetch_all_data(), backed
+    by the JSON files of a DataLoader. Values are fresh streaming iterators.
+    """
+    KEYS = ("characters", "episodes")
+
+    def __init__(self, data_loader: DataLoader):
+        self.data_loader = data_loader
+
+    def __getitem__(self, key: str) -> Iterator[Dict]:
+        if key == "characters":
+            return self.data_loader.iter_characters()
+        if key == "episodes":
+            return self.data_loader.iter_episodes()
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+
+class TranscriptIndex(Mapping):
+    """
+    Read-only mapping of episode names to transcripts backed by the files on disk.
+    Each access reads the file again; transcripts are never cached. Ingestion
+    should use iter_chunks(), which never holds a whole transcript in memory.
+    """
+    def __init__(self, transcripts_dir: str):
+        """
+        @param transcripts_dir: Directory containing the .txt transcripts
+        @type transcripts_dir: str
+        """
+        self.paths = {}
+        for filename in sorted(os.listdir(transcripts_dir)):
             if filename.endswith(".txt"):
                 episode_name = os.path.splitext(filename)[0]
-                with open(os.path.join(self.transcripts_dir, filename), "r", encoding="utf-8") as f:
-                    transcripts[episode_name] = f.read()
-        return transcripts
\ No newline at end of file
+                self.paths[episode_name] = os.path.join(transcripts_dir, filename)
+
+    def __getitem__(self, episode_name: str) -> str:
+        with open(self.paths[episode_name], "r", encoding="utf-8") as f:
+            return f.read()
+
+    def iter_chunks(self, episode_name: str, size: int, overlap: int = 0) -> Iterator[str]:
+        """
+        Same splitting as TextPreprocessor.chunk_text(), but working on a memory
+        mapped file: only the current chunk is decoded. Sizes are counted in
+        UTF-8 bytes, so a chunk never exceeds `size` characters.
+        
+        @param episode_name: Transcript name
+        @type episode_name: str
+        @param size: Maximum bytes per chunk
+        @type size: int
+        @param overlap: Bytes repeated at the start of the next chunk
+        @type overlap: int
+        @return: Iterator of non-empty chunks
+        @rtype: Iterator[str]
+        """
+        path = self.paths[episode_name]
+        if os.path.getsize(path) == 0:
+            # mmap no admite archivos vacíos
+            return
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            length = len(data)
+            start = 0
+            while start < length:
+                end = min(start + size, length)
+                if end < length:
+                    cut = data.rfind(b"\n", start + size // 2, end)
+                    end = cut if cut != -1 else _char_start(data, end, start)
+                chunk = data[start:end].decode("utf-8").strip()
+                if chunk:
+                    yield chunk
+                if end >= length:
+                    return
+                start = _char_start(data, max(end - overlap, start + 1), start)
+
+    def __contains__(self, episode_name) -> bool:
+        return episode_name in self.paths
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.paths)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+
+def _char_start(data: mmap.mmap, pos: int, floor: int) -> int:
+    """
+    Moves `pos` back to the first byte of the UTF-8 character containing it, or
+    forward to the next character when going back would reach `floor`.
+    
+    @return: Offset of a character boundary
+    @rtype: int
+    """
+    back = pos
+    while back > floor and data[back] & 0xC0 == 0x80:
+        back -= 1
+    if back > floor:
+        return back
+    while pos < len(data) and data[pos] & 0xC0 == 0x80:
+        pos += 1
+    return pos
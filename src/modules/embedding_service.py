@@ -0,0 +1,286 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+import time
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chromadb.utils import embedding_functions
+from ..config.settings import get_settings
+
+settings = get_settings()
+
+# Trama: longitud de la cabecera (4 bytes, big endian) + cabecera JSON + carga binaria de "nbytes"
+_LENGTH = struct.Struct(">I")
+
+
+def _pack(header: Dict, payload: bytes = b"") -> bytes:
+    data = json.dumps(dict(header, nbytes=len(payload))).encode("utf-8")
+    return _LENGTH.pack(len(data)) + data + payload
+
+
+async def _read_message(reader: asyncio.StreamReader) -> Tuple[Dict, bytes]:
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    header = json.loads(await reader.readexactly(length))
+    payload = await reader.readexactly(header["nbytes"]) if header.get("nbytes") else b""
+    return header, payload
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("El servidor de embeddings cerró la conexión")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+class EmbeddingServer:
+    """
+    Embedding service shared by every API worker and ingestion job on the host.
+
+    One process loads the model and listens on a Unix socket. Requests arriving
+    within `max_wait` seconds of each other (up to `max_batch_size` texts) are
+    merged into a single batched inference, so concurrent queries share one model
+    call instead of running one at a time in every worker.
+    """
+    def __init__(self, embedding_function, socket_path: str, max_batch_size: int = 64, max_wait: float = 0.005):
+        """
+        @param embedding_function: Callable mapping a list of texts to embeddings
+        @param socket_path: Unix socket to listen on
+        @param max_batch_size: Texts per batched inference (a larger single request runs alone)
+        @param max_wait: Seconds to wait for more requests after the first one of a batch
+        """
+        self.embedding_function = embedding_function
+        self.socket_path = socket_path
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue: Optional[asyncio.Queue] = None
+        self.server = None
+        self._batcher = None
+        # La inferencia corre fuera del event loop, de a un lote por vez
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self.metrics = {
+            "requests": 0,
+            "texts": 0,
+            "batches": 0,
+            "errors": 0,
+            "queue_depth_max": 0,
+            "inference_seconds": 0.0,
+            "batch_sizes": Counter()
+        }
+
+    async def start(self):
+        """
+        Starts listening and batching. A stale socket file is replaced.
+        """
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+        self.queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._batch_loop())
+        self.server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"Servidor de embeddings escuchando en {self.socket_path} "
+              f"(lote máximo {self.max_batch_size}, espera {self.max_wait * 1000:.1f}ms)")
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        if self._batcher:
+            self._batcher.cancel()
+        self.executor.shutdown(wait=False)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def stats(self) -> Dict:
+        """
+        @return: Queue depth, batch size distribution and inference counters
+        @rtype: Dict
+        """
+        batches = self.metrics["batches"]
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "queue_depth_max": self.metrics["queue_depth_max"],
+            "requests": self.metrics["requests"],
+            "texts": self.metrics["texts"],
+            "batches": batches,
+            "errors": self.metrics["errors"],
+            "avg_batch_size": round(self.metrics["texts"] / batches, 2) if batches else 0.0,
+            "avg_inference_ms": round(self.metrics["inference_seconds"] * 1000 / batches, 2) if batches else 0.0,
+            "batch_sizes": {str(size): count for size, count in sorted(self.metrics["batch_sizes"].items())}
+        }
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Serves one client connection; a connection carries many sequential requests.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    header, _ = await _read_message(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                if header.get("op") == "stats":
+                    writer.write(_pack(self.stats()))
+                else:
+                    future = loop.create_future()
+                    self.metrics["requests"] += 1
+                    self.queue.put_nowait((header.get("texts", []), future))
+                    self.metrics["queue_depth_max"] = max(self.metrics["queue_depth_max"], self.queue.qsize())
+                    try:
+                        vectors = await future
+                        writer.write(_pack({"count": vectors.shape[0], "dim": vectors.shape[1]}, vectors.tobytes()))
+                    except Exception as e:
+                        writer.write(_pack({"error": str(e)}))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _batch_loop(self):
+        """
+        Groups queued requests into batches and runs one inference per batch. A
+        request that would push a batch past max_batch_size texts starts the next one.
+        """
+        loop = asyncio.get_running_loop()
+        carried = None
+        while True:
+            if carried is not None:
+                batch, carried = [carried], None
+            else:
+                batch = [await self.queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if size + len(item[0]) > self.max_batch_size:
+                    carried = item
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                started = time.perf_counter()
+                vectors = await loop.run_in_executor(self.executor, self._embed, texts)
+                self.metrics["inference_seconds"] += time.perf_counter() - started
+                self.metrics["batches"] += 1
+                self.metrics["texts"] += len(texts)
+                self.metrics["batch_sizes"][len(texts)] += 1
+            except Exception as e:
+                self.metrics["errors"] += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            offset = 0
+            for item_texts, future in batch:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.ascontiguousarray(np.asarray(self.embedding_function(texts), dtype=np.float32))
+
+
+class EmbeddingClient(EmbeddingFunction[Documents]):
+    """
+    Chroma embedding function backed by an EmbeddingServer. Safe to share across
+    threads: each thread keeps its own connection, reconnecting once on failure.
+    """
+    def __init__(self, socket_path: str, timeout: float = 10.0):
+        """
+        @param socket_path: Unix socket of the embedding server
+        @param timeout: Seconds to wait for a response
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __call__(self, input: Documents) -> Embeddings:
+        header, payload = self._request({"op": "embed", "texts": list(input)})
+        if "error" in header:
+            raise RuntimeError(f"Error del servidor de embeddings: {header['error']}")
+        vectors = np.frombuffer(payload, dtype=np.float32).reshape(header["count"], header["dim"])
+        return list(vectors)
+
+    def stats(self) -> Dict:
+        """
+        @return: Metrics reported by the server
+        @rtype: Dict
+        """
+        header, _ = self._request({"op": "stats"})
+        header.pop("nbytes", None)
+        return header
+
+    def _request(self, header: Dict) -> Tuple[Dict, bytes]:
+        for attempt in range(2):
+            sock = self._connection()
+            try:
+                sock.sendall(_pack(header))
+                (length,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+                response = json.loads(_recv_exact(sock, length))
+                payload = _recv_exact(sock, response["nbytes"]) if response.get("nbytes") else b""
+                return response, payload
+            except TimeoutError:
+                # No reintentar: la petición puede seguir en cola en el servidor
+                self._close()
+                raise
+            except (OSError, ConnectionError):
+                self._close()
+                if attempt:
+                    raise
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            finally:
+                self._local.sock = None
+
+
+def create_embedding_function():
+    """
+    Builds the embedding function configured in Settings.EMBEDDING_BACKEND.
+
+    @return: Local ONNX embedding function ("local") or EmbeddingClient ("server")
+    @raises ValueError: If the backend name is unknown
+    """
+    if settings.EMBEDDING_BACKEND == "local":
+        return embedding_functions.DefaultEmbeddingFunction()
+    if settings.EMBEDDING_BACKEND == "server":
+        return EmbeddingClient(settings.EMBEDDING_SOCKET_PATH, settings.EMBEDDING_SERVER_TIMEOUT)
+    raise ValueError(f"Backend de embeddings desconocido: {settings.EMBEDDING_BACKEND}")
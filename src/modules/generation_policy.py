@@ -0,0 +1,88 @@
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+
+
+class HedgedGenerationPolicy:
+    """
+    Latency-bounded generation with hedged requests.
+
+    The primary model is called first. If it has not answered after `hedge_delay`
+    seconds (or fails before that), the same prompt is sent to the fallback model
+    and whichever finishes first wins; the other request is cancelled. The whole
+    call is bounded by `timeout` seconds.
+
+    The model call is injected, so the policy can be exercised with a fake LLM.
+    """
+    def __init__(self, call: Callable[..., Awaitable[str]], primary_model: str,
+                 fallback_model: Optional[str] = None, hedge_delay: float = 3.0, timeout: float = 15.0):
+        """
+        @param call: Coroutine function `call(model, prompt, **kwargs) -> str`
+        @param primary_model: Model tried first
+        @param fallback_model: Faster model used for the hedge; None disables hedging
+        @param hedge_delay: Seconds to wait for the primary before hedging
+        @param timeout: Total latency budget in seconds
+        """
+        self.call = call
+        self.primary_model = primary_model
+        self.fallback_model = fallback_model
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+        self.stats = {"requests": 0, "hedged": 0, "timeouts": 0, "errors": 0, "served_by": {}}
+
+    async def generate(self, prompt: str, **kwargs) -> Tuple[str, str]:
+        """
+        Generates a completion under the latency budget.
+
+        @param prompt: Prompt text
+        @param kwargs: Extra arguments forwarded to the model call
+        @return: Tuple of (text, model that served it)
+        @rtype: Tuple[str, str]
+        @raises asyncio.TimeoutError: If no model answered within the budget
+        @raises Exception: The last model error if every request failed
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        self.stats["requests"] += 1
+        tasks: Dict[asyncio.Task, str] = {}
+
+        def launch(model: str):
+            tasks[asyncio.create_task(self.call(model, prompt, **kwargs))] = model
+
+        try:
+            launch(self.primary_model)
+            primary = next(iter(tasks))
+            await asyncio.wait({primary}, timeout=min(self.hedge_delay, self.timeout))
+            if primary.done() and primary.exception() is None:
+                return self._served(primary.result(), self.primary_model)
+
+            if self.fallback_model and loop.time() < deadline:
+                self.stats["hedged"] += 1
+                launch(self.fallback_model)
+
+            pending = {task for task in tasks if not task.done()}
+            last_error = primary.exception() if primary.done() else None
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return self._served(task.result(), tasks[task])
+                    last_error = task.exception()
+
+            if pending or not last_error:
+                self.stats["timeouts"] += 1
+                raise asyncio.TimeoutError(f"Sin respuesta del modelo en {self.timeout}s")
+            self.stats["errors"] += 1
+            raise last_error
+        finally:
+            # Cancelar la petición perdedora (o todas, si se agotó el tiempo)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _served(self, text: str, model: str) -> Tuple[str, str]:
+        served_by = self.stats["served_by"]
+        served_by[model] = served_by.get(model, 0) + 1
+        return text, model
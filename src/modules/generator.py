@@ -2,90 +2,400 @@ from typing import List, Dict
 import cohere
 from src.api.models import ConversationManager
 from ..config.settings import get_settings
+from ..utils.debug import debug_print
+from ..utils.preprocessor import TextPreprocessor
+from .generation_policy import HedgedGenerationPolicy
 from langdetect import detect
+import asyncio
 import uuid
 import hashlib
+import json
+import os
 
 settings = get_settings()
 
+# Respuesta fija cuando no hay información relevante
+CLASSIFIED_RESPONSES = {
+    'es': "Morty, esa información está clasificada",
+    'en': "Morty, that information is classified"
+}
+
 class Generator:
     """
     Handles response generation using Cohere's language model.
     Implements Rick's personality and multilingual responses.
     """
-    def __init__(self):
+    def __init__(self, conversation_manager: ConversationManager = None):
         """
         Initializes the Generator with Cohere client and model settings.
+        Generation goes through a hedged policy: if MODEL_NAME is slower than
+        GENERATION_HEDGE_DELAY, FALLBACK_MODEL_NAME is tried in parallel.
+        
+        @param conversation_manager: Conversation store (default: conversations.json)
         """
-        self.co = cohere.Client(settings.COHERE_API_KEY)
+        self.co = cohere.AsyncClient(settings.COHERE_API_KEY)
         self.model = settings.MODEL_NAME
-        self.conversation_manager = ConversationManager()
+        self.policy = HedgedGenerationPolicy(
+            self._call_model,
+            primary_model=self.model,
+            fallback_model=settings.FALLBACK_MODEL_NAME or None,
+            hedge_delay=settings.GENERATION_HEDGE_DELAY,
+            timeout=settings.GENERATION_TIMEOUT
+        )
+        self.conversation_manager = conversation_manager or ConversationManager()
+        self.summary_tasks: Dict[str, asyncio.Task] = {}
+        # (índice, clave de la pregunta) -> respuesta; ver index_version del Retriever
         self.response_cache = {}
+        self._response_cache_index = None
+        self._response_cache_mtime = None
+        self.load_response_cache(settings.RESPONSE_CACHE_PATH)
+
+    @staticmethod
+    def cache_key(query: str) -> str:
+        """
+        Returns the response cache key of a query. Queries are normalized first
+        so trivial variations (case, punctuation, spacing) share an entry.
+        
+        @param query: User question
+        @return: Cache key
+        @rtype: str
+        """
+        normalized = " ".join(TextPreprocessor.clean_text(query).split())
+        return hashlib.md5(normalized.encode()).hexdigest()
+
+    @staticmethod
+    def read_response_cache(path: str) -> tuple:
+        """
+        Reads a precomputed answers file written by src/warm_cache.py:
+        {"index": <Retriever.index_version()>, "answers": {question: answer}}.
+        Files without "index" (older format) are tied to no index.
+        
+        @param path: JSON file with the answers
+        @return: Tuple of (index the answers were built from or None, answers)
+        @rtype: tuple
+        @raises OSError: If the file cannot be read
+        @raises ValueError: If it is not valid JSON
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if "answers" in data and isinstance(data["answers"], dict):
+            return data.get("index"), data["answers"]
+        return None, data
 
-    def generate_response(self, query: str, context: List[Dict], conversation_id: str = None) -> tuple:
+    def load_response_cache(self, path: str) -> int:
+        """
+        Loads precomputed answers (see src/warm_cache.py) into the response cache,
+        keyed by the index they were built from: answers built from another
+        collection set or generation are never served.
+        
+        @param path: JSON file with the answers (see read_response_cache)
+        @return: Number of entries loaded
+        @rtype: int
+        """
+        if not path or not os.path.exists(path):
+            return 0
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            index, answers = self.read_response_cache(path)
+        except (OSError, ValueError) as e:
+            print(f"Error cargando la cache de respuestas: {e}")
+            return 0
+
+        for question, answer in answers.items():
+            self.response_cache[(index, self.cache_key(question))] = answer
+        self._response_cache_mtime = mtime
+        print(f"Cache de respuestas precalculadas: {len(answers)} entradas (índice {index})")
+        return len(answers)
+
+    def refresh_response_cache(self, path: str = None) -> int:
+        """
+        Reloads the precomputed answers when the file changed since the last load.
+        After a reindex, warm_cache runs in another process and saves its progress
+        periodically, so answers become available while it is still running.
+        A single stat() per call when nothing changed.
+        
+        @param path: JSON file mapping questions to answers (default: RESPONSE_CACHE_PATH)
+        @return: Number of entries loaded (0 if the file did not change)
+        @rtype: int
+        """
+        path = path or settings.RESPONSE_CACHE_PATH
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except (OSError, TypeError):
+            return 0
+        if mtime == self._response_cache_mtime:
+            return 0
+        return self.load_response_cache(path)
+
+    def _use_response_index(self, index: str):
+        """
+        Drops the cached answers of other indexes once a new one is served
+        (after a reindex, a rollback or a write by another process).
+        """
+        if index == self._response_cache_index:
+            return
+        self.response_cache = {key: answer for key, answer in self.response_cache.items() if key[0] == index}
+        self._response_cache_index = index
+
+    async def _call_model(self, model: str, prompt: str, max_tokens: int = 300, temperature: float = 0.7) -> str:
+        """
+        Single Cohere generation call, used by the generation policy.
+        
+        @param model: Model name
+        @param prompt: Prompt text
+        @return: Generated text
+        @rtype: str
+        """
+        response = await self.co.generate(
+            model=model,
+            prompt=prompt,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            k=0,
+            stop_sequences=[],
+            return_likelihoods="NONE"
+        )
+        return response.generations[0].text
+
+    async def generate_text(self, query: str, context: List[Dict], language: str, history: str = "") -> tuple:
+        """
+        Calls the language model for a single answer, without cache or conversation bookkeeping.
+        
+        @param query: User question
+        @param context: Relevant context for the answer
+        @param language: Detected language of the question
+        @param history: Bounded conversation history
+        @return: Tuple of (generated answer, model that served it)
+        @rtype: tuple
+        """
+        prompt = self._prepare_prompt(query, context, language, history)
+        return await self.policy.generate(prompt)
+
+    async def generate_response(self, query: str, context: List[Dict], conversation_id: str = None,
+                                index: str = None) -> tuple:
         """
         Genera una respuesta a una consulta usando el contexto proporcionado.
         
         @param query: Pregunta del usuario
         @param context: Contexto relevante para la respuesta
-        @return: Respuesta generada en el estilo de Rick
+        @param conversation_id: Conversación a la que pertenece la pregunta (opcional)
+        @param index: Índice que produjo el contexto (Retriever.index_version()); las
+            respuestas cacheadas solo se reutilizan con el mismo índice
+        @return: Tupla (respuesta en el estilo de Rick, conversation_id, modelo que respondió)
         """
         try:
             if conversation_id is None:
                 conversation_id = str(uuid.uuid4())
 
+            # El historial se arma antes de registrar la pregunta actual
+            history_text = self._build_history(conversation_id)
             self.conversation_manager.add_message(conversation_id, 'user', query)
             
-            query_hash = hashlib.md5(query.encode()).hexdigest()
+            query_hash = (index, self.cache_key(query))
+            # Las preguntas de seguimiento dependen del historial: no se cachean
+            use_cache = not history_text
+            if use_cache:
+                self.refresh_response_cache()
+                self._use_response_index(index)
 
-            if query_hash in self.response_cache:
+            if use_cache and query_hash in self.response_cache:
                 response_text = self.response_cache[query_hash]
-                print(f"Respuesta en cache: {response_text}")
+                model_used = "cache"
+                debug_print(f"Respuesta en cache: {response_text}")
             else:    
                 # Detectar idioma de la consulta
                 input_language = detect(query)
-                print(f"Idioma detectado: {input_language}")
+                debug_print(f"Idioma detectado: {input_language}")
                 
-                # Preparar el prompt con el contexto
-                prompt = self._prepare_prompt(query, context, input_language)
-                
-                # Generar la respuesta
-                response = self.co.generate(
-                    model=self.model,
-                    prompt=prompt,
-                    max_tokens=300,
-                    temperature=0.7,
-                    k=0,
-                    stop_sequences=[],
-                    return_likelihoods="NONE"
-                )
-                response_text = response.generations[0].text
+                # Generar la respuesta con el contexto
+                response_text, model_used = await self.generate_text(query, context, input_language, history_text)
+                debug_print(f"Modelo utilizado: {model_used}")
                 
                 # Guardar la respuesta en la cache
-                self.response_cache[query_hash] = response_text
+                if use_cache:
+                    self.response_cache[query_hash] = response_text
             
             # Imprimir la respuesta
-            print(f"Respuesta: {response_text}")
+            debug_print(f"Respuesta: {response_text}")
         
             # Guardar la respuesta en la conversación
-            self.conversation_manager.add_message(conversation_id, 'assistant', response_text)
+            self.conversation_manager.add_message(conversation_id, 'assistant', response_text, model=model_used)
+            self.schedule_summary(conversation_id)
             
             # Devolver la respuesta
-            return response_text, conversation_id
+            return response_text, conversation_id, model_used
                 
         except Exception as e:
             print(f"Error en la generación: {e}")
             error_message = "¡Wubba Lubba Dub Dub! Algo salió mal, Morty!" if 'input_language' in locals() and input_language == 'es' else "Wubba Lubba Dub Dub! Something went wrong, Morty!"
             self.conversation_manager.add_message(conversation_id, 'assistant', error_message)
-            return error_message, conversation_id
+            self.schedule_summary(conversation_id)
+            return error_message, conversation_id, None
+
+    async def classified_response(self, query: str, conversation_id: str = None) -> tuple:
+        """
+        Returns the canned "classified" reply without calling the language model.
+        Used when retrieval found nothing relevant to the question.
+        
+        @param query: Pregunta del usuario
+        @param conversation_id: Conversación a la que pertenece la pregunta (opcional)
+        @return: Tuple of (reply, conversation_id, None)
+        @rtype: tuple
+        """
+        if conversation_id is None:
+            conversation_id = str(uuid.uuid4())
+        try:
+            language = detect(query)
+        except Exception:
+            language = 'es'
+        response_text = CLASSIFIED_RESPONSES.get(language, CLASSIFIED_RESPONSES['es'])
+
+        self.conversation_manager.add_message(conversation_id, 'user', query)
+        self.conversation_manager.add_message(conversation_id, 'assistant', response_text)
+        self.schedule_summary(conversation_id)
+        return response_text, conversation_id, None
+
+    def has_history(self, conversation_id: str) -> bool:
+        """
+        @return: Whether the conversation already has messages
+        @rtype: bool
+        """
+        return bool(conversation_id) and bool(self.conversation_manager.get_conversation(conversation_id))
+
+    def _format_message(self, message: Dict) -> str:
+        """
+        Formats a stored message as a single, length-capped prompt line.
+        """
+        speaker = "Usuario" if message['role'] == 'user' else "Rick"
+        content = " ".join(message['content'].split())
+        if len(content) > settings.HISTORY_MESSAGE_MAX_CHARS:
+            content = content[:settings.HISTORY_MESSAGE_MAX_CHARS] + "..."
+        return f"{speaker}: {content}"
+
+    def _build_history(self, conversation_id: str) -> str:
+        """
+        Builds the conversation section of the prompt: the rolling summary plus
+        the most recent messages. The summary is updated in the background and may
+        lag behind, so the messages between what it covers and the recent window
+        are included too, up to HISTORY_UNSUMMARIZED_MAX_MESSAGES (the newest ones).
+        Its size is bounded by the HISTORY_* settings regardless of how long the
+        conversation is.
         
-    def _prepare_prompt(self, query: str, context: List[Dict], language: str) -> str:
+        @param conversation_id: Conversation identifier
+        @return: History text, or an empty string for a new conversation
+        @rtype: str
+        """
+        history = self.conversation_manager.get_conversation(conversation_id)
+        if not history:
+            return ""
+
+        summary = self.conversation_manager.get_summary(conversation_id)
+        window_start = max(len(history) - max(settings.HISTORY_RECENT_MESSAGES, 0), 0)
+        # Mensajes que ya salieron de la ventana pero el resumen todavía no incorporó
+        pending_start = max(summary['covers'], window_start - max(settings.HISTORY_UNSUMMARIZED_MAX_MESSAGES, 0))
+        messages = history[min(pending_start, window_start):]
+
+        parts = []
+        if summary['text']:
+            parts.append(f"Resumen: {summary['text']}")
+        parts.extend(self._format_message(message) for message in messages)
+        return "\n".join(parts)
+
+    def schedule_summary(self, conversation_id: str) -> asyncio.Task:
+        """
+        Updates the rolling summary in a background task, off the /qa response path.
+        At most one update runs per conversation; messages added meanwhile are
+        folded by the next update, so the summary may lag one turn behind.
+        
+        @param conversation_id: Conversation identifier
+        @return: The running update task
+        @rtype: asyncio.Task
+        """
+        task = self.summary_tasks.get(conversation_id)
+        if task is not None and not task.done():
+            return task
+
+        task = asyncio.create_task(self._update_summary(conversation_id))
+        self.summary_tasks[conversation_id] = task
+
+        def forget(done):
+            if self.summary_tasks.get(conversation_id) is done:
+                del self.summary_tasks[conversation_id]
+        task.add_done_callback(forget)
+        return task
+
+    async def _update_summary(self, conversation_id: str):
+        """
+        Folds the messages that left the recent window into the rolling summary.
+        Only the newly evicted messages are summarized, together with the previous
+        summary, so each update has a constant cost.
+        
+        @param conversation_id: Conversation identifier
+        """
+        history = self.conversation_manager.get_conversation(conversation_id)
+        summary = self.conversation_manager.get_summary(conversation_id)
+        target = len(history) - settings.HISTORY_RECENT_MESSAGES
+        if target <= summary['covers']:
+            return
+
+        evicted = [self._format_message(message) for message in history[summary['covers']:target]]
+        try:
+            text = await self._summarize(summary['text'], evicted)
+            self.conversation_manager.set_summary(conversation_id, text, target)
+        except Exception as e:
+            print(f"Error actualizando el resumen: {e}")
+
+    async def _summarize(self, previous: str, messages: List[str]) -> str:
+        """
+        Produces the new rolling summary from the previous one and the evicted messages.
+        Falls back to keeping the most recent text if the model call fails.
+        Summaries call MODEL_NAME directly, not the hedged policy: they are internal,
+        so they are never served by the fallback model and stay out of the
+        generation stats.
+        
+        @param previous: Current summary text
+        @param messages: Formatted messages to fold into the summary
+        @return: Updated summary, at most HISTORY_SUMMARY_MAX_CHARS characters
+        @rtype: str
+        """
+        max_chars = settings.HISTORY_SUMMARY_MAX_CHARS
+        new_lines = "\n".join(messages)
+        try:
+            prompt = (
+                "Actualiza el resumen de una conversación entre un usuario y Rick Sanchez. "
+                "Conserva los personajes, episodios y temas mencionados. "
+                f"Responde solo con el resumen, en menos de {max_chars} caracteres.\n\n"
+                f"RESUMEN ACTUAL:\n{previous or '(vacío)'}\n\n"
+                f"NUEVOS MENSAJES:\n{new_lines}\n\n"
+                "RESUMEN ACTUALIZADO:"
+            )
+            text = await asyncio.wait_for(
+                self._call_model(
+                    self.model,
+                    prompt,
+                    max_tokens=settings.HISTORY_SUMMARY_MAX_TOKENS,
+                    temperature=0.3
+                ),
+                timeout=settings.GENERATION_TIMEOUT
+            )
+            text = " ".join(text.split())
+        except Exception as e:
+            print(f"Error actualizando el resumen: {e}")
+            text = " ".join(f"{previous} {new_lines}".split())
+            # Conservar lo más reciente si no hay resumen del modelo
+            return text[-max_chars:]
+        return text[:max_chars]
+        
+    def _prepare_prompt(self, query: str, context: List[Dict], language: str, history: str = "") -> str:
         """
         Prepares the prompt with better context processing and instructions.
+        
+        @param history: Bounded conversation history (summary and recent messages)
         """
         # Separar y formatear episodios y personajes
         episode_info = []
         character_info = []
+        relation_info = []
         
         for item in context:
             if item['metadata']['type'] == 'episode':
@@ -100,9 +410,14 @@ class Generator:
             elif item['metadata']['type'] == 'character':
                 # Formatear información de personajes
                 character_info.append(item['content'])
+            elif item['metadata']['type'] == 'relation':
+                # Hechos exactos del grafo de relaciones
+                relation_info.append(item['content'])
 
         # Construir contexto estructurado
         context_parts = []
+        if relation_info:
+            context_parts.append("RELACIONES (datos exactos):\n" + "\n".join(relation_info))
         if episode_info:
             context_parts.append("EPISODIOS:\n" + "\n".join(episode_info))
         if character_info:
@@ -123,6 +438,7 @@ class Generator:
                     "SIEMPRE responde en español."
                 ],
                 'context_header': "CONTEXTO DISPONIBLE:",
+                'history_header': "CONVERSACIÓN PREVIA:",
                 'question_header': "PREGUNTA:",
                 'answer_instruction': "(responde USANDO SOLO la información del contexto):"
             },
@@ -136,6 +452,7 @@ class Generator:
                     "SIEMPRE responde en español."
                 ],
                 'context_header': "CONTEXTO DISPONIBLE:",
+                'history_header': "CONVERSACIÓN PREVIA:",
                 'question_header': "PREGUNTA:",
                 'answer_instruction': "(responde USANDO SOLO la información del contexto):"
             
@@ -145,6 +462,8 @@ class Generator:
         lang = language if language in language_instructions else 'es'
         instructions = language_instructions[lang]
 
+        history_section = f"{instructions['history_header']}\n{history}\n" if history else ""
+
         prompt = f"""
         {instructions['system']}
 
@@ -154,13 +473,22 @@ class Generator:
         {instructions['context_header']}
         {context_text}
 
+        {history_section}
         {instructions['question_header']} {query}
 
         {instructions['answer_instruction']}
         """
 
-        print(prompt)
+        debug_print(prompt)
         return prompt
 
     def get_conversation_history(self, conversation_id: str):
-        return self.conversation_manager.get_conversation(conversation_id)
\ No newline at end of file
+        return self.conversation_manager.get_conversation(conversation_id)
+
+    def generation_stats(self) -> Dict:
+        """
+        Returns counters of the generation policy (hedges, timeouts, model that served each answer).
+        
+        @rtype: Dict
+        """
+        return self.policy.stats
\ No newline at end of file
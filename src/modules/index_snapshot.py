@@ -0,0 +1,247 @@
+import hashlib
+import json
+import struct
+import zipfile
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+from .relation_graph import RelationGraph
+
+FORMAT_VERSION = 1
+EMBEDDINGS_MEMBER = "embeddings.npy"
+METADATA_MEMBER = "metadata.json"
+RELATIONS_MEMBER = "relations.npz"
+MANIFEST_MEMBER = "manifest.json"
+# Bytes de embeddings leídos por bloque al verificar el checksum
+CHECKSUM_BLOCK_BYTES = 1 << 24
+
+
+class IndexSnapshot:
+    """
+    Portable snapshot of a vector collection: ids, documents, metadata and embeddings.
+
+    The snapshot is a single uncompressed zip file containing
+    - embeddings.npy: (count, dim) float16/float32 array, memory-mapped on load
+    - metadata.json: columnar ids, documents and metadata fields
+    - relations.npz: character–episode relation graph (optional, see RelationGraph)
+    - manifest.json: format version, model id, dtype, shape and checksum
+    """
+    def __init__(self, manifest: Dict, ids: List[str], documents: List[str], metadatas: List[Dict], embeddings: np.ndarray,
+                 relations: Optional[RelationGraph] = None):
+        self.manifest = manifest
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.embeddings = embeddings
+        self.relations = relations
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def export_snapshot(collections, path: str, model_id: str, dtype: str = "float16",
+                    page_size: int = 1000, name: Optional[str] = None,
+                    relations: Optional[RelationGraph] = None) -> Dict:
+    """
+    Dumps one or more Chroma collections into a snapshot file without re-embedding anything.
+
+    @param collections: Chroma collection, or list of collections, to export
+    @param path: Destination file
+    @param model_id: Identifier of the embedding model used by the collections
+    @param dtype: Storage type of the embeddings ("float16" or "float32")
+    @param page_size: Documents read from Chroma per request
+    @param name: Logical name recorded in the manifest (defaults to the first collection's name)
+    @param relations: Relation graph built from the same data, stored alongside the embeddings
+    @return: Manifest of the written snapshot
+    @rtype: Dict
+    @raises ValueError: If dtype is not supported
+    """
+    if dtype not in ("float16", "float32"):
+        raise ValueError(f"dtype no soportado: {dtype}")
+
+    if not isinstance(collections, (list, tuple)):
+        collections = [collections]
+    count = sum(collection.count() for collection in collections)
+    ids, documents, metadatas = [], [], []
+    digest = hashlib.sha256()
+    dim = None
+
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+        with zf.open(EMBEDDINGS_MEMBER, "w", force_zip64=True) as out:
+            for collection, offset in _pages(collections, page_size):
+                page = collection.get(
+                    limit=page_size,
+                    offset=offset,
+                    include=["embeddings", "documents", "metadatas"]
+                )
+                if not page["ids"]:
+                    continue
+                vectors = np.asarray(page["embeddings"], dtype=dtype)
+                if dim is None:
+                    dim = vectors.shape[1]
+                    header = {"descr": np.dtype(dtype).str, "fortran_order": False, "shape": (count, dim)}
+                    np.lib.format.write_array_header_1_0(out, header)
+                data = np.ascontiguousarray(vectors).tobytes()
+                digest.update(data)
+                out.write(data)
+
+                ids.extend(page["ids"])
+                documents.extend(page["documents"])
+                metadatas.extend(page["metadatas"])
+
+            if dim is None:
+                # Colección vacía: arreglo de forma (0, 0)
+                dim = 0
+                header = {"descr": np.dtype(dtype).str, "fortran_order": False, "shape": (0, 0)}
+                np.lib.format.write_array_header_1_0(out, header)
+
+        metadata_bytes = json.dumps(_to_columns(ids, documents, metadatas), ensure_ascii=False).encode("utf-8")
+        digest.update(metadata_bytes)
+        zf.writestr(METADATA_MEMBER, metadata_bytes)
+
+        if relations is not None:
+            relations_bytes = relations.to_bytes()
+            digest.update(relations_bytes)
+            zf.writestr(RELATIONS_MEMBER, relations_bytes)
+
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "collection": name or collections[0].name,
+            "collections": [collection.name for collection in collections],
+            "model_id": model_id,
+            "count": len(ids),
+            "dim": dim,
+            "dtype": dtype,
+            "relations": relations is not None,
+            "checksum": f"sha256:{digest.hexdigest()}",
+            "created_at": datetime.now().isoformat()
+        }
+        zf.writestr(MANIFEST_MEMBER, json.dumps(manifest, indent=2))
+
+    return manifest
+
+
+def load_snapshot(path: str, model_id: Optional[str] = None, verify: bool = True) -> IndexSnapshot:
+    """
+    Loads a snapshot file. Embeddings are memory-mapped straight from the file.
+
+    @param path: Snapshot file
+    @param model_id: Expected embedding model; checked against the manifest if given
+    @param verify: Whether to validate the checksum
+    @return: Loaded snapshot
+    @rtype: IndexSnapshot
+    @raises ValueError: If the snapshot is incompatible or corrupted
+    """
+    with zipfile.ZipFile(path, "r") as zf:
+        manifest = json.loads(zf.read(MANIFEST_MEMBER))
+        metadata_bytes = zf.read(METADATA_MEMBER)
+        # Los snapshots anteriores al grafo no lo incluyen
+        relations_bytes = zf.read(RELATIONS_MEMBER) if manifest.get("relations") else None
+        info = zf.getinfo(EMBEDDINGS_MEMBER)
+
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Versión de snapshot no soportada: {manifest.get('format_version')}")
+    if model_id and manifest["model_id"] != model_id:
+        raise ValueError(f"El snapshot usa el modelo {manifest['model_id']}, se esperaba {model_id}")
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError("Los embeddings del snapshot deben estar sin comprimir")
+
+    embeddings = _memmap_member(path, info)
+    if embeddings.shape != (manifest["count"], manifest["dim"]):
+        raise ValueError(f"Forma de embeddings inesperada: {embeddings.shape}")
+
+    if verify:
+        digest = hashlib.sha256()
+        # Por bloques de filas: no se copia la matriz mapeada entera a memoria
+        rows = max(1, CHECKSUM_BLOCK_BYTES // max(1, embeddings.itemsize * embeddings.shape[1]))
+        for start in range(0, len(embeddings), rows):
+            digest.update(np.ascontiguousarray(embeddings[start:start + rows]))
+        digest.update(metadata_bytes)
+        if relations_bytes is not None:
+            digest.update(relations_bytes)
+        if f"sha256:{digest.hexdigest()}" != manifest["checksum"]:
+            raise ValueError("Checksum del snapshot inválido")
+
+    ids, documents, metadatas = _from_columns(json.loads(metadata_bytes))
+    relations = RelationGraph.from_bytes(relations_bytes) if relations_bytes is not None else None
+    return IndexSnapshot(manifest, ids, documents, metadatas, embeddings, relations)
+
+
+def import_snapshot(snapshot: IndexSnapshot, collection, batch_size: int = 1000) -> int:
+    """
+    Upserts a snapshot into a Chroma collection using the stored embeddings,
+    so no embedding work is done.
+
+    @param snapshot: Loaded snapshot
+    @param collection: Target with a Chroma-style upsert(): a collection or a Retriever
+    @param batch_size: Documents per upsert call
+    @return: Number of documents imported
+    @rtype: int
+    """
+    for start in range(0, len(snapshot), batch_size):
+        end = start + batch_size
+        collection.upsert(
+            ids=snapshot.ids[start:end],
+            embeddings=snapshot.embeddings[start:end].astype(np.float32).tolist(),
+            documents=snapshot.documents[start:end],
+            metadatas=snapshot.metadatas[start:end]
+        )
+    return len(snapshot)
+
+
+def _pages(collections: List, page_size: int):
+    """
+    Yields (collection, offset) pairs covering every document of every collection.
+    """
+    for collection in collections:
+        for offset in range(0, collection.count(), page_size):
+            yield collection, offset
+
+
+def _to_columns(ids: List[str], documents: List[str], metadatas: List[Dict]) -> Dict:
+    """
+    Converts row metadata into columns; missing fields are stored as None.
+    """
+    keys = sorted({key for meta in metadatas for key in (meta or {})})
+    return {
+        "ids": ids,
+        "documents": documents,
+        "metadata": {key: [(meta or {}).get(key) for meta in metadatas] for key in keys}
+    }
+
+
+def _from_columns(columns: Dict) -> tuple:
+    """
+    Converts columnar metadata back into rows, dropping missing fields.
+    """
+    ids = columns["ids"]
+    metadatas = [{} for _ in ids]
+    for key, values in columns["metadata"].items():
+        for meta, value in zip(metadatas, values):
+            if value is not None:
+                meta[key] = value
+    return ids, columns["documents"], metadatas
+
+
+def _memmap_member(path: str, info: zipfile.ZipInfo) -> np.ndarray:
+    """
+    Memory-maps an uncompressed .npy member of a zip file in place.
+    """
+    with open(path, "rb") as f:
+        # Cabecera local del zip: 30 bytes fijos + nombre + campo extra
+        f.seek(info.header_offset)
+        local_header = f.read(30)
+        name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        data_offset = f.tell()
+
+    if 0 in shape:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=data_offset, shape=shape,
+                     order="F" if fortran_order else "C")
@@ -1,6 +1,13 @@
 from typing import Dict, List
 from .retriever import Retriever
 from .generator import Generator
+from .reindex import ReindexManager
+from .search_backends import distance_to_similarity
+from ..utils.debug import debug_print
+from ..config.settings import get_settings
+from langdetect import detect
+
+settings = get_settings()
 
 class RAGEngine:
     """
@@ -14,36 +21,95 @@ class RAGEngine:
         print("Inicializando RAG Engine...")
         self.retriever = Retriever()
         self.generator = Generator()
+        self.reindexer = ReindexManager(self.retriever)
         print(f"RAG Engine inicializado. Documentos en la colección: {self.retriever.count_documents()}")
 
+    @property
+    def relations(self):
+        """
+        Relation graph of the collection set being served; it follows reindex
+        switches and rollbacks together with the collections.
+        """
+        return self.retriever.relations
+
     async def process_query(self, question: str, conversation_id: str = None) -> Dict:
         """
         Processes a question using RAG architecture.
         
         @param question: User's question
         @type question: str
+        @param conversation_id: Optional conversation to continue
+        @type conversation_id: str
         @return: Dictionary containing answer, confidence, sources and context
         @rtype: Dict
         """
-        # Buscar información relevante
-        results = self.retriever.search(question)
+        # Buscar información relevante y preparar contexto
+        results, context = await self._retrieve(question)
+        confidence = self._calculate_confidence(results)
+        has_facts = any(item['type'] == 'relation' for item in context)
         
-        # Preparar contexto
-        context = self._prepare_context(results)
-        
-        # Generar respuesta
-        response, conversation_id = self.generator.generate_response(question, context, conversation_id)
+        # Generar respuesta. Sin contexto relevante (y sin historial que pueda darle
+        # sentido a la pregunta) se responde "clasificado" sin llamar al modelo
+        if confidence < settings.CONFIDENCE_THRESHOLD and not has_facts and not self.generator.has_history(conversation_id):
+            debug_print(f"Confianza baja ({confidence}), se omite la llamada al modelo")
+            response, conversation_id, model = await self.generator.classified_response(question, conversation_id)
+        else:
+            response, conversation_id, model = await self.generator.generate_response(
+                question, context, conversation_id, index=self.retriever.index_version()
+            )
          
         # Preparar fuentes
         sources = self._prepare_sources(results)
         
         return {
             "answer": response,
-            "confidence": self._calculate_confidence(results),
+            "confidence": confidence,
             "sources": self._prepare_sources(results),
             "context_used": str(context)[:200] + "..." if context else None,
-            "conversation_id": conversation_id
+            "conversation_id": conversation_id,
+            "model": model
         }
+
+    async def precompute_answer(self, question: str) -> str:
+        """
+        Answers a standalone question without touching the response cache or the
+        conversation log. Used by the offline cache warming job.
+        
+        @param question: Question to answer
+        @type question: str
+        @return: Generated answer
+        @rtype: str
+        """
+        results, context = await self._retrieve(question)
+        answer, _ = await self.generator.generate_text(question, context, detect(question))
+        return answer
+
+    async def _retrieve(self, question: str) -> tuple:
+        """
+        Retrieves documents for a question and builds the generation context.
+        Relational questions get exact facts from the relation graph and fewer
+        retrieved documents.
+        
+        @param question: User's question
+        @return: Tuple of (raw retrieval results, context items)
+        @rtype: tuple
+        """
+        facts = self.relations.facts_for(question) if self.relations else []
+
+        if facts:
+            results = await self.retriever.asearch(question, n_results=settings.RELATION_N_RESULTS)
+        else:
+            results = await self.retriever.asearch(question)
+
+        context = self._prepare_context(results)
+        if facts:
+            context.insert(0, {
+                "type": "relation",
+                "content": "\n".join(facts),
+                "metadata": {"type": "relation"}
+            })
+        return results, context
+
     def _prepare_context(self, results) -> List[Dict]:
         """
         Prepares context information from retrieval results.
@@ -90,7 +156,17 @@ class RAGEngine:
     
     def _calculate_confidence(self, results) -> float:
         """
-        Calculates a confidence score based on the search results.
+        Calculates a confidence score from the retrieval distances. Distances are
+        converted to cosine similarity with the distance space stored in the
+        collection each result comes from (see Retriever.spaces);
+        similarities are mapped linearly from CONFIDENCE_MIN_SIMILARITY (0) to
+        CONFIDENCE_MAX_SIMILARITY (1). The best match weighs most, the top three
+        smooth out a single lucky hit: 0.7 * best + 0.3 * mean(top 3).
+
+        The thresholds are cosine similarities whatever the distance space, which
+        assumes normalized embeddings (see distance_to_similarity). The defaults
+        were picked by hand for the default MiniLM embedding model, not calibrated
+        on labelled queries; re-tune them when the embedding model changes.
         
         @param results: Raw results from retriever
         @type results: Dict
@@ -99,7 +175,36 @@ class RAGEngine:
         """
         if not results.get('documents') or not results['documents'][0]:
             return 0.0
-            
+
+        distances = results.get('distances') or [[]]
+        metadatas = results.get('metadatas') or [[]]
+        similarities = [
+            distance_to_similarity(d, self.retriever.spaces.get((meta or {}).get('type'), settings.HNSW_SPACE))
+            for d, meta in zip(distances[0], metadatas[0]) if d is not None
+        ]
+        if not similarities:
+            return self._heuristic_confidence(results)
+
+        low = settings.CONFIDENCE_MIN_SIMILARITY
+        high = settings.CONFIDENCE_MAX_SIMILARITY
+        scores = sorted(
+            (min(max((similarity - low) / (high - low), 0.0), 1.0) for similarity in similarities),
+            reverse=True
+        )
+        top = scores[:3]
+        final_score = scores[0] * 0.7 + (sum(top) / len(top)) * 0.3
+        return round(final_score, 2)
+
+    def _heuristic_confidence(self, results) -> float:
+        """
+        Fallback confidence when the backend returns no distances, based on
+        document count, type diversity and text length.
+        
+        @param results: Raw results from retriever
+        @type results: Dict
+        @return: Confidence score between 0 and 1
+        @rtype: float
+        """
         # Factores para calcular la confianza:
         # 1. Número de documentos encontrados
         doc_count = len(results['documents'][0])
@@ -117,5 +222,6 @@ class RAGEngine:
         final_score = (doc_score * 0.4 + diversity_score * 0.3 + length_score * 0.3)
         
         return round(final_score, 2)    
+
     def get_conversation_history(self, conversation_id: str):
         return self.generator.get_conversation_history(conversation_id)
\ No newline at end of file
@@ -0,0 +1,422 @@
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+import asyncio
+import json
+import os
+import sys
+import time
+import traceback
+import uuid
+from .collection_alias import parse_version, versioned_name
+from .data_loader import DataLoader
+from .relation_graph import RelationGraph
+from .retriever import DOCUMENT_TYPES, Retriever
+from .rick_morty_api import RickMortyAPI
+from ..config.settings import get_settings
+
+settings = get_settings()
+
+
+def reindex_batch_size() -> int:
+    """
+    Documents embedded per reindex batch. With the shared embedding server a batch
+    is capped at half the server's merge limit: a larger one would run alone and
+    make the queries arriving meanwhile wait for it.
+
+    @return: Batch size
+    @rtype: int
+    """
+    if settings.EMBEDDING_BACKEND == "server":
+        return max(1, min(settings.REINDEX_BATCH_SIZE, settings.EMBEDDING_BATCH_MAX_SIZE // 2))
+    return settings.REINDEX_BATCH_SIZE
+
+
+class ReindexJob:
+    """
+    State and progress of a background reindex.
+    """
+    def __init__(self, target: str):
+        """
+        @param target: Versioned collection set being built
+        """
+        self.id = uuid.uuid4().hex
+        self.target = target
+        self.status = "pending"  # pending, running, completed, failed
+        self.phase = None        # fetching, building, validating, switching, pruning
+        self.processed = 0
+        self.total = None
+        self.counts = {}
+        self.previous = None
+        self.error = None
+        self.started_at = datetime.now().isoformat()
+        self.finished_at = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "target": self.target,
+            "status": self.status,
+            "phase": self.phase,
+            "processed": self.processed,
+            "total": self.total,
+            # El total estimado no incluye los fragmentos de transcripción
+            "progress": round(min(self.processed / self.total, 1.0), 4) if self.total else 0.0,
+            "counts": self.counts,
+            "previous": self.previous,
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class ReindexLock:
+    """
+    Lock file shared by every process (API worker) serving the same store. Reindex
+    jobs live in the memory of the worker that started them, so without it another
+    worker could start a second reindex or roll back in the middle of one. The file
+    is created with O_EXCL and holds the owner PID; a lock left by a dead process is
+    taken over.
+    """
+    # Segundos que se tolera un archivo vacío (recién creado, aún sin escribir)
+    UNWRITTEN_GRACE = 5.0
+    # Locks tomados por este proceso (por ruta)
+    _held_paths = set()
+
+    def __init__(self, path: str):
+        """
+        @param path: Lock file (Settings.REINDEX_LOCK_PATH)
+        """
+        self.path = path
+        self.held = False
+
+    def acquire(self, owner: str) -> bool:
+        """
+        @param owner: Description of the operation holding the lock (job id, "rollback")
+        @return: Whether the lock was acquired
+        @rtype: bool
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        for _ in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self.holder() is not None:
+                    return False
+                # Dueño muerto: se libera y se reintenta una vez
+                try:
+                    os.remove(self.path)
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, "w") as f:
+                json.dump({"pid": os.getpid(), "owner": owner, "since": datetime.now().isoformat()}, f)
+            self.held = True
+            self._held_paths.add(self.path)
+            return True
+        return False
+
+    def release(self):
+        """
+        Removes the lock file if this process holds it.
+        """
+        if not self.held:
+            return
+        self.held = False
+        self._held_paths.discard(self.path)
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def holder(self) -> Optional[Dict]:
+        """
+        @return: Contents of the lock file if a live process holds it, otherwise None
+        @rtype: Dict
+        """
+        try:
+            with open(self.path, "r") as f:
+                content = f.read()
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return None
+        try:
+            info = json.loads(content)
+        except json.JSONDecodeError:
+            return {"pid": None} if time.time() - mtime < self.UNWRITTEN_GRACE else None
+        pid = info.get("pid")
+        if pid == os.getpid():
+            # Restos de este mismo PID (p. ej. un contenedor reiniciado) no bloquean
+            return info if self.path in self._held_paths else None
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return None
+        except PermissionError:
+            pass
+        return info
+
+
+class ReindexManager:
+    """
+    Zero-downtime reindexing with blue/green collection sets.
+
+    A job fetches fresh data, builds a new versioned collection set next to the one
+    being served, validates its counts and then switches the CollectionAlias, so
+    the Retriever (and every other process) starts serving it atomically. The
+    previous set is kept for rollback; older versions are deleted. Each set carries
+    its own relation graph, so a switch or rollback swaps both. Ingestion runs
+    in small batches off the event loop, with a pause between batches, so queries
+    keep being served during the rebuild. A ReindexLock keeps other workers from
+    reindexing or rolling back at the same time.
+    """
+    def __init__(self, retriever: Retriever):
+        """
+        @param retriever: Retriever serving the queries
+        """
+        self.retriever = retriever
+        self.api = RickMortyAPI()
+        self.data_loader = DataLoader()
+        self.jobs: Dict[str, ReindexJob] = {}
+        self.current: Optional[ReindexJob] = None
+        self._task = None
+        self.lock = ReindexLock(settings.REINDEX_LOCK_PATH)
+        self._warm_task = None
+        self._warm_process = None
+
+    def running(self) -> bool:
+        return self.current is not None and self.current.status in ("pending", "running")
+
+    async def start(self) -> ReindexJob:
+        """
+        Starts a reindex in the background.
+
+        @return: The new job
+        @rtype: ReindexJob
+        @raises RuntimeError: If a reindex or rollback is already running, in this or another process
+        """
+        if self.running():
+            raise RuntimeError(f"Ya hay un reindexado en curso: {self.current.id}")
+        # El lock y la próxima versión leen disco y Chroma: fuera del event loop
+        job = ReindexJob(await asyncio.to_thread(self._reserve_target))
+        self.jobs[job.id] = job
+        self.current = job
+        self._task = asyncio.create_task(self._run(job))
+        return job
+
+    def _reserve_target(self) -> str:
+        """
+        Takes the ReindexLock and picks the name of the next collection set. Blocking.
+
+        @return: Name of the collection set to build
+        @rtype: str
+        @raises RuntimeError: If another reindex or rollback holds the lock
+        """
+        # La versión se elige con el lock tomado: otro worker podría elegir la misma
+        if not self.lock.acquire("reindex"):
+            raise RuntimeError(self._busy_message())
+        try:
+            return versioned_name(settings.COLLECTION_NAME, self._next_version())
+        except Exception:
+            self.lock.release()
+            raise
+
+    def get(self, job_id: str) -> Optional[ReindexJob]:
+        return self.jobs.get(job_id)
+
+    def rollback(self) -> Dict:
+        """
+        Serves the previous collection set again. Blocking: call it off the event loop.
+
+        @return: New alias state
+        @rtype: Dict
+        @raises RuntimeError: If a reindex or rollback is running, in this or another process
+        @raises ValueError: If there is no previous collection set, or it no longer exists
+        """
+        if self.running():
+            raise RuntimeError("No se puede restaurar durante un reindexado")
+        if not self.lock.acquire("rollback"):
+            raise RuntimeError(self._busy_message())
+        try:
+            previous = self.retriever.alias.state()["previous"]
+            if not previous:
+                raise ValueError("No hay versión anterior para restaurar")
+            return self.retriever.switch_to(previous)
+        finally:
+            self.lock.release()
+
+    def _busy_message(self) -> str:
+        holder = self.lock.holder() or {}
+        return f"Otro proceso (pid {holder.get('pid')}) está reindexando o restaurando: {holder.get('owner')}"
+
+    def versions(self) -> List[Dict]:
+        """
+        Lists the collection sets present in the store with their document counts.
+        Blocking: call it off the event loop.
+
+        @return: One entry per collection set
+        @rtype: List[Dict]
+        """
+        state = self.retriever.alias.state()
+        sets = []
+        for name in self._collection_sets():
+            counts = {doc_type: self._count(name, doc_type) for doc_type in DOCUMENT_TYPES}
+            sets.append({
+                "name": name,
+                "version": parse_version(settings.COLLECTION_NAME, name),
+                "active": name == state["active"],
+                "previous": name == state["previous"],
+                "counts": counts,
+                "relations": os.path.exists(self.retriever.relations_path_for(name))
+            })
+        return sets
+
+    async def _run(self, job: ReindexJob):
+        job.status = "running"
+        try:
+            print(f"Reindexado {job.id}: construyendo {job.target}")
+            job.phase = "fetching"
+            if self.data_loader.has_local_data():
+                # En streaming: el total se conoce al terminar de construir
+                data = self.data_loader.stream_all()
+            else:
+                data = await self.api.fetch_all_data()
+                job.total = len(data['characters']) + len(data['episodes'])
+            graph = await asyncio.to_thread(RelationGraph.from_api_data, data)
+            transcriptions = self.data_loader.transcript_index()
+
+            job.phase = "building"
+            # Restos de un intento fallido con el mismo nombre
+            await asyncio.to_thread(self._drop_set, job.target)
+            collections = await asyncio.to_thread(self.retriever.open_collections, job.target)
+            expected = Counter()
+            documents = self.api.iter_documents_for_embedding(data, transcriptions)
+            batches = self.data_loader.iter_batches(documents, reindex_batch_size())
+            while True:
+                # Leer archivos y transcripciones también fuera del event loop
+                batch = await asyncio.to_thread(next, batches, None)
+                if batch is None:
+                    break
+                await asyncio.to_thread(self.retriever.add_documents, batch, collections)
+                expected.update(doc['metadata']['type'] for doc in batch)
+                job.processed += len(batch)
+                # Ceder CPU a las consultas entre lotes
+                await asyncio.sleep(settings.REINDEX_BATCH_PAUSE)
+            job.total = job.processed
+
+            job.phase = "validating"
+            job.counts = await asyncio.to_thread(self._validate, collections, expected)
+
+            # El grafo se guarda con la versión, antes del cambio, para activarse junto a ella
+            await asyncio.to_thread(graph.save, self.retriever.relations_path_for(job.target))
+
+            job.phase = "switching"
+            job.previous = self.retriever.collection_name
+            await asyncio.to_thread(self.retriever.switch_to, job.target)
+
+            job.phase = "pruning"
+            await asyncio.to_thread(self._prune)
+            job.status = "completed"
+            print(f"Reindexado {job.id} completado: sirviendo {job.target} ({sum(job.counts.values())} documentos)")
+            if settings.WARM_CACHE:
+                self._warm_task = asyncio.create_task(self._warm_cache())
+        except Exception as e:
+            job.error = str(e)
+            print(f"Error en reindexado {job.id}: {str(e)}")
+            print(f"Traceback completo: {traceback.format_exc()}")
+            if job.target != self.retriever.collection_name:
+                await asyncio.to_thread(self._drop_set, job.target)
+            job.status = "failed"
+        finally:
+            job.finished_at = datetime.now().isoformat()
+            self.lock.release()
+
+    async def _warm_cache(self):
+        """
+        Precomputes the frequent answers again for the new collection set
+        (src/warm_cache.py). The saved answers are tied to the index they were built
+        from, so the old ones stop being served at the switch. It runs in its own
+        process, rate limited, and a warm-up still running for an older set is stopped.
+        """
+        if self._warm_process is not None and self._warm_process.returncode is None:
+            self._warm_process.terminate()
+        try:
+            self._warm_process = process = await asyncio.create_subprocess_exec(sys.executable, "-m", "src.warm_cache")
+            returncode = await process.wait()
+        except Exception as e:
+            print(f"Error precalculando respuestas tras el reindexado: {str(e)}")
+            return
+        if returncode != 0:
+            print(f"El precálculo de respuestas terminó con código {returncode}")
+
+    def _validate(self, collections: Dict, expected: Counter) -> Dict[str, int]:
+        """
+        Checks the new collection set before it is served.
+
+        @return: Document count per type
+        @raises ValueError: If counts do not match the ingested documents or are too low
+        """
+        counts = {doc_type: collection.count() for doc_type, collection in collections.items()}
+        for doc_type, count in counts.items():
+            if count != expected.get(doc_type, 0):
+                raise ValueError(f"Colección {doc_type}: {count} documentos, se esperaban {expected.get(doc_type, 0)}")
+
+        total = sum(counts.values())
+        if total == 0:
+            raise ValueError("La nueva versión está vacía")
+        live_total = self.retriever.count_documents()
+        if live_total and total < live_total * settings.REINDEX_MIN_COUNT_RATIO:
+            raise ValueError(f"La nueva versión tiene {total} documentos frente a {live_total} en servicio")
+        return counts
+
+    def _prune(self):
+        """
+        Deletes every collection set except the active and the previous one.
+        """
+        state = self.retriever.alias.state()
+        for name in self._collection_sets():
+            if name not in (state["active"], state["previous"]):
+                self._drop_set(name)
+                print(f"Versión {name} eliminada")
+
+    def _collection_sets(self) -> List[str]:
+        """
+        @return: Names of the collection sets (unversioned and versioned) in the store
+        """
+        alias = settings.COLLECTION_NAME
+        suffixes = tuple(f"_{doc_type}s" for doc_type in DOCUMENT_TYPES)
+        names = set()
+        for collection in self.retriever.client.list_collections():
+            name = collection if isinstance(collection, str) else collection.name
+            for suffix in suffixes:
+                if name.endswith(suffix):
+                    base = name[:-len(suffix)]
+                    if base == alias or parse_version(alias, base) is not None:
+                        names.add(base)
+        return sorted(names, key=lambda name: parse_version(alias, name) or 0)
+
+    def _count(self, collection_set: str, doc_type: str) -> int:
+        try:
+            return self.retriever.client.get_collection(
+                name=self.retriever.collection_name_for(doc_type, collection_set)
+            ).count()
+        except Exception:
+            return 0
+
+    def _drop_set(self, collection_set: str):
+        for doc_type in DOCUMENT_TYPES:
+            try:
+                self.retriever.client.delete_collection(name=self.retriever.collection_name_for(doc_type, collection_set))
+            except Exception:
+                pass
+        try:
+            os.remove(self.retriever.relations_path_for(collection_set))
+        except FileNotFoundError:
+            pass
+
+    def _next_version(self) -> int:
+        alias = settings.COLLECTION_NAME
+        versions = [parse_version(alias, name) or 0 for name in self._collection_sets()]
+        state = self.retriever.alias.state()
+        versions += [parse_version(alias, name) or 0 for name in (state["active"], state["previous"]) if name]
+        return max(versions, default=0) + 1
@@ -0,0 +1,294 @@
+import io
+import os
+import re
+from typing import Dict, List, Optional
+import numpy as np
+
+class RelationGraph:
+    """
+    Character–episode adjacency index built from the Rick and Morty API data.
+
+    Both directions are stored in CSR form (offsets + flat arrays of integer ids),
+    so "episodes of a character" and "characters of an episode" are slices, and
+    co-appearances are a single bincount.
+    """
+    # Preguntas relacionales: apariciones y personajes compartidos
+    APPEARANCE_PATTERN = re.compile(
+        r"\b(en qu[ée] episodios?|qu[ée] episodios?|which episodes?|what episodes?|aparece|aparecen|appears?|sale|salen)\b",
+        re.IGNORECASE
+    )
+    COSTAR_PATTERN = re.compile(
+        r"\b(con qui[ée]n|junto a|junto con|aparece con|appears? with|alongside|who else)\b",
+        re.IGNORECASE
+    )
+    CAST_PATTERN = re.compile(
+        r"\b(qu[ée] personajes|qui[ée]nes aparecen|qui[ée]n aparece|which characters|who appears in|cast)\b",
+        re.IGNORECASE
+    )
+    # Palabras comunes que empiezan nombres de personajes ("Alien Googah", "King
+    # Jellybean"): no identifican a nadie solas, y un nombre de una sola palabra
+    # igual a una de ellas solo cuenta escrito con mayúscula
+    COMMON_WORDS = frozenset({
+        "alien", "baby", "king", "queen", "prince", "princess", "president", "principal",
+        "doctor", "professor", "mister", "agent", "captain", "general", "officer", "sergeant",
+        "evil", "giant", "ghost", "robot", "little", "young", "cool", "crazy", "tiny", "toxic",
+        "space", "super", "mega", "hologram", "hunter", "lawyer", "pilot", "teacher", "father",
+        "mother", "uncle", "grandpa", "abuelo", "abuela", "señor", "señora", "reina", "presidente"
+    })
+
+    def __init__(self, char_ids: np.ndarray, char_names: np.ndarray, ep_ids: np.ndarray,
+                 ep_names: np.ndarray, ep_codes: np.ndarray, char_offsets: np.ndarray,
+                 char_episodes: np.ndarray, ep_offsets: np.ndarray, ep_characters: np.ndarray):
+        """
+        Builds the graph from its arrays; use from_api_data() or load() instead.
+        Rows of each side are sorted by id; adjacency arrays hold row positions.
+        """
+        self.char_ids = char_ids
+        self.char_names = char_names
+        self.ep_ids = ep_ids
+        self.ep_names = ep_names
+        self.ep_codes = ep_codes
+        self.char_offsets = char_offsets
+        self.char_episodes = char_episodes
+        self.ep_offsets = ep_offsets
+        self.ep_characters = ep_characters
+        self._build_name_index()
+
+    @classmethod
+    def from_api_data(cls, data: Dict) -> "RelationGraph":
+        """
+        Builds the graph from the output of RickMortyAPI.fetch_all_data().
+
+        @param data: Dictionary with 'characters' and 'episodes'; each list is read
+            once, so they can be iterators (see DataLoader.stream_all)
+        @return: Relation graph
+        @rtype: RelationGraph
+        """
+        # Una sola pasada por cada lista (pueden ser iteradores sobre el archivo):
+        # de cada elemento se guarda solo el id, el nombre y los episodios
+        ep_ids, ep_names, ep_codes = [], [], []
+        for ep in data['episodes']:
+            ep_ids.append(ep['id'])
+            ep_names.append(ep['name'])
+            ep_codes.append(ep['episode'])
+        ep_order = np.argsort(np.array(ep_ids, dtype=np.int32), kind="stable")
+        ep_ids = np.array(ep_ids, dtype=np.int32)[ep_order]
+        ep_rows = {ep_id: row for row, ep_id in enumerate(ep_ids.tolist())}
+
+        char_ids, char_names, char_episode_rows = [], [], []
+        for char in data['characters']:
+            char_ids.append(char['id'])
+            char_names.append(char['name'])
+            episode_ids = (int(url.rstrip('/').split('/')[-1]) for url in char.get('episode', []))
+            char_episode_rows.append(np.array(sorted({ep_rows[ep_id] for ep_id in episode_ids if ep_id in ep_rows}),
+                                            dtype=np.int32))
+        char_order = np.argsort(np.array(char_ids, dtype=np.int32), kind="stable")
+        char_ids = np.array(char_ids, dtype=np.int32)[char_order]
+
+        # Personaje -> episodios (posiciones de fila)
+        rows = [char_episode_rows[i] for i in char_order.tolist()]
+        lengths = [len(r) for r in rows]
+        char_offsets = np.zeros(len(char_ids) + 1, dtype=np.int32)
+        np.cumsum(lengths, out=char_offsets[1:])
+        char_episodes = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+
+        # Episodio -> personajes, derivado del anterior para que sea simétrico
+        char_rows = np.repeat(np.arange(len(char_ids), dtype=np.int32), lengths)
+        order = np.lexsort((char_rows, char_episodes))
+        ep_characters = char_rows[order]
+        ep_offsets = np.zeros(len(ep_ids) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(char_episodes, minlength=len(ep_ids)), out=ep_offsets[1:])
+
+        return cls(
+            char_ids=char_ids,
+            char_names=np.array(char_names, dtype=str)[char_order],
+            ep_ids=ep_ids,
+            ep_names=np.array(ep_names, dtype=str)[ep_order],
+            ep_codes=np.array(ep_codes, dtype=str)[ep_order],
+            char_offsets=char_offsets,
+            char_episodes=char_episodes,
+            ep_offsets=ep_offsets,
+            ep_characters=ep_characters
+        )
+
+    def save(self, path: str):
+        """
+        Persists the graph as a compressed .npz file.
+
+        @param path: Destination file
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    def to_bytes(self) -> bytes:
+        """
+        @return: The graph serialized as a compressed .npz archive
+        @rtype: bytes
+        """
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            char_ids=self.char_ids,
+            char_names=self.char_names,
+            ep_ids=self.ep_ids,
+            ep_names=self.ep_names,
+            ep_codes=self.ep_codes,
+            char_offsets=self.char_offsets,
+            char_episodes=self.char_episodes,
+            ep_offsets=self.ep_offsets,
+            ep_characters=self.ep_characters
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def load(cls, path: str) -> Optional["RelationGraph"]:
+        """
+        Loads a graph saved with save().
+
+        @param path: .npz file
+        @return: Relation graph, or None if the file does not exist
+        @rtype: RelationGraph
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "RelationGraph":
+        """
+        Loads a graph serialized with to_bytes().
+
+        @param data: Compressed .npz archive
+        @return: Relation graph
+        @rtype: RelationGraph
+        """
+        with np.load(io.BytesIO(data)) as arrays:
+            return cls(**{name: arrays[name] for name in arrays.files})
+
+    def episodes_of(self, char_row: int) -> np.ndarray:
+        """
+        @param char_row: Character row position
+        @return: Episode row positions the character appears in
+        """
+        return self.char_episodes[self.char_offsets[char_row]:self.char_offsets[char_row + 1]]
+
+    def characters_in(self, ep_row: int) -> np.ndarray:
+        """
+        @param ep_row: Episode row position
+        @return: Character row positions appearing in the episode
+        """
+        return self.ep_characters[self.ep_offsets[ep_row]:self.ep_offsets[ep_row + 1]]
+
+    def co_appearances(self, char_row: int, limit: int = 10) -> List[tuple]:
+        """
+        Characters sharing the most episodes with the given character.
+
+        @param char_row: Character row position
+        @param limit: Maximum number of characters returned
+        @return: List of (character row, shared episode count)
+        @rtype: List[tuple]
+        """
+        episodes = self.episodes_of(char_row)
+        if len(episodes) == 0:
+            return []
+        starts = self.ep_offsets[episodes]
+        ends = self.ep_offsets[episodes + 1]
+        neighbours = np.concatenate([self.ep_characters[s:e] for s, e in zip(starts, ends)])
+        counts = np.bincount(neighbours, minlength=len(self.char_ids))
+        counts[char_row] = 0
+        top = np.argsort(-counts, kind="stable")[:limit]
+        return [(int(row), int(counts[row])) for row in top if counts[row] > 0]
+
+    def find_characters(self, text: str) -> List[int]:
+        """
+        Finds the characters mentioned in a text, by full name (in any case) or by
+        first name. A first name only counts written with a capital letter ("Summer",
+        not "summer") and if it is not a common word (COMMON_WORDS); it resolves to
+        the character with that first name and the most appearances.
+
+        @param text: Free text, typically the user question
+        @return: Character row positions, longest names first
+        @rtype: List[int]
+        """
+        found = []
+        for pattern, row in self._char_patterns:
+            if pattern.search(text):
+                if row not in found:
+                    found.append(row)
+                # Evitar que "Rick" vuelva a coincidir si ya se encontró "Rick Sanchez"
+                text = pattern.sub(" ", text)
+        return found
+
+    def find_episodes(self, text: str) -> List[int]:
+        """
+        Finds the episodes mentioned in a text by name or code (e.g. S01E01).
+
+        @param text: Free text
+        @return: Episode row positions
+        @rtype: List[int]
+        """
+        lowered = text.lower()
+        return [row for row, (pattern, code) in enumerate(zip(self._ep_patterns, self.ep_codes))
+                if code.lower() in lowered or pattern.search(lowered)]
+
+    def facts_for(self, question: str, max_items: int = 20) -> List[str]:
+        """
+        Answers relational questions directly from the graph.
+
+        @param question: User question
+        @param max_items: Maximum entities listed per fact line
+        @return: Fact lines for the prompt; empty if the question is not relational
+        @rtype: List[str]
+        """
+        facts = []
+        characters = self.find_characters(question)
+        episodes = self.find_episodes(question)
+
+        if self.COSTAR_PATTERN.search(question):
+            for row in characters[:2]:
+                partners = self.co_appearances(row, max_items)
+                listed = ", ".join(f"{self.char_names[p]} ({n})" for p, n in partners)
+                facts.append(f"Personajes que comparten más episodios con {self.char_names[row]}: {listed}")
+        elif self.CAST_PATTERN.search(question) and episodes:
+            for row in episodes[:2]:
+                cast = self.characters_in(row)
+                listed = ", ".join(str(self.char_names[c]) for c in cast[:max_items])
+                extra = f" y {len(cast) - max_items} más" if len(cast) > max_items else ""
+                facts.append(f"Personajes en {self.ep_codes[row]} '{self.ep_names[row]}' ({len(cast)}): {listed}{extra}")
+        elif self.APPEARANCE_PATTERN.search(question) and characters:
+            for row in characters[:2]:
+                eps = self.episodes_of(row)
+                listed = ", ".join(f"{self.ep_codes[e]} '{self.ep_names[e]}'" for e in eps[:max_items])
+                extra = f" y {len(eps) - max_items} más" if len(eps) > max_items else ""
+                facts.append(f"{self.char_names[row]} aparece en {len(eps)} episodios: {listed}{extra}")
+        return facts
+
+    def _build_name_index(self):
+        """
+        Precompiles the name patterns used by find_characters and find_episodes,
+        longest character names first so full names win over first names.
+        """
+        appearances = np.diff(self.char_offsets)
+        best = {}
+        first_names = {}
+        for row, name in enumerate(self.char_names.tolist()):
+            key = name.lower()
+            if key not in best or appearances[row] > appearances[best[key]]:
+                best[key] = row
+            words = name.split()
+            if len(words) > 1 and len(words[0]) >= 4 and words[0][0].isupper() \
+                    and words[0].lower() not in self.COMMON_WORDS:
+                first_names.setdefault(words[0], []).append(row)
+
+        # (texto, fila, ignorar mayúsculas)
+        names = [(key, row, key not in self.COMMON_WORDS) for key, row in best.items()]
+        names += [(first, max(rows, key=lambda r: appearances[r]), False)
+                  for first, rows in first_names.items() if first.lower() not in best]
+        self._char_patterns = [
+            (re.compile(rf"\b{re.escape(name if ignore_case else name.capitalize())}\b",
+                        re.IGNORECASE if ignore_case else 0), row)
+            for name, row, ignore_case in sorted(names, key=lambda item: -len(item[0]))
+        ]
+        self._ep_patterns = [re.compile(rf"\b{re.escape(name.lower())}\b") for name in self.ep_names.tolist()]
@@ -0,0 +1,156 @@
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+import copy
+import json
+import os
+import threading
+import time
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache that keeps hit/miss counters.
+
+    Values are copied when stored and when returned, so callers can modify what
+    they get (or what they stored) without corrupting the cached entry.
+    """
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        """
+        @param max_size: Maximum number of entries; 0 disables the cache
+        @param ttl: Seconds an entry stays valid; None or 0 keeps it until evicted
+        """
+        self.max_size = max_size
+        self.ttl = ttl or None
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        """
+        @return: Copy of the cached value, or None on a miss or an expired entry
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                value = entry[0]
+            else:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+        return copy.deepcopy(value)
+
+    def put(self, key: Hashable, value):
+        if self.max_size <= 0:
+            return
+        value = copy.deepcopy(value)
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict:
+        """
+        @return: Size, hits, misses and hit rate
+        @rtype: Dict
+        """
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+
+class CollectionVersion:
+    """
+    Generation counter of a collection, persisted in a small JSON file next to the
+    vector store so every process (API workers, init_db, snapshot imports) sees
+    the same value. Ingestion bumps it; caches include it in their keys.
+    """
+    def __init__(self, path: str, collection_name: str):
+        """
+        @param path: JSON file mapping collection names to generations
+        @param collection_name: Collection tracked by this instance
+        """
+        self.path = path
+        self.collection_name = collection_name
+        self.lock = threading.Lock()
+        self._mtime = None
+        self._generation = 0
+
+    def current(self) -> int:
+        """
+        Returns the current generation. The file is only re-read when its
+        modification time changes, so this is a single stat() per call.
+
+        @return: Collection generation
+        @rtype: int
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+        if mtime != self._mtime:
+            with self.lock:
+                self._generation = self._read().get(self.collection_name, 0)
+                self._mtime = mtime
+        return self._generation
+
+    def bump(self) -> int:
+        """
+        Increments the generation after the collection changed.
+
+        @return: New generation
+        @rtype: int
+        """
+        with self.lock:
+            versions = self._read()
+            versions[self.collection_name] = versions.get(self.collection_name, 0) + 1
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(versions, f)
+            os.replace(tmp_path, self.path)
+            self._generation = versions[self.collection_name]
+            self._mtime = None
+            return self._generation
+
+    def _read(self) -> Dict:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a query for cache keys: lowercase with collapsed whitespace.
+    The embedding model is uncased, so this does not change the embedding.
+
+    @param query: Raw query
+    @return: Normalized query
+    @rtype: str
+    """
+    return " ".join(query.lower().split())
+
+
+def search_cache_key(query: str, plan: Dict, generation: int, collection: str = "") -> str:
+    """
+    Builds the search result cache key from the normalized query, its sub-query
+    filters, the collection set served and its generation.
+    """
+    return json.dumps([normalize_query(query), plan, collection, generation], sort_keys=True)
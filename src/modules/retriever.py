@@ -1,68 +1,306 @@
 import chromadb
-from chromadb.utils import embedding_functions
-from typing import List, Dict
+from chromadb.api.client import SharedSystemClient
+from chromadb.errors import InvalidCollectionException
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
+import asyncio
+import functools
 import os
 import re
+import threading
 import traceback
+from ..config.settings import get_settings
+from .collection_alias import CollectionAlias
+from .embedding_service import EmbeddingClient, create_embedding_function
+from .relation_graph import RelationGraph
+from .search_backends import create_backend
+from ..utils.debug import debug_enabled, debug_print
+from .retrieval_cache import CollectionVersion, LRUCache, normalize_query, search_cache_key
+
+settings = get_settings()
+
+# Tipos de documento; cada uno tiene su propia colección e índice HNSW
+DOCUMENT_TYPES = ("episode", "character", "transcript")
 
 class Retriever:
     """
     Manages vector database operations using ChromaDB for document storage and retrieval.
     Handles persistence, document addition, and semantic search functionality.
+
+    Documents are stored in one collection per type (see DOCUMENT_TYPES), so each
+    sub-query searches its own index instead of filtering a mixed one. The set of
+    collections served is resolved through a CollectionAlias, so a reindex can build
+    a new versioned set and switch every process to it without downtime. Each set
+    has its own relation graph (see relations_path_for), activated together with it.
     """
     def __init__(self):
         """
         Initializes the Retriever with a persistent ChromaDB client.
-        Sets up the embedding function and creates/retrieves the collection.
+        Sets up the embedding function and creates/retrieves the per-type collections.
         
         @raises Exception: If there's an error creating or accessing the collection
         """
         # Configurar directorio para persistencia
-        persist_dir = "chroma_db"
-        os.makedirs(persist_dir, exist_ok=True)
+        self.persist_dir = "chroma_db"
+        os.makedirs(self.persist_dir, exist_ok=True)
         
         # Usar cliente persistente
-        self.client = chromadb.PersistentClient(path=persist_dir)
-        self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        self.client = chromadb.PersistentClient(path=self.persist_dir)
+        self.embedding_function = create_embedding_function()
         
+        self.alias = CollectionAlias(settings.COLLECTION_ALIAS_PATH, settings.COLLECTION_NAME)
+        # Reentrante: switch_to activa y cambia el alias sin soltarlo
+        self.switch_lock = threading.RLock()
+        self._unavailable_set = None
         try:
-            print("Intentando obtener colección existente...")
-            self.collection = self.client.get_or_create_collection(
-                name="rick_morty",
-                embedding_function=self.embedding_function
+            print("Intentando obtener colecciones existentes...")
+            self.embedding_cache = LRUCache(settings.EMBEDDING_CACHE_SIZE)
+            self.search_cache = LRUCache(settings.SEARCH_CACHE_SIZE, ttl=settings.SEARCH_CACHE_TTL)
+            active = self.alias.active()
+            # Solo el conjunto sin versión se crea al arrancar; uno versionado debe existir
+            self._activate(active, create=active == settings.COLLECTION_NAME)
+
+            if self.legacy_collection() is not None and self.count_documents() == 0:
+                print(f"¡ADVERTENCIA! Existe la colección única '{settings.COLLECTION_NAME}' sin migrar. "
+                      f"Ejecutar: python -m src.migrate_collections")
+            self.executor = ThreadPoolExecutor(
+                max_workers=settings.RETRIEVAL_MAX_WORKERS,
+                thread_name_prefix="retriever"
             )
-            doc_count = self.collection.count()
-            print(f"Colección obtenida/creada exitosamente. Documentos: {doc_count}")
+            # Un hilo abandonado por timeout sigue ocupando su lugar hasta terminar
+            self.admission = threading.BoundedSemaphore(settings.RETRIEVAL_MAX_PENDING)
+            print(f"Backend de búsqueda: {settings.SEARCH_BACKEND}")
         except Exception as e:
-            print(f"Error al obtener/crear colección: {str(e)}")
+            print(f"Error al obtener/crear colecciones: {str(e)}")
             print(f"Tipo de error: {type(e)}")
             print(f"Traceback completo: {traceback.format_exc()}")
             raise
 
-    def add_documents(self, documents: List[Dict]):
+    def collection_name_for(self, doc_type: str, collection_set: str = None) -> str:
+        """
+        @param doc_type: Document type
+        @param collection_set: Collection set name (default: the one being served)
+        @return: Name of the collection holding that type, e.g. "rick_morty_v2_episodes"
+        @rtype: str
+        """
+        return f"{collection_set or self.collection_name}_{doc_type}s"
+
+    def relations_path_for(self, collection_set: str = None) -> str:
+        """
+        @param collection_set: Collection set name (default: the one being served)
+        @return: Relation graph file of the set: Settings.RELATIONS_PATH for the
+            unversioned set, e.g. "chroma_db/relations_rick_morty_v2.npz" otherwise
+        @rtype: str
+        """
+        collection_set = collection_set or self.collection_name
+        if collection_set == settings.COLLECTION_NAME:
+            return settings.RELATIONS_PATH
+        root, ext = os.path.splitext(settings.RELATIONS_PATH)
+        return f"{root}_{collection_set}{ext}"
+
+    def _load_relations(self, collection_set: str) -> Optional[RelationGraph]:
+        """
+        Loads the relation graph of a collection set. Sets built before graphs were
+        versioned fall back to the unversioned graph.
+        """
+        path = self.relations_path_for(collection_set)
+        relations = RelationGraph.load(path)
+        if relations is None and path != settings.RELATIONS_PATH:
+            relations = RelationGraph.load(settings.RELATIONS_PATH)
+            if relations is not None:
+                print(f"Grafo de relaciones de {collection_set} no encontrado, se usa {settings.RELATIONS_PATH}")
+        if relations is None:
+            print(f"Grafo de relaciones no encontrado en {path}")
+        return relations
+
+    def open_collections(self, collection_set: str, create: bool = True) -> Dict:
+        """
+        Gets (or creates) the per-type collections of a collection set.
+        
+        @param collection_set: Collection set name, e.g. "rick_morty_v2"
+        @param create: Whether missing collections are created (building a set) or
+            are an error (serving one)
+        @return: Chroma collections by document type
+        @rtype: Dict
+        @raises ValueError: If create is False and a collection does not exist
+        """
+        collections = {}
+        for doc_type in DOCUMENT_TYPES:
+            name = self.collection_name_for(doc_type, collection_set)
+            if create:
+                collections[doc_type] = self.client.get_or_create_collection(
+                    name=name,
+                    embedding_function=self.embedding_function,
+                    metadata=self._hnsw_metadata(doc_type)
+                )
+                continue
+            try:
+                collections[doc_type] = self.client.get_collection(name=name, embedding_function=self.embedding_function)
+            except InvalidCollectionException:
+                raise ValueError(f"El conjunto de colecciones '{collection_set}' no existe (falta {name})")
+        return collections
+
+    def _activate(self, collection_set: str, create: bool = False):
+        """
+        Starts serving a collection set. The new collections and backends are built
+        first and then swapped in, so in-flight searches finish on the old ones.
+        Backends use the distance space stored in each collection, which may differ
+        from the configured one (see _stored_space). Blocking: call it off the event loop.
+        
+        @param collection_set: Collection set to serve
+        @param create: Whether to create the set if it does not exist (see open_collections)
+        @raises ValueError: If the set does not exist and create is False
+        """
+        with self.switch_lock:
+            collections = self.open_collections(collection_set, create=create)
+            spaces = {doc_type: self._stored_space(doc_type, collection) for doc_type, collection in collections.items()}
+            backends = {
+                doc_type: create_backend(settings.SEARCH_BACKEND, collection, settings.SEARCH_BACKEND_DTYPE, spaces[doc_type])
+                for doc_type, collection in collections.items()
+            }
+            version = CollectionVersion(settings.COLLECTION_VERSION_PATH, collection_set)
+            relations = self._load_relations(collection_set)
+            # Cargar los backends en memoria antes de servirlos (NumpyBackend)
+            for backend in backends.values():
+                if hasattr(backend, "load"):
+                    backend.load()
+
+            self.collections = collections
+            self.backends = backends
+            self.spaces = spaces
+            self.relations = relations
+            self.version = version
+            self.collection_name = collection_set
+            self._unavailable_set = None
+            self._backend_generation = version.current()
+            self.search_cache.clear()
+            for collection in collections.values():
+                print(f"Colección {collection.name} obtenida/creada exitosamente. Documentos: {collection.count()}")
+
+    def switch_to(self, collection_set: str) -> Dict:
         """
-        Adds documents to the vector database in batches.
+        Starts serving another collection set and then points the alias to it, so
+        the alias never names a set that could not be opened. Other processes follow
+        on their next search. Blocking: call it off the event loop.
+        
+        @param collection_set: Collection set to serve
+        @return: New alias state
+        @rtype: Dict
+        @raises ValueError: If the collection set does not exist
+        """
+        with self.switch_lock:
+            self._activate(collection_set)
+            return self.alias.switch(collection_set)
+
+    def _sync_alias(self):
+        """
+        Follows an alias switch made by another process (or an admin request). The
+        alias is read again under the switch lock, so concurrent searches that saw
+        the same change activate the new set only once. If the set cannot be opened,
+        the current one keeps being served.
+        """
+        if self.alias.active() == self.collection_name:
+            return
+        with self.switch_lock:
+            active = self.alias.active()
+            if active in (self.collection_name, self._unavailable_set):
+                return
+            print(f"Alias '{self.alias.alias}' cambiado: {self.collection_name} -> {active}")
+            try:
+                self._activate(active)
+            except ValueError as e:
+                # No reintentar en cada búsqueda hasta que el alias cambie de nuevo
+                self._unavailable_set = active
+                print(f"Error al activar {active}: {str(e)}; se sigue sirviendo {self.collection_name}")
+
+    def _stored_space(self, doc_type: str, collection) -> str:
+        """
+        Returns the distance space a collection was created with. Chroma ignores the
+        metadata passed to get_or_create_collection for an existing collection, so
+        changing HNSW_SPACE or COLLECTION_HNSW only affects new ones (i.e. after a
+        reindex); a warning is printed when the stored parameters differ.
+        
+        @return: Stored "hnsw:space" (Chroma's default "l2" if missing)
+        @rtype: str
+        """
+        stored = {"hnsw:space": "l2", **(collection.metadata or {})}
+        differences = [
+            f"{key}={stored.get(key)} (configurado {value})"
+            for key, value in self._hnsw_metadata(doc_type).items() if stored.get(key) != value
+        ]
+        if differences:
+            print(f"¡ADVERTENCIA! La colección {collection.name} conserva {', '.join(differences)}; "
+                  f"reindexar para aplicar la configuración")
+        return stored["hnsw:space"]
+
+    def _hnsw_metadata(self, doc_type: str) -> Dict:
+        """
+        HNSW parameters of a type's collection (Settings.COLLECTION_HNSW and
+        Settings.HNSW_SPACE). They only take effect when the collection is created.
+        """
+        return hnsw_metadata(settings.COLLECTION_HNSW.get(doc_type, {}), settings.HNSW_SPACE)
+
+    def legacy_collection(self):
+        """
+        Returns the pre-split single collection, if it still exists.
+        
+        @return: Legacy Chroma collection or None
+        """
+        try:
+            return self.client.get_collection(name=settings.COLLECTION_NAME)
+        except Exception:
+            return None
+
+    def _collection_for(self, metadata: Dict, collections: Dict = None):
+        """
+        Routes a document to its type's collection.
+        
+        @raises ValueError: If the document type is unknown
+        """
+        collections = collections if collections is not None else self.collections
+        doc_type = (metadata or {}).get('type')
+        if doc_type not in collections:
+            raise ValueError(f"Tipo de documento desconocido: {doc_type}")
+        return collections[doc_type]
+
+    def _group_by_collection(self, metadatas: List[Dict], collections: Dict = None) -> List[tuple]:
+        """
+        Groups row positions by target collection, keeping their order.
+        
+        @return: List of (collection, row positions)
+        """
+        groups = {}
+        for position, metadata in enumerate(metadatas):
+            groups.setdefault(metadata['type'] if metadata else None, []).append(position)
+        return [(self._collection_for({'type': doc_type}, collections), positions) for doc_type, positions in groups.items()]
+
+    def add_documents(self, documents: List[Dict], collections: Dict = None):
+        """
+        Adds documents to the vector database in batches, routing each one to the
+        collection of its metadata 'type'.
         
         @param documents: List of documents to add, each containing 'id', 'text', and 'metadata'
         @type documents: List[Dict]
+        @param collections: Target collections by type (see open_collections); defaults to
+            the served ones. Writes to other collections do not invalidate the caches.
         @raises Exception: If there's an error adding documents to the collection
         """
         if not documents:
             return
         
-        print(f"Añadiendo {len(documents)} documentos...")
+        debug_print(f"Añadiendo {len(documents)} documentos...")
         
         # Procesar en lotes para evitar problemas de memoria
         batch_size = 100
         for i in range(0, len(documents), batch_size):
             batch = documents[i:i + batch_size]
-            print(f"Procesando lote {i//batch_size + 1} de {len(documents)//batch_size + 1}")
+            debug_print(f"Procesando lote {i//batch_size + 1} de {len(documents)//batch_size + 1}")
             
             # Verificar conexión con ChromaDB
-            print("Verificando conexión con ChromaDB...")
+            debug_print("Verificando conexión con ChromaDB...")
             try:
-                self.collection.count()
-                print("Conexión con ChromaDB activa")
+                self.client.heartbeat()
+                debug_print("Conexión con ChromaDB activa")
             except Exception as e:
                 print(f"Error de conexión con ChromaDB: {str(e)}")
                 print(f"Tipo de error: {type(e)}")
@@ -78,119 +316,419 @@ class Retriever:
                 if len(doc['text']) > 10000:
                     print(f"Documento muy grande: {doc['id']}, longitud: {len(doc['text'])}")
             
-            print(f"IDs: {ids}")
-            print(f"Textos: {[text[:100] + '...' for text in texts]}")  # Mostrar solo los primeros 100 caracteres
-            print(f"Metadatas: {metadatas}")
-            
-            try:
-                print(f"Iniciando adición del lote {i//batch_size + 1}")
+            # Volcado del lote: se arma solo si la depuración está activa
+            if debug_enabled():
                 print(f"IDs: {ids}")
-                print(f"Textos: {[text[:100] + '...' for text in texts]}")
+                print(f"Textos: {[text[:100] + '...' for text in texts]}")  # Mostrar solo los primeros 100 caracteres
                 print(f"Metadatas: {metadatas}")
-                self.collection.add(
-                    ids=ids,
-                    documents=texts,
-                    metadatas=metadatas
-                )
-                print(f"Lote {i//batch_size + 1} añadido exitosamente")
+            
+            try:
+                debug_print(f"Iniciando adición del lote {i//batch_size + 1}")
+                for collection, positions in self._group_by_collection(metadatas, collections):
+                    collection.add(
+                        ids=[ids[p] for p in positions],
+                        documents=[texts[p] for p in positions],
+                        metadatas=[metadatas[p] for p in positions]
+                    )
+                debug_print(f"Lote {i//batch_size + 1} añadido exitosamente")
+                if collections is None:
+                    self.mark_modified()
             except Exception as e:
                 print(f"Error añadiendo lote: {str(e)}")
                 print(f"Tipo de error: {type(e)}")
                 print(f"Traceback completo: {traceback.format_exc()}")
                 raise
 
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]):
+        """
+        Upserts already-embedded documents, routing them by type. Same signature as
+        Chroma's collection.upsert, so snapshot imports and migrations can target
+        the Retriever directly without re-embedding.
+        
+        @param ids: Document ids
+        @param embeddings: Precomputed embeddings
+        @param documents: Document texts
+        @param metadatas: Document metadata (must include 'type')
+        """
+        for collection, positions in self._group_by_collection(metadatas):
+            collection.upsert(
+                ids=[ids[p] for p in positions],
+                embeddings=[embeddings[p] for p in positions],
+                documents=[documents[p] for p in positions],
+                metadatas=[metadatas[p] for p in positions]
+            )
+        self.mark_modified()
+
+    def mark_modified(self):
+        """
+        Records that the collections changed: bumps their generation, which invalidates
+        cached search results in every process (and makes them reload the collections,
+        see _reload), and refreshes the search backends. Must be called after any
+        write to the collections (add, upsert, delete).
+        """
+        generation = self.version.bump()
+        if generation != self._backend_generation + 1:
+            # Otro proceso también escribió desde la última recarga
+            self._reload()
+            return
+        self._backend_generation = generation
+        self._invalidate_backends()
+
+    def _invalidate_backends(self):
+        for backend in self.backends.values():
+            backend.invalidate()
+
+    def _needs_refresh(self) -> bool:
+        """
+        Cheap check (two stat() calls) of whether _current_generation has work to do.
+        """
+        return self.alias.active() != self.collection_name or self.version.current() != self._backend_generation
+
+    def _current_generation(self) -> int:
+        """
+        Returns the collection generation, reloading the collections, backends and
+        relation graph if another process (e.g. init_db) modified the collection or
+        switched the alias. May open collections and load files: blocking.
+        """
+        self._sync_alias()
+        if self.version.current() != self._backend_generation:
+            self._reload()
+        return self._backend_generation
+
+    def _reload(self):
+        """
+        Serves the current collection set again through a new Chroma client after
+        another process (init_db, a snapshot import, migrate_collections) wrote to
+        it. Chroma keeps one in-memory copy of each HNSW index per client and never
+        re-reads what other processes persist: the collections already open keep
+        answering with the old data (only count() sees the new rows), so refreshing
+        the backends is not enough. Searches in flight finish on the old client.
+        """
+        with self.switch_lock:
+            if self.version.current() == self._backend_generation:
+                return
+            print(f"Colecciones de {self.collection_name} modificadas por otro proceso: recargando")
+            self.client = self._open_client()
+            self._activate(self.collection_name)
+
+    def _open_client(self):
+        """
+        @return: Chroma client with its own System (segments loaded from disk).
+            chromadb.PersistentClient reuses the System cached for the path, so it
+            is dropped from the cache first; existing clients keep theirs.
+        """
+        SharedSystemClient._identifier_to_system.pop(self.persist_dir, None)
+        return chromadb.PersistentClient(path=self.persist_dir)
+
+    def index_version(self) -> str:
+        """
+        Identifies the data being served: collection set and its generation. Caches
+        of derived results (e.g. precomputed answers) are keyed by it.
+        
+        @return: e.g. "rick_morty_v2@3"
+        @rtype: str
+        """
+        return f"{self.collection_name}@{self._backend_generation}"
+
+    def cache_stats(self) -> Dict:
+        """
+        Returns hit rates of the embedding and search result caches.
+        
+        @return: Cache statistics and current collection generation
+        @rtype: Dict
+        """
+        return {
+            "collection": self.collection_name,
+            "collection_version": self.version.current(),
+            "embedding_cache": self.embedding_cache.stats(),
+            "search_cache": self.search_cache.stats()
+        }
+
+    def embedding_stats(self) -> Dict:
+        """
+        Returns the metrics of the shared embedding server, when it is used.
+        
+        @return: Server metrics, or None with a local embedding model
+        @rtype: Dict
+        """
+        if not isinstance(self.embedding_function, EmbeddingClient):
+            return None
+        try:
+            return self.embedding_function.stats()
+        except Exception as e:
+            return {"error": str(e)}
+
+    def _embed(self, query: str):
+        """
+        Embeds a query, reusing cached embeddings of equivalent queries.
+        """
+        key = normalize_query(query)
+        embeddings = self.embedding_cache.get(key)
+        if embeddings is None:
+            embeddings = self.embedding_function([query])
+            self.embedding_cache.put(key, embeddings)
+        return embeddings
+
     def count_documents(self):
         """
-        Returns the total number of documents in the collection.
+        Returns the total number of documents across the per-type collections.
         
         @return: Number of documents
         @rtype: int
         """
-        return self.collection.count()
+        return sum(collection.count() for collection in self.collections.values())
 
     def get_all_documents(self):
         """
-        Retrieves all documents from the collection for verification purposes.
+        Retrieves all documents from the collections for verification purposes.
         
-        @return: All documents in the collection or None if error occurs
+        @return: All documents (ids, documents, metadatas) or None if error occurs
         @rtype: Dict or None
         """
         try:
-            return self.collection.get()
+            merged = {"ids": [], "documents": [], "metadatas": []}
+            for collection in self.collections.values():
+                data = collection.get()
+                for key in merged:
+                    merged[key].extend(data[key])
+            return merged
         except Exception as e:
             print(f"Error obteniendo documentos: {str(e)}")
             print(f"Tipo de error: {type(e)}")
             print(f"Traceback completo: {traceback.format_exc()}")
             return None
             
-    def search(self, query: str, n_results: int = 5):
+    def search(self, query: str, n_results: Optional[int] = None):
         """
-        Performs semantic search in the vector database.
+        Performs semantic search in the vector database through the configured
+        search backend (see Settings.SEARCH_BACKEND). Results are cached by
+        normalized query, filters and collection version; each caller gets its own copy.
+        
+        @param query: User question
+        @param n_results: Results per episode and transcript sub-query (default: Settings.SEARCH_RESULTS)
         """
         try:
-            # Detectar si la consulta es sobre una temporada específica
-
-            season_match = re.search(r'temporada (\d+)', query.lower())
-            season = f"S{int(season_match.group(1)):02d}" if season_match else None
-
-            # Búsqueda de episodios
-            if season:
-                episode_results = self.collection.query(
-                    query_texts=[query],
-                    n_results=n_results,
-                    where={
-                        "$and": [
-                            {"type": "episode"},
-                            {"season": season}
-                        ]
-                    }
-                )
-            else:
-                episode_results = self.collection.query(
-                    query_texts=[query],
-                    n_results=n_results,
-                    where={"type": "episode"}
+            plan = self._plan_subqueries(query, n_results)
+            generation = self._current_generation()
+            cache_key = search_cache_key(query, plan, generation, self.collection_name)
+            cached = self.search_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+            # Calcular el embedding de la consulta una sola vez para todas las búsquedas
+            query_embeddings = self._embed(query)
+
+            results = {}
+            for name, params in plan.items():
+                results[name] = self.backends[params['type']].query(
+                    query_embeddings=query_embeddings,
+                    n_results=params['n_results'],
+                    where=params['where']
                 )
-            
-            # Búsqueda de personajes relevantes
-            character_results = self.collection.query(
-                query_texts=[query],
-                n_results=3,
-                where={"type": "character"}
-            )
-            
-            transcription_results = self.collection.query(
-                query_texts=[query],
-                n_results=n_results,
-                where={"type": "episode"}
-            )
-            
-            # Combinar resultados
-            combined_docs = []
-            combined_meta = []
-            
-            if episode_results['documents'][0]:
-                combined_docs.extend(episode_results['documents'][0])
-                combined_meta.extend(episode_results['metadatas'][0])
-                combined_docs.extend(transcription_results['documents'][0])
-                combined_meta.extend(transcription_results['metadatas'][0])
-    
-            if character_results['documents'][0]:
-                combined_docs.extend(character_results['documents'][0])
-                combined_meta.extend(character_results['metadatas'][0])
-                
-            if not combined_docs:
-                print("No se encontraron resultados relevantes")
-                return {"documents": [[]], "metadatas": [[]]}
-                
-            print(f"Total resultados encontrados: {len(combined_docs)}")
-            return {
-                "documents": [combined_docs],
-                "metadatas": [combined_meta]
-            }
+            combined = self._combine_results(results)
+            self.search_cache.put(cache_key, combined)
+            return combined
                 
         except Exception as e:
             print(f"Error en búsqueda: {str(e)}")
             print(f"Tipo de error: {type(e)}")
             print(f"Traceback completo: {traceback.format_exc()}")
-            return {"documents": [[]], "metadatas": [[]]}
\ No newline at end of file
+            return {"documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+    async def asearch(self, query: str, n_results: Optional[int] = None):
+        """
+        Async version of search() for the request path. The embedding and the
+        filtered sub-queries run on a bounded thread pool, so the event loop is not
+        blocked, and the sub-queries run concurrently: latency approaches the
+        slowest one instead of their sum. A sub-query that fails or exceeds
+        Settings.RETRIEVAL_QUERY_TIMEOUT is dropped and the others are still returned.
+        A timed-out sub-query keeps its thread until it finishes, so at most
+        Settings.RETRIEVAL_MAX_PENDING jobs are admitted to the pool; when it is full,
+        work is rejected right away instead of queueing behind stuck threads.
+        Complete results are cached by normalized query and collection version.
+        
+        @param query: User question
+        @param n_results: Results per episode and transcript sub-query (default: Settings.SEARCH_RESULTS)
+        @return: Same structure as search()
+        @rtype: Dict
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            plan = self._plan_subqueries(query, n_results)
+            # Seguir un cambio de alias o de generación abre colecciones y carga
+            # archivos: fuera del event loop
+            if self._needs_refresh():
+                generation = await asyncio.to_thread(self._current_generation)
+            else:
+                generation = self._backend_generation
+            cache_key = search_cache_key(query, plan, generation, self.collection_name)
+            cached = self.search_cache.get(cache_key)
+            if cached is not None:
+                return cached
+            query_embeddings = await self._submit(loop, self._embed, query)
+        except Exception as e:
+            print(f"Error en búsqueda: {str(e)}")
+            print(f"Traceback completo: {traceback.format_exc()}")
+            return {"documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+        names = list(plan)
+        tasks = [
+            asyncio.wait_for(
+                self._submit(
+                    loop,
+                    functools.partial(
+                        self.backends[plan[name]['type']].query,
+                        query_embeddings=query_embeddings,
+                        n_results=plan[name]['n_results'],
+                        where=plan[name]['where']
+                    )
+                ),
+                timeout=settings.RETRIEVAL_QUERY_TIMEOUT
+            )
+            for name in names
+        ]
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+
+        results = {}
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, asyncio.TimeoutError):
+                print(f"Subconsulta '{name}' excedió el tiempo límite ({settings.RETRIEVAL_QUERY_TIMEOUT}s)")
+            elif isinstance(outcome, Exception):
+                print(f"Error en subconsulta '{name}': {outcome}")
+            else:
+                results[name] = outcome
+
+        combined = self._combine_results(results)
+        # Los resultados parciales no se cachean
+        if len(results) == len(names):
+            self.search_cache.put(cache_key, combined)
+        return combined
+
+    def _submit(self, loop: asyncio.AbstractEventLoop, func, *args) -> asyncio.Future:
+        """
+        Runs func on the retrieval pool if one of the Settings.RETRIEVAL_MAX_PENDING
+        slots is free. The slot is released when the thread finishes, not when the
+        caller stops waiting for it.
+        
+        @return: Future with the result, or already failed with RuntimeError if the pool is full
+        @rtype: asyncio.Future
+        """
+        if not self.admission.acquire(blocking=False):
+            future = loop.create_future()
+            future.set_exception(RuntimeError("Pool de búsqueda saturado"))
+            return future
+
+        def run():
+            try:
+                return func(*args)
+            finally:
+                self.admission.release()
+
+        try:
+            return loop.run_in_executor(self.executor, run)
+        except Exception:
+            self.admission.release()
+            raise
+
+    def _plan_subqueries(self, query: str, n_results: Optional[int] = None) -> Dict[str, Dict]:
+        """
+        Builds the sub-queries issued for a question with the counts of
+        Settings.SEARCH_RESULTS; n_results overrides the episode and transcript counts.
+        """
+        counts = dict(settings.SEARCH_RESULTS)
+        if n_results is not None:
+            counts.update(episode=n_results, transcript=n_results)
+        return plan_subqueries(query, counts)
+
+    def _combine_results(self, results: Dict[str, Dict]) -> Dict:
+        return combine_results(results)
+
+
+def hnsw_metadata(params: Dict, space: str = "l2") -> Dict:
+    """
+    Builds Chroma collection metadata from HNSW parameters. The space is shared by
+    every collection so their distances stay comparable.
+    
+    @param params: Parameters such as {"hnsw:M": 16, "hnsw:search_ef": 50}
+    @param space: Distance space ("l2", "cosine" or "ip")
+    @return: Collection metadata
+    @rtype: Dict
+    """
+    return {**params, "hnsw:space": space}
+
+
+def plan_subqueries(query: str, counts: Dict[str, int]) -> Dict[str, Dict]:
+    """
+    Builds the sub-queries issued for a question. Each one targets the collection
+    of its 'type'; 'where' only holds the remaining filters.
+    
+    @param query: User question
+    @param counts: Results per document type
+    @return: Sub-query parameters by name
+    @rtype: Dict[str, Dict]
+    """
+    # Detectar si la consulta es sobre una temporada específica
+    season_match = re.search(r'temporada (\d+)', query.lower())
+    season = f"S{int(season_match.group(1)):02d}" if season_match else None
+
+    return {
+        'episodes': {'type': 'episode', 'n_results': counts['episode'], 'where': {"season": season} if season else None},
+        'characters': {'type': 'character', 'n_results': counts['character'], 'where': None},
+        'transcriptions': {'type': 'transcript', 'n_results': counts['transcript'], 'where': None},
+    }
+
+
+def combine_results(results: Dict[str, Dict]) -> Dict:
+    """
+    Merges the sub-query results in the order episodes, transcriptions, characters.
+    Missing entries (failed sub-queries) are skipped. Ids and distances are kept
+    aligned with the documents.
+    
+    @param results: Raw backend results by sub-query name
+    @return: Combined results
+    @rtype: Dict
+    """
+    def documents_of(name):
+        result = results.get(name)
+        if not result:
+            return None
+        documents = result['documents'][0]
+        distances = (result.get('distances') or [[None] * len(documents)])[0]
+        ids = (result.get('ids') or [[None] * len(documents)])[0]
+        return documents, result['metadatas'][0], list(distances), list(ids)
+
+    episodes = documents_of('episodes')
+    transcriptions = documents_of('transcriptions')
+    characters = documents_of('characters')
+
+    combined_docs = []
+    combined_meta = []
+    combined_dist = []
+    combined_ids = []
+
+    def extend(part):
+        combined_docs.extend(part[0])
+        combined_meta.extend(part[1])
+        combined_dist.extend(part[2])
+        combined_ids.extend(part[3])
+
+    # Las transcripciones acompañan a los episodios (o los reemplazan si esa búsqueda falló)
+    if episodes and episodes[0]:
+        extend(episodes)
+    if transcriptions and (episodes is None or episodes[0]):
+        extend(transcriptions)
+
+    if characters and characters[0]:
+        extend(characters)
+
+    if not combined_docs:
+        debug_print("No se encontraron resultados relevantes")
+        return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+    debug_print(f"Total resultados encontrados: {len(combined_docs)}")
+    return {
+        "ids": [combined_ids],
+        "documents": [combined_docs],
+        "metadatas": [combined_meta],
+        "distances": [combined_dist]
+    }
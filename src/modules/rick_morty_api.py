@@ -1,5 +1,24 @@
 import httpx
-from typing import List, Dict
+import re
+from typing import List, Dict, Iterator, Mapping
+from ..config.settings import get_settings
+from ..utils.preprocessor import TextPreprocessor
+from .data_loader import TranscriptIndex
+
+settings = get_settings()
+
+# Los archivos de transcripción se llaman "<episodio>Transcript.txt" o "<episodio> (episode)Transcript.txt"
+TRANSCRIPT_SUFFIX = re.compile(r"(\s*\(episode\))?\s*Transcript$")
+
+
+def transcript_title(key: str) -> str:
+    """
+    @param key: Transcript name as listed by TranscriptIndex, e.g. "Anatomy Park (episode)Transcript"
+    @return: Episode name it belongs to, e.g. "Anatomy Park"
+    @rtype: str
+    """
+    return TRANSCRIPT_SUFFIX.sub("", key)
+
 
 class RickMortyAPI:
     """
@@ -46,15 +65,29 @@ class RickMortyAPI:
             
         return results
 
-    def process_data_for_embedding(self, data: Dict, transcriptions: Dict[str, str]) -> List[Dict]: 
+    def process_data_for_embedding(self, data: Dict, transcriptions: Mapping[str, str]) -> List[Dict]: 
         """
         Procesa los datos de la API para ser insertados en ChromaDB.
         
         @param data: Diccionario con datos de personajes y episodios
         @return: Lista de documentos procesados para embedding
         """
-        documents = []
+        return list(self.iter_documents_for_embedding(data, transcriptions))
+
+    def iter_documents_for_embedding(self, data: Dict, transcriptions: Mapping[str, str]) -> Iterator[Dict]:
+        """
+        Genera los documentos para ChromaDB de a uno, para poder cargarlos por lotes.
+        Cada transcripción se divide en fragmentos de tipo "transcript" (ver
+        Settings.TRANSCRIPT_CHUNK_CHARS), uno por documento.
         
+        @param data: Diccionario con datos de personajes y episodios
+        @param transcriptions: Transcripciones por nombre de episodio (puede ser perezoso, ver TranscriptIndex)
+        @return: Iterador de documentos procesados para embedding
+        """
+        # Nombre normalizado del episodio -> clave de su transcripción (los nombres de
+        # archivo no siempre conservan apóstrofos y signos)
+        transcript_keys = {TextPreprocessor.clean_text(transcript_title(key)): key for key in transcriptions}
+
         # Procesar personajes
         for char in data['characters']:
             # Construir lista de relaciones y apariciones
@@ -91,7 +124,7 @@ class RickMortyAPI:
                     'location': char['location']['name']
                 }
             }
-            documents.append(doc)
+            yield doc
         
         # Procesar episodios
         for ep in data['episodes']:
@@ -106,11 +139,8 @@ class RickMortyAPI:
             episode_code = ep['episode']  # Formato: "S01E01"
             season = episode_code[:3]  # "S01"
             episode_num = episode_code[3:]  # "E01"
+            transcript_key = transcript_keys.get(TextPreprocessor.clean_text(ep['name']))
             
-            # Obtener transcripción del episodio
-            transcription = transcriptions.get(ep['name'], "Transcription not available")
-            description += f"\nTranscription:\n{transcription[:500]}..."
-
             # Construir descripción detallada del episodio
             description = (
                 f"Episode Information:\n"
@@ -136,10 +166,31 @@ class RickMortyAPI:
                     'air_date': ep['air_date'],
                     'season': season,
                     'episode_num': episode_num,
-                    'has_transcript': ep['name'] in transcriptions
-
+                    'has_transcript': transcript_key is not None
                 }
             }
-            documents.append(doc)
-        
-        return documents
\ No newline at end of file
+            yield doc
+
+            # Fragmentos de la transcripción (se lee recién ahora, de a un episodio)
+            if transcript_key is not None:
+                if isinstance(transcriptions, TranscriptIndex):
+                    # Fragmentar sobre el archivo mapeado, sin leerlo entero
+                    chunks = transcriptions.iter_chunks(
+                        transcript_key, settings.TRANSCRIPT_CHUNK_CHARS, settings.TRANSCRIPT_CHUNK_OVERLAP
+                    )
+                else:
+                    chunks = TextPreprocessor.chunk_text(
+                        transcriptions[transcript_key], settings.TRANSCRIPT_CHUNK_CHARS, settings.TRANSCRIPT_CHUNK_OVERLAP
+                    )
+                for part, chunk in enumerate(chunks):
+                    yield {
+                        'id': f"tr_{ep['id']}_{part}",
+                        'text': f"Transcript of {ep['name']} ({ep['episode']}), part {part + 1}:\n{chunk}",
+                        'metadata': {
+                            'type': 'transcript',
+                            'name': ep['name'],
+                            'episode_code': ep['episode'],
+                            'season': season,
+                            'part': part
+                        }
+                    }
\ No newline at end of file
@@ -0,0 +1,285 @@
+from typing import Dict, List, Optional
+import json
+import threading
+import numpy as np
+
+# Espacios de distancia soportados (mismos nombres que "hnsw:space" de Chroma)
+DISTANCE_SPACES = ("l2", "cosine", "ip")
+
+
+def distance_to_similarity(distance: float, space: str = "l2") -> float:
+    """
+    Converts a distance reported by a backend into cosine similarity, assuming
+    normalized embeddings.
+
+    @param distance: Distance in the given space
+    @param space: "l2" (squared L2), "cosine" or "ip"
+    @return: Cosine similarity
+    @rtype: float
+    @raises ValueError: If the space is unknown
+    """
+    if space == "l2":
+        return 1.0 - distance / 2.0
+    if space in ("cosine", "ip"):
+        return 1.0 - distance
+    raise ValueError(f"Espacio de distancia desconocido: {space}")
+
+
+class ChromaBackend:
+    """
+    Search backend that delegates to the Chroma collection (HNSW index).
+    """
+    def __init__(self, collection):
+        """
+        @param collection: Chroma collection to query
+        """
+        self.collection = collection
+
+    def query(self, query_embeddings: List[List[float]], n_results: int, where: Optional[Dict] = None) -> Dict:
+        """
+        Runs a (possibly batched) nearest neighbour query.
+
+        @param query_embeddings: One embedding per query
+        @param n_results: Results per query
+        @param where: Optional Chroma metadata filter
+        @return: Chroma-style result with ids, documents, metadatas and distances
+        @rtype: Dict
+        """
+        return self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+
+    def invalidate(self):
+        """
+        Chroma keeps its index up to date for writes made through the same client;
+        nothing to do. Writes from other processes need a new client (see
+        Retriever._reload).
+        """
+
+
+class NumpyBackend:
+    """
+    Exact in-process search: normalized embeddings in one contiguous array, scored
+    with a single matrix product. Metadata filters are resolved with precomputed
+    boolean masks. Suited to small and medium corpora (a few thousand vectors).
+
+    Distances are reported on the same scale Chroma uses for the configured
+    space: squared L2 between normalized vectors for "l2", 1 - cosine for
+    "cosine" and "ip".
+
+    A float16 matrix is scored in blocks of SCORE_CHUNK_ROWS rows converted to
+    float32, so a query never materializes a float32 copy of the whole matrix.
+    Loading is serialized by a lock; queries read a consistent view of the data
+    and run concurrently.
+    """
+    # Campos de metadata para los que se precalculan máscaras
+    MASK_FIELDS = ("type", "season")
+    # Filas convertidas a float32 por bloque al puntuar una matriz float16
+    SCORE_CHUNK_ROWS = 4096
+
+    def __init__(self, collection=None, dtype: str = "float32", space: str = "l2"):
+        """
+        @param collection: Chroma collection the data is loaded from
+        @param dtype: Storage type of the embedding matrix ("float32" or "float16")
+        @param space: Distance space of the reported distances (see DISTANCE_SPACES)
+        @raises ValueError: If the space is unknown
+        """
+        if space not in DISTANCE_SPACES:
+            raise ValueError(f"Espacio de distancia desconocido: {space}")
+        self.collection = collection
+        self.dtype = np.dtype(dtype)
+        self.space = space
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self.embeddings = None
+        self.masks = {}
+        self._filter_cache = {}
+        self._lock = threading.RLock()
+        self._invalidations = 0
+        self._loaded = False
+
+    def load(self):
+        """
+        Loads ids, documents, metadata and embeddings and precomputes the masks.
+        If invalidate() is called while loading, the data is reloaded on the next query.
+        """
+        with self._lock:
+            invalidations = self._invalidations
+            data = self.collection.get(include=["embeddings", "documents", "metadatas"])
+            self.set_data(data["ids"], data["documents"], data["metadatas"],
+                          np.asarray(data["embeddings"], dtype=np.float32))
+            if self._invalidations != invalidations:
+                self._loaded = False
+
+    def set_data(self, ids: List[str], documents: List[str], metadatas: List[Dict], vectors: np.ndarray):
+        """
+        Replaces the indexed data.
+
+        @param ids: Document ids
+        @param documents: Document texts
+        @param metadatas: Document metadata
+        @param vectors: (n, dim) embedding matrix
+        """
+        ids = list(ids)
+        metadatas = [meta or {} for meta in metadatas]
+        if ids:
+            embeddings = np.ascontiguousarray(self._normalize(vectors.reshape(len(ids), -1)), dtype=self.dtype)
+        else:
+            embeddings = np.zeros((0, 0), dtype=self.dtype)
+
+        masks = {}
+        for field in self.MASK_FIELDS:
+            values = np.array([str(meta.get(field)) for meta in metadatas], dtype=object)
+            for value in set(values):
+                masks[(field, value)] = values == value
+
+        # Se reemplaza todo junto para que las consultas no mezclen datos viejos y nuevos
+        with self._lock:
+            self.ids = ids
+            self.documents = list(documents)
+            self.metadatas = metadatas
+            self.embeddings = embeddings
+            self.masks = masks
+            self._filter_cache = {}
+            self._loaded = True
+
+    def invalidate(self):
+        """
+        Marks the data as stale; it is reloaded on the next query. Does not wait
+        for a load in progress.
+        """
+        self._invalidations += 1
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            # Otro hilo pudo haber cargado mientras se esperaba el lock
+            if not self._loaded:
+                self.load()
+
+    def count(self) -> int:
+        self._ensure_loaded()
+        return len(self.ids)
+
+    def query(self, query_embeddings: List[List[float]], n_results: int, where: Optional[Dict] = None) -> Dict:
+        """
+        Runs a batched exact nearest neighbour query.
+
+        @param query_embeddings: One embedding per query
+        @param n_results: Results per query
+        @param where: Optional Chroma-style filter (equality, $eq, $and)
+        @return: Chroma-style result with ids, documents, metadatas and distances
+        @rtype: Dict
+        """
+        self._ensure_loaded()
+        with self._lock:
+            ids, documents, metadatas, embeddings = self.ids, self.documents, self.metadatas, self.embeddings
+            mask = self._filter_mask(where) if ids else None
+
+        queries = self._normalize(np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1))
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+
+        if len(ids) == 0:
+            for key in result:
+                result[key] = [[] for _ in queries]
+            return result
+
+        # (q, n) similitudes coseno
+        scores = self._scores(queries, embeddings)
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+        k = min(n_results, len(ids) if mask is None else int(mask.sum()))
+
+        for row in scores:
+            if k == 0:
+                top = np.empty(0, dtype=np.int64)
+            else:
+                top = np.argpartition(-row, k - 1)[:k]
+                top = top[np.argsort(-row[top])]
+            result["ids"].append([ids[i] for i in top])
+            result["documents"].append([documents[i] for i in top])
+            result["metadatas"].append([metadatas[i] for i in top])
+            result["distances"].append(self._distances(row[top]).tolist())
+        return result
+
+    def _scores(self, queries: np.ndarray, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarities of the queries against every row, as float32.
+        """
+        if embeddings.dtype == np.float32:
+            return queries @ embeddings.T
+        scores = np.empty((len(queries), len(embeddings)), dtype=np.float32)
+        for start in range(0, len(embeddings), self.SCORE_CHUNK_ROWS):
+            block = embeddings[start:start + self.SCORE_CHUNK_ROWS]
+            scores[:, start:start + len(block)] = queries @ block.astype(np.float32).T
+        return scores
+
+    def _filter_mask(self, where: Optional[Dict]) -> Optional[np.ndarray]:
+        """
+        Resolves a filter into a (cached) boolean mask, or None when unfiltered.
+        """
+        if not where:
+            return None
+        key = json.dumps(where, sort_keys=True)
+        if key not in self._filter_cache:
+            self._filter_cache[key] = self._mask(where)
+        return self._filter_cache[key]
+
+    def _mask(self, where: Dict) -> np.ndarray:
+        """
+        Builds the boolean mask of a filter from the precomputed per-field masks.
+
+        @raises ValueError: If the filter uses an unsupported operator
+        """
+        mask = np.ones(len(self.ids), dtype=bool)
+        for field, condition in where.items():
+            if field == "$and":
+                for clause in condition:
+                    mask &= self._mask(clause)
+                continue
+            if isinstance(condition, dict):
+                if set(condition) != {"$eq"}:
+                    raise ValueError(f"Filtro no soportado por NumpyBackend: {condition}")
+                condition = condition["$eq"]
+            mask &= self._field_mask(field, condition)
+        return mask
+
+    def _field_mask(self, field: str, value) -> np.ndarray:
+        if field in self.MASK_FIELDS:
+            return self.masks.get((field, str(value)), np.zeros(len(self.ids), dtype=bool))
+        return np.array([meta.get(field) == value for meta in self.metadatas], dtype=bool)
+
+    def _distances(self, similarities: np.ndarray) -> np.ndarray:
+        if self.space == "l2":
+            return (2.0 - 2.0 * similarities).clip(min=0.0)
+        return 1.0 - similarities
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+def create_backend(name: str, collection, dtype: str = "float32", space: str = "l2"):
+    """
+    Builds the search backend configured in Settings.SEARCH_BACKEND.
+
+    @param name: "chroma" or "numpy"
+    @param collection: Chroma collection holding the data
+    @param dtype: Embedding storage type for the NumPy backend
+    @param space: Distance space of the collection, mirrored by the NumPy backend
+    @return: Search backend
+    @raises ValueError: If the backend name is unknown
+    """
+    if name == "chroma":
+        return ChromaBackend(collection)
+    if name == "numpy":
+        return NumpyBackend(collection, dtype=dtype, space=space)
+    raise ValueError(f"Backend de búsqueda desconocido: {name}")
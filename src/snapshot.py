@@ -0,0 +1,62 @@
+import argparse
+import time
+from src.config.settings import get_settings
+from src.modules.index_snapshot import export_snapshot, import_snapshot, load_snapshot
+from src.modules.retriever import Retriever
+
+settings = get_settings()
+
+
+def export_index(path: str, dtype: str):
+    print(f"Exportando colección a {path}...")
+    retriever = Retriever()
+    relations = retriever.relations
+    if relations is None:
+        print("¡ADVERTENCIA! La colección servida no tiene grafo de relaciones; se exporta sin él")
+    started = time.perf_counter()
+    manifest = export_snapshot(
+        list(retriever.collections.values()),
+        path,
+        settings.EMBEDDING_MODEL_ID,
+        dtype=dtype,
+        name=settings.COLLECTION_NAME,
+        relations=relations
+    )
+    print(f"Snapshot exportado: {manifest['count']} documentos, dim {manifest['dim']}, "
+          f"{manifest['dtype']}{' con grafo de relaciones' if manifest['relations'] else ''} "
+          f"en {time.perf_counter() - started:.1f}s")
+
+
+def import_index(path: str):
+    print(f"Importando snapshot {path}...")
+    started = time.perf_counter()
+    snapshot = load_snapshot(path, model_id=settings.EMBEDDING_MODEL_ID)
+    retriever = Retriever()
+    # El grafo va primero: los procesos que sigan la importación lo recargan junto con la colección
+    if snapshot.relations is not None:
+        relations_path = retriever.relations_path_for()
+        snapshot.relations.save(relations_path)
+        print(f"Grafo de relaciones restaurado en {relations_path}")
+    else:
+        print("¡ADVERTENCIA! El snapshot no incluye el grafo de relaciones")
+    count = import_snapshot(snapshot, retriever)
+    print(f"Snapshot importado: {count} documentos en {time.perf_counter() - started:.1f}s. "
+          f"Total en la base: {retriever.count_documents()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta o importa snapshots del índice vectorial")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Exporta la colección a un snapshot")
+    export_parser.add_argument("path", nargs="?", default=settings.INDEX_SNAPSHOT_PATH)
+    export_parser.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+
+    import_parser = subparsers.add_parser("import", help="Carga un snapshot sin recalcular embeddings")
+    import_parser.add_argument("path", nargs="?", default=settings.INDEX_SNAPSHOT_PATH)
+
+    args = parser.parse_args()
+    if args.command == "export":
+        export_index(args.path, args.dtype)
+    else:
+        import_index(args.path)
@@ -0,0 +1,181 @@
+import argparse
+import itertools
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from typing import Dict, List
+import chromadb
+import numpy as np
+from src.config.settings import get_settings
+from src.modules.retriever import DOCUMENT_TYPES, Retriever, combine_results, hnsw_metadata, plan_subqueries
+from src.modules.search_backends import ChromaBackend
+
+settings = get_settings()
+
+
+def load_questions(path: str) -> List[Dict]:
+    """
+    Loads a labelled question set: a JSON list of
+    {"question": "...", "relevant": ["ep_1", "char_2", ...]}.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+    return [item for item in questions if item.get("relevant")]
+
+
+def load_corpus(retriever: Retriever, page_size: int = 1000) -> Dict[str, Dict]:
+    """
+    Reads ids, documents, metadata and stored embeddings of every type's collection,
+    so the sweep rebuilds indexes without re-embedding anything.
+    """
+    corpus = {}
+    for doc_type, collection in retriever.collections.items():
+        data = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+        for offset in range(0, collection.count(), page_size):
+            page = collection.get(limit=page_size, offset=offset,
+                                  include=["embeddings", "documents", "metadatas"])
+            for key in data:
+                data[key].extend(page[key])
+        corpus[doc_type] = data
+    return corpus
+
+
+def build_index(corpus: Dict[str, Dict], params: Dict, space: str, path: str, batch_size: int = 1000):
+    """
+    Builds one collection per type with the given HNSW parameters in a scratch directory.
+
+    @return: Tuple of (collections by type, build seconds, index size in bytes)
+    """
+    client = chromadb.PersistentClient(path=path)
+    collections = {}
+    started = time.perf_counter()
+    for doc_type, data in corpus.items():
+        collection = client.create_collection(
+            name=f"tune_{doc_type}s",
+            embedding_function=None,
+            metadata=hnsw_metadata(params, space)
+        )
+        for start in range(0, len(data["ids"]), batch_size):
+            end = start + batch_size
+            collection.add(ids=data["ids"][start:end], embeddings=[list(map(float, e)) for e in data["embeddings"][start:end]],
+                           documents=data["documents"][start:end], metadatas=data["metadatas"][start:end])
+        collections[doc_type] = collection
+    build_time = time.perf_counter() - started
+    size = sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names)
+    return collections, build_time, size
+
+
+def evaluate(backends: Dict, questions: List[Dict], embeddings: List, counts: Dict[str, int], k: int) -> Dict:
+    """
+    Runs the Retriever's sub-query plan for every question and scores the merged results.
+
+    Recall@k and MRR rank the merged results by distance; context recall is the
+    share of relevant documents anywhere in the context handed to the generator.
+    Latency covers the sub-queries only (question embeddings are precomputed).
+    """
+    recalls, context_recalls, reciprocal_ranks, latencies = [], [], [], []
+    for item, embedding in zip(questions, embeddings):
+        plan = plan_subqueries(item["question"], counts)
+        started = time.perf_counter()
+        results = {
+            name: backends[params["type"]].query(
+                query_embeddings=[embedding], n_results=params["n_results"], where=params["where"]
+            )
+            for name, params in plan.items()
+        }
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        combined = combine_results(results)
+        ids = combined["ids"][0]
+        ranked = [doc_id for _, doc_id in sorted(zip(combined["distances"][0], ids), key=lambda pair: pair[0])]
+        relevant = set(item["relevant"])
+
+        recalls.append(len(relevant & set(ranked[:k])) / len(relevant))
+        context_recalls.append(len(relevant & set(ids)) / len(relevant))
+        rank = next((position for position, doc_id in enumerate(ranked, 1) if doc_id in relevant), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+    return {
+        "recall": statistics.mean(recalls),
+        "context_recall": statistics.mean(context_recalls),
+        "mrr": statistics.mean(reciprocal_ranks),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+def run_sweep(args) -> List[Dict]:
+    questions = load_questions(args.questions)
+    retriever = Retriever()
+    corpus = load_corpus(retriever)
+    embeddings = [list(map(float, e)) for e in retriever.embedding_function([item["question"] for item in questions])]
+    print(f"{len(questions)} preguntas etiquetadas, "
+          f"{sum(len(data['ids']) for data in corpus.values())} documentos")
+
+    index_grid = list(itertools.product(args.space, args.m, args.construction_ef, args.search_ef))
+    count_grid = list(itertools.product(args.episode_results, args.character_results, args.transcript_results))
+    rows = []
+    # Los índices se construyen una vez por combinación HNSW; los conteos no requieren reconstruir
+    for space, m, construction_ef, search_ef in index_grid:
+        params = {"hnsw:M": m, "hnsw:construction_ef": construction_ef, "hnsw:search_ef": search_ef}
+        workdir = tempfile.mkdtemp(prefix="tune_retrieval_")
+        try:
+            collections, build_time, size = build_index(corpus, params, space, workdir)
+            backends = {doc_type: ChromaBackend(collections[doc_type]) for doc_type in DOCUMENT_TYPES}
+            for episode_n, character_n, transcript_n in count_grid:
+                counts = {"episode": episode_n, "character": character_n, "transcript": transcript_n}
+                metrics = evaluate(backends, questions, embeddings, counts, args.k)
+                row = {"space": space, "M": m, "construction_ef": construction_ef, "search_ef": search_ef,
+                       **counts, **metrics, "build_s": build_time, "size_mb": size / 1024 ** 2}
+                rows.append(row)
+                print(f"{space:>6} M={m:<3} cef={construction_ef:<4} sef={search_ef:<4} "
+                      f"n={episode_n}/{character_n}/{transcript_n} | recall@{args.k} {row['recall']:.3f} "
+                      f"ctx {row['context_recall']:.3f} mrr {row['mrr']:.3f} | "
+                      f"p50 {row['p50_ms']:.2f}ms p95 {row['p95_ms']:.2f}ms | "
+                      f"build {build_time:.2f}s {row['size_mb']:.1f}MB")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return rows
+
+
+def report(rows: List[Dict], min_recall: float):
+    """
+    Prints the fastest configuration (by p95) that meets the recall target.
+    """
+    passing = [row for row in rows if row["recall"] >= min_recall]
+    if not passing:
+        print(f"\nNinguna configuración alcanza recall >= {min_recall}")
+        return
+    best = min(passing, key=lambda row: (row["p95_ms"], -row["mrr"]))
+    print(f"\nConfiguración más rápida con recall >= {min_recall} "
+          f"(los parámetros HNSW se aplican a colecciones nuevas: reindexar con POST /admin/reindex):")
+    print(f"  HNSW_SPACE={best['space']}")
+    print(f"  hnsw:M={best['M']} hnsw:construction_ef={best['construction_ef']} hnsw:search_ef={best['search_ef']}")
+    print(f"  SEARCH_RESULTS={json.dumps({t: best[t] for t in DOCUMENT_TYPES})}")
+    print(f"  recall {best['recall']:.3f}, mrr {best['mrr']:.3f}, p95 {best['p95_ms']:.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Barre parámetros HNSW y de recuperación y mide calidad frente a latencia")
+    parser.add_argument("--questions", default="src/data/eval/questions.json", help="Preguntas etiquetadas (JSON)")
+    parser.add_argument("--space", nargs="+", choices=["l2", "cosine", "ip"], default=[settings.HNSW_SPACE])
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--episode-results", type=int, nargs="+", default=[settings.SEARCH_RESULTS["episode"]])
+    parser.add_argument("--character-results", type=int, nargs="+", default=[settings.SEARCH_RESULTS["character"]])
+    parser.add_argument("--transcript-results", type=int, nargs="+", default=[settings.SEARCH_RESULTS["transcript"]])
+    parser.add_argument("--k", type=int, default=5, help="Corte para recall@k")
+    parser.add_argument("--min-recall", type=float, default=0.9)
+    parser.add_argument("--output", help="Guarda los resultados en JSON")
+    args = parser.parse_args()
+
+    rows = run_sweep(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+    report(rows, args.min_recall)
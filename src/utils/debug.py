@@ -0,0 +1,21 @@
+from ..config.settings import get_settings
+
+settings = get_settings()
+
+
+def debug_enabled() -> bool:
+    """
+    @return: Whether the verbose debug output is enabled (Settings.DEBUG_PRINTS)
+    @rtype: bool
+    """
+    return settings.DEBUG_PRINTS
+
+
+def debug_print(*args, **kwargs):
+    """
+    print() for the verbose traces of the request and ingestion paths (prompts,
+    answers, batch contents). Muted with DEBUG_PRINTS=false so production logs and
+    profiles reflect the real cost of the pipeline. Errors keep using print().
+    """
+    if settings.DEBUG_PRINTS:
+        print(*args, **kwargs)
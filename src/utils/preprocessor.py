@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, Iterator, List
 import re
 
 class TextPreprocessor:
@@ -21,6 +21,36 @@ class TextPreprocessor:
         text = text.lower().strip()
         return text
 
+    @staticmethod
+    def chunk_text(text: str, size: int, overlap: int = 0) -> Iterator[str]:
+        """
+        Splits a long text into chunks of at most `size` characters, cutting at a
+        line break when there is one in the second half of the chunk. Consecutive
+        chunks share `overlap` characters so a line is not lost at a boundary.
+        
+        @param text: Text to split
+        @type text: str
+        @param size: Maximum characters per chunk
+        @type size: int
+        @param overlap: Characters repeated at the start of the next chunk
+        @type overlap: int
+        @return: Iterator of non-empty chunks
+        @rtype: Iterator[str]
+        """
+        start = 0
+        while start < len(text):
+            end = min(start + size, len(text))
+            if end < len(text):
+                cut = text.rfind("\n", start + size // 2, end)
+                if cut != -1:
+                    end = cut
+            chunk = text[start:end].strip()
+            if chunk:
+                yield chunk
+            if end >= len(text):
+                return
+            start = max(end - overlap, start + 1)
+
     @staticmethod
     def prepare_episode_text(episode: Dict) -> str:
         """
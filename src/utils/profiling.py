@@ -0,0 +1,177 @@
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+import cProfile
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+# Extensiones de los perfiles escritos (cuentan para el límite de archivos)
+PROFILE_EXTENSIONS = (".folded", ".prof")
+
+
+class StackSampler(threading.Thread):
+    """
+    Statistical profiler: samples the stacks of every thread at a fixed interval
+    and counts them in collapsed form ("thread;outer;...;inner count"), the input
+    format of flamegraph.pl, speedscope and inferno. Work that runs on executor
+    threads (Chroma queries, ONNX embeddings) shows up under its thread name.
+    """
+    def __init__(self, interval: float = 0.001):
+        """
+        @param interval: Seconds between samples
+        """
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                frames.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(frames))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfileSession:
+    """
+    Result of a profiled block: path of the written profile, if any.
+    """
+    def __init__(self, label: str):
+        self.label = label
+        self.path: Optional[str] = None
+        self.duration = None
+
+
+class RequestProfiler:
+    """
+    Opt-in profiler for individual requests, triggered explicitly (e.g. by a
+    header) or by a sampling rate.
+
+    Two modes:
+    - "sample": StackSampler; low overhead, includes executor threads, writes
+      collapsed stacks (.folded) ready for flamegraph tools.
+    - "cprofile": deterministic cProfile of the event loop thread, written as
+      pstats (.prof) for snakeviz or flameprof. Other coroutines running on the
+      loop at the same time are included.
+
+    Only one request is profiled at a time; the oldest files are deleted once
+    max_files is exceeded.
+    """
+    def __init__(self, directory: str, max_files: int = 50, sample_rate: float = 0.0,
+                 mode: str = "sample", interval: float = 0.001, enabled: bool = True):
+        """
+        @param directory: Directory the profiles are written to
+        @param max_files: Maximum number of profiles kept
+        @param sample_rate: Fraction of requests profiled without being asked to
+        @param mode: "sample" or "cprofile"
+        @param interval: Sampling interval in seconds ("sample" mode)
+        @param enabled: Master switch; when False nothing is ever profiled
+        @raises ValueError: If the mode is unknown
+        """
+        if mode not in ("sample", "cprofile"):
+            raise ValueError(f"Modo de profiling desconocido: {mode}")
+        self.directory = directory
+        self.max_files = max_files
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.interval = interval
+        self.enabled = enabled
+        self._busy = threading.Lock()
+
+    def should_profile(self, requested: Optional[str] = None) -> bool:
+        """
+        @param requested: Value of the trigger header, if present
+        @return: Whether the request must be profiled
+        @rtype: bool
+        """
+        if not self.enabled:
+            return False
+        if requested is not None and requested.strip().lower() in ("1", "true", "yes", "on"):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def profile(self, label: str):
+        """
+        Profiles the enclosed block (which may contain awaits) and writes the result.
+        If another block is being profiled, this one runs unprofiled and the
+        session path stays None.
+
+        @param label: Short name included in the file name
+        @return: ProfileSession, filled in when the block exits
+        """
+        session = ProfileSession(label)
+        if not self._busy.acquire(blocking=False):
+            yield session
+            return
+
+        started = time.perf_counter()
+        try:
+            if self.mode == "cprofile":
+                profiler = cProfile.Profile()
+                profiler.enable()
+                try:
+                    yield session
+                finally:
+                    profiler.disable()
+                    session.path = self._path(label, ".prof")
+                    profiler.dump_stats(session.path)
+            else:
+                sampler = StackSampler(self.interval)
+                sampler.start()
+                try:
+                    yield session
+                finally:
+                    sampler.stop()
+                    session.path = self._path(label, ".folded")
+                    sampler.write(session.path)
+        finally:
+            session.duration = time.perf_counter() - started
+            self._busy.release()
+            self._prune()
+
+    def _path(self, label: str, extension: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        return os.path.join(self.directory, f"{stamp}_{label}_{uuid.uuid4().hex[:8]}{extension}")
+
+    def _prune(self):
+        """
+        Deletes the oldest profiles beyond max_files.
+        """
+        try:
+            files = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                     if name.endswith(PROFILE_EXTENSIONS)]
+        except FileNotFoundError:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:max(len(files) - self.max_files, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+from typing import Dict, List
+from src.config.settings import get_settings
+from src.modules.generator import Generator
+from src.modules.rag_engine import RAGEngine
+from src.modules.rick_morty_api import RickMortyAPI
+
+settings = get_settings()
+
+
+def build_canonical_questions(data: Dict) -> List[str]:
+    """
+    Builds the canonical questions that cover most of the traffic:
+    characters, episodes and seasons.
+    
+    @param data: Dictionary with 'characters' and 'episodes' from the API
+    @return: List of questions
+    @rtype: List[str]
+    """
+    questions = []
+    for name in dict.fromkeys(char['name'] for char in data['characters']):
+        questions.append(f"¿Quién es {name}?")
+
+    for ep in data['episodes']:
+        questions.append(f"¿Qué sucede en el episodio {ep['name']}?")
+
+    seasons = sorted({int(ep['episode'][1:3]) for ep in data['episodes']})
+    for season in seasons:
+        questions.append(f"¿Qué episodios tiene la temporada {season}?")
+    return questions
+
+
+def mine_frequent_questions(conversations: Dict[str, List[Dict]], min_frequency: int, limit: int) -> List[str]:
+    """
+    Extracts the most frequent user questions from the conversation logs.
+    
+    @param conversations: Conversations as stored by ConversationManager
+    @param min_frequency: Minimum number of occurrences
+    @param limit: Maximum number of questions returned
+    @return: Questions ordered by frequency
+    @rtype: List[str]
+    """
+    counts = Counter()
+    first_seen = {}
+    for messages in conversations.values():
+        for message in messages:
+            if message.get('role') != 'user':
+                continue
+            key = Generator.cache_key(message['content'])
+            counts[key] += 1
+            first_seen.setdefault(key, message['content'].strip())
+
+    return [first_seen[key] for key, count in counts.most_common(limit) if count >= min_frequency]
+
+
+def _load_answers(path: str, index: str) -> Dict[str, str]:
+    """
+    @return: Saved answers if they were built from the given index, otherwise {}
+    """
+    try:
+        saved_index, answers = Generator.read_response_cache(path)
+    except (OSError, ValueError):
+        return {}
+    if saved_index != index:
+        print(f"Las respuestas guardadas son del índice {saved_index}, no de {index}: se recalculan")
+        return {}
+    return answers
+
+
+def _save_answers(path: str, index: str, answers: Dict[str, str]):
+    # Escritura atómica para no dejar un archivo a medias si el proceso se corta
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"index": index, "answers": answers}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+async def warm_cache(engine: RAGEngine = None, api: RickMortyAPI = None):
+    """
+    Precomputes the answers to the canonical and most frequent questions with the
+    index being served, and saves them to RESPONSE_CACHE_PATH tagged with
+    Retriever.index_version(). Answers already saved for the same index are
+    kept, so an interrupted run resumes; answers of another index are discarded.
+    Run before the API starts (init-script.sh) and after each reindex.
+    
+    @param engine: RAG engine to answer with (default: a new one)
+    @param api: Rick and Morty API client (default: a new one)
+    """
+    print("Iniciando precálculo de respuestas...")
+
+    api = api or RickMortyAPI()
+    engine = engine or RAGEngine()
+    index = engine.retriever.index_version()
+
+    print("Obteniendo datos de la API...")
+    data = await api.fetch_all_data()
+    questions = build_canonical_questions(data)
+    print(f"Preguntas canónicas: {len(questions)}")
+
+    mined = mine_frequent_questions(
+        engine.generator.conversation_manager.get_all_conversations(),
+        settings.WARM_CACHE_MIN_FREQUENCY,
+        settings.WARM_CACHE_MAX_MINED
+    )
+    print(f"Preguntas frecuentes del historial: {len(mined)}")
+
+    # Las respuestas existentes se conservan para poder reanudar el proceso
+    answers = _load_answers(settings.RESPONSE_CACHE_PATH, index)
+    done = {Generator.cache_key(question) for question in answers}
+    pending = []
+    for question in mined + questions:
+        key = Generator.cache_key(question)
+        if key not in done:
+            done.add(key)
+            pending.append(question)
+    print(f"Preguntas pendientes: {len(pending)} (ya calculadas: {len(answers)})")
+
+    interval = 60.0 / max(settings.WARM_CACHE_REQUESTS_PER_MINUTE, 1)
+    for i, question in enumerate(pending, 1):
+        started = time.monotonic()
+        try:
+            answers[question] = await engine.precompute_answer(question)
+        except Exception as e:
+            print(f"Error respondiendo '{question}': {e}")
+
+        if i % 20 == 0:
+            _save_answers(settings.RESPONSE_CACHE_PATH, index, answers)
+            print(f"Progreso: {i}/{len(pending)}")
+
+        # Respetar el límite de peticiones al modelo
+        await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    _save_answers(settings.RESPONSE_CACHE_PATH, index, answers)
+    print(f"¡Cache precalculada! {len(answers)} respuestas del índice {index} en {settings.RESPONSE_CACHE_PATH}")
+
+
+if __name__ == "__main__":
+    asyncio.run(warm_cache())
@@ -1,5 +1,9 @@
+import json
+import os
+import tempfile
 import unittest
 from src.modules.data_loader import DataLoader
+from src.utils.preprocessor import TextPreprocessor
 
 class TestDataLoader(unittest.TestCase):
     def setUp(self):
@@ -17,5 +21,106 @@ class TestDataLoader(unittest.TestCase):
         if characters:  # si hay personajes cargados
             self.assertTrue(all(isinstance(char, dict) for char in characters))
 
+    def test_load_transcripts(self):
+        transcripts = self.loader.load_transcripts()
+        self.assertIn("PilotTranscript", transcripts)
+        self.assertTrue(transcripts["PilotTranscript"])
+
+
+class TestStreamingDataLoader(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.episodes = [{"id": i, "name": f"Episodio {i}", "tags": ["a", "b]"]} for i in range(50)]
+        with open(os.path.join(self.tmp.name, "episodes.json"), "w", encoding="utf-8") as f:
+            json.dump({"info": {"count": 50}, "episodes": self.episodes}, f, indent=2)
+        with open(os.path.join(self.tmp.name, "Pilot.txt"), "w", encoding="utf-8") as f:
+            f.write("Rick: Morty, ¡vamos!")
+        open(os.path.join(self.tmp.name, "Empty.txt"), "w").close()
+        # Bloques pequeños para forzar elementos partidos entre lecturas
+        self.loader = DataLoader(self.tmp.name, self.tmp.name, chunk_size=16)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_iter_episodes_matches_load(self):
+        self.assertEqual(list(self.loader.iter_episodes()), self.episodes)
+        self.assertEqual(list(self.loader.iter_episodes()), self.loader.load_episodes())
+
+    def _write(self, filename, text):
+        with open(os.path.join(self.tmp.name, filename), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def test_strings_with_brackets_braces_and_escapes(self):
+        characters = [
+            {"id": 1, "name": "Rick ]}, {[", "quote": "dijo \"]\" y se fue"},
+            {"id": 2, "name": "Back\\slash\\", "note": "}]}]"},
+            {"id": 3, "name": "Unicode \u00e9 ñ 🥒", "nested": {"list": [[1], {"a": "]"}]}},
+            {"id": 4, "name": "characters", "empty": []}
+        ]
+        self._write("characters.json", json.dumps({"info": {"next": "characters"}, "characters": characters}))
+        # Cada tamaño de bloque parte los elementos en lugares distintos
+        for chunk_size in range(1, 40):
+            loader = DataLoader(self.tmp.name, self.tmp.name, chunk_size=chunk_size)
+            self.assertEqual(list(loader.iter_characters()), characters, chunk_size)
+
+    def test_key_value_is_not_the_array(self):
+        self._write("characters.json", '{"title": "characters", "characters" : [ {"id": 1} ]}')
+        self.assertEqual(list(self.loader.iter_characters()), [{"id": 1}])
+
+    def test_empty_array(self):
+        self._write("characters.json", '{"characters": [ ]}')
+        self.assertEqual(list(self.loader.iter_characters()), [])
+
+    def test_truncated_array_raises(self):
+        self._write("characters.json", '{"characters": [{"id": 1}, {"id": 2')
+        with self.assertRaises(ValueError):
+            list(self.loader.iter_characters())
+
+    def test_missing_key_raises(self):
+        self._write("characters.json", '{"personajes": []}')
+        with self.assertRaises(ValueError):
+            list(self.loader.iter_characters())
+
+    def test_stream_all_gives_fresh_iterators(self):
+        self.assertFalse(self.loader.has_local_data())
+        self._write("characters.json", json.dumps({"characters": [{"id": 1}]}))
+        self.assertTrue(self.loader.has_local_data())
+
+        data = self.loader.stream_all()
+        self.assertEqual(list(data["episodes"]), self.episodes)
+        self.assertEqual(list(data["episodes"]), self.episodes)
+        self.assertEqual(list(data["characters"]), [{"id": 1}])
+
+    def test_iter_missing_file(self):
+        self.assertEqual(list(self.loader.iter_characters()), [])
+
+    def test_transcript_index_is_lazy(self):
+        index = self.loader.transcript_index()
+        self.assertEqual(len(index), 2)
+        self.assertIn("Pilot", index)
+        self.assertEqual(index["Pilot"], "Rick: Morty, ¡vamos!")
+        self.assertEqual(index["Empty"], "")
+        self.assertEqual(index.get("Missing", "n/a"), "n/a")
+
+    def test_iter_chunks_matches_chunk_text(self):
+        text = "\n".join(f"Rick: line {i} of the episode" for i in range(40))
+        with open(os.path.join(self.tmp.name, "Long.txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+        chunks = list(self.loader.transcript_index().iter_chunks("Long", 200, 30))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(chunks, list(TextPreprocessor.chunk_text(text, 200, 30)))
+
+    def test_iter_chunks_never_splits_a_character(self):
+        with open(os.path.join(self.tmp.name, "Wide.txt"), "w", encoding="utf-8") as f:
+            f.write("ñ" * 50)
+        index = self.loader.transcript_index()
+        # 7 bytes caben 3 'ñ'; el solapamiento de 2 bytes es una 'ñ'
+        self.assertEqual(list(index.iter_chunks("Wide", 7, 2)), ["ñññ"] * 24 + ["ññ"])
+        self.assertEqual(list(index.iter_chunks("Empty", 7)), [])
+
+    def test_iter_batches(self):
+        batches = list(DataLoader.iter_batches(range(7), 3))
+        self.assertEqual(batches, [[0, 1, 2], [3, 4, 5], [6]])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
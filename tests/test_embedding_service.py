@@ -0,0 +1,103 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import numpy as np
+from src.api import main
+from src.modules.embedding_service import EmbeddingClient, EmbeddingServer
+
+class FakeEmbedder:
+    """
+    Deterministic local embedder that records the size of every batch.
+    """
+    def __init__(self, dim=4, fail=False):
+        self.dim = dim
+        self.fail = fail
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(len(texts))
+        if self.fail:
+            raise RuntimeError("model failed")
+        return [[float(len(text))] * self.dim for text in texts]
+
+class TestEmbeddingService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmp.name, "embeddings.sock")
+
+    async def asyncTearDown(self):
+        await self.server.close()
+        self.tmp.cleanup()
+
+    async def _start(self, embedder, max_batch_size=64, max_wait=0.05):
+        self.server = EmbeddingServer(embedder, self.socket_path, max_batch_size=max_batch_size, max_wait=max_wait)
+        await self.server.start()
+        return EmbeddingClient(self.socket_path, timeout=5.0)
+
+    async def test_returns_embeddings_in_order(self):
+        client = await self._start(FakeEmbedder())
+        vectors = await asyncio.to_thread(client, ["a", "bbb"])
+        np.testing.assert_allclose(vectors, [[1.0] * 4, [3.0] * 4])
+
+    async def test_concurrent_requests_are_batched(self):
+        embedder = FakeEmbedder()
+        client = await self._start(embedder)
+        texts = ["x" * i for i in range(1, 9)]
+        results = await asyncio.gather(*(asyncio.to_thread(client, [text]) for text in texts))
+
+        for text, vectors in zip(texts, results):
+            self.assertEqual(vectors[0][0], len(text))
+        self.assertLess(len(embedder.batches), len(texts))
+        stats = await asyncio.to_thread(client.stats)
+        self.assertEqual(stats["requests"], len(texts))
+        self.assertEqual(stats["texts"], len(texts))
+        self.assertGreater(stats["avg_batch_size"], 1)
+
+    async def test_batch_size_cap(self):
+        embedder = FakeEmbedder()
+        client = await self._start(embedder, max_batch_size=2)
+        await asyncio.gather(*(asyncio.to_thread(client, [str(i)]) for i in range(6)))
+        self.assertTrue(all(size <= 2 for size in embedder.batches))
+
+    async def test_requests_are_not_merged_past_the_cap(self):
+        embedder = FakeEmbedder()
+        client = await self._start(embedder, max_batch_size=4, max_wait=0.1)
+        results = await asyncio.gather(*(asyncio.to_thread(client, [str(i)] * 3) for i in range(3)))
+        self.assertEqual(embedder.batches, [3, 3, 3])
+        self.assertTrue(all(len(vectors) == 3 for vectors in results))
+
+    async def test_oversized_request_runs_alone(self):
+        embedder = FakeEmbedder()
+        client = await self._start(embedder, max_batch_size=2)
+        vectors = await asyncio.to_thread(client, ["a", "b", "c"])
+        self.assertEqual(len(vectors), 3)
+        self.assertEqual(embedder.batches, [3])
+
+    async def test_model_error_is_reported(self):
+        client = await self._start(FakeEmbedder(fail=True))
+        with self.assertRaises(RuntimeError):
+            await asyncio.to_thread(client, ["a"])
+        stats = await asyncio.to_thread(client.stats)
+        self.assertEqual(stats["errors"], 1)
+
+class TestStatusEndpoint(unittest.IsolatedAsyncioTestCase):
+    async def test_embedding_stats_are_fetched_off_the_event_loop(self):
+        threads = []
+
+        def embedding_stats():
+            threads.append(threading.current_thread())
+            return {"requests": 0}
+
+        engine = mock.Mock()
+        engine.retriever.get_all_documents.return_value = {"documents": []}
+        engine.retriever.embedding_stats = embedding_stats
+        with mock.patch.object(main, "rag_engine", engine):
+            status = await main.get_status()
+        self.assertEqual(status["embedding_service"], {"requests": 0})
+        self.assertIsNot(threads[0], threading.current_thread())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import asyncio
+import unittest
+from src.modules.generation_policy import HedgedGenerationPolicy
+
+class FakeLLM:
+    """
+    Local fake model with injected latency (seconds) and optional failures per model.
+    """
+    def __init__(self, latencies, failures=()):
+        self.latencies = latencies
+        self.failures = set(failures)
+        self.calls = []
+        self.cancelled = []
+
+    async def __call__(self, model, prompt, **kwargs):
+        self.calls.append(model)
+        try:
+            await asyncio.sleep(self.latencies[model])
+        except asyncio.CancelledError:
+            self.cancelled.append(model)
+            raise
+        if model in self.failures:
+            raise RuntimeError(f"{model} failed")
+        return f"{model}: {prompt}"
+
+class TestHedgedGenerationPolicy(unittest.IsolatedAsyncioTestCase):
+    def _policy(self, llm, hedge_delay=0.05, timeout=1.0):
+        return HedgedGenerationPolicy(llm, "primary", "fast", hedge_delay=hedge_delay, timeout=timeout)
+
+    async def test_fast_primary_is_not_hedged(self):
+        llm = FakeLLM({"primary": 0.01, "fast": 0.01})
+        policy = self._policy(llm)
+        self.assertEqual(await policy.generate("hola"), ("primary: hola", "primary"))
+        self.assertEqual(llm.calls, ["primary"])
+        self.assertEqual(policy.stats["hedged"], 0)
+
+    async def test_slow_primary_is_hedged_and_cancelled(self):
+        llm = FakeLLM({"primary": 0.5, "fast": 0.05})
+        policy = self._policy(llm)
+        text, model = await policy.generate("hola")
+        await asyncio.sleep(0)
+        self.assertEqual(model, "fast")
+        self.assertEqual(llm.calls, ["primary", "fast"])
+        self.assertEqual(llm.cancelled, ["primary"])
+        self.assertEqual(policy.stats["served_by"], {"fast": 1})
+
+    async def test_primary_can_still_win_after_hedging(self):
+        llm = FakeLLM({"primary": 0.1, "fast": 0.5})
+        _, model = await self._policy(llm).generate("hola")
+        await asyncio.sleep(0)
+        self.assertEqual(model, "primary")
+        self.assertEqual(llm.cancelled, ["fast"])
+
+    async def test_primary_failure_falls_back_immediately(self):
+        llm = FakeLLM({"primary": 0.01, "fast": 0.01}, failures={"primary"})
+        policy = self._policy(llm, hedge_delay=10)
+        _, model = await policy.generate("hola")
+        self.assertEqual(model, "fast")
+
+    async def test_timeout_cancels_everything(self):
+        llm = FakeLLM({"primary": 1.0, "fast": 1.0})
+        policy = self._policy(llm, timeout=0.1)
+        with self.assertRaises(asyncio.TimeoutError):
+            await policy.generate("hola")
+        await asyncio.sleep(0)
+        self.assertEqual(sorted(llm.cancelled), ["fast", "primary"])
+        self.assertEqual(policy.stats["timeouts"], 1)
+
+    async def test_all_failures_raise_last_error(self):
+        llm = FakeLLM({"primary": 0.01, "fast": 0.01}, failures={"primary", "fast"})
+        with self.assertRaises(RuntimeError):
+            await self._policy(llm).generate("hola")
+
+if __name__ == '__main__':
+    unittest.main()
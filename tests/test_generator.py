@@ -0,0 +1,223 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from src.api.models import ConversationManager
+from src.config.settings import get_settings
+from src.modules.generator import Generator
+
+settings = get_settings()
+
+class FakeModel:
+    """
+    Local fake of Generator._call_model that records its calls.
+    """
+    def __init__(self, reply="resumen", fail=False):
+        self.reply = reply
+        self.fail = fail
+        self.calls = []
+
+    async def __call__(self, model, prompt, **kwargs):
+        self.calls.append((model, prompt, kwargs))
+        if self.fail:
+            raise RuntimeError("model failed")
+        return self.reply
+
+class GeneratorTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        manager = ConversationManager(os.path.join(self.tmp.name, "conversations.json"))
+        self.generator = Generator(conversation_manager=manager)
+        self.model = FakeModel()
+        self.generator._call_model = self.model
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+class TestSummaries(GeneratorTestCase):
+    async def test_summary_calls_primary_model_outside_policy(self):
+        text = await self.generator._summarize("", ["Usuario: hola"])
+
+        self.assertEqual(text, "resumen")
+        self.assertEqual(self.model.calls[0][0], settings.MODEL_NAME)
+        self.assertEqual(self.model.calls[0][2]["max_tokens"], settings.HISTORY_SUMMARY_MAX_TOKENS)
+        self.assertEqual(self.generator.policy.stats["requests"], 0)
+        self.assertEqual(self.generator.policy.stats["served_by"], {})
+
+class TestResponseCache(GeneratorTestCase):
+    def _write_answers(self, answers, index="rick_morty@0"):
+        path = os.path.join(self.tmp.name, "response_cache.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"index": index, "answers": answers}, f)
+        return path
+
+    def test_cache_key_ignores_case_punctuation_and_spacing(self):
+        key = Generator.cache_key("¿Quién es Rick?")
+        self.assertEqual(Generator.cache_key("quién   es rick"), key)
+        self.assertEqual(Generator.cache_key("  QUIÉN ES RICK!! "), key)
+        self.assertNotEqual(Generator.cache_key("¿Quién es Morty?"), key)
+
+    def test_load_response_cache(self):
+        path = self._write_answers({"¿Quién es Rick?": "Un genio, Morty"})
+        self.assertEqual(self.generator.load_response_cache(path), 1)
+        self.assertEqual(self.generator.response_cache[("rick_morty@0", Generator.cache_key("quién es rick"))], "Un genio, Morty")
+
+    def test_file_without_index_is_tied_to_no_index(self):
+        path = os.path.join(self.tmp.name, "viejo.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"¿Quién es Rick?": "Un genio"}, f)
+        self.assertEqual(Generator.read_response_cache(path), (None, {"¿Quién es Rick?": "Un genio"}))
+
+    def test_load_response_cache_missing_or_invalid_file(self):
+        self.assertEqual(self.generator.load_response_cache(os.path.join(self.tmp.name, "nada.json")), 0)
+        self.assertEqual(self.generator.load_response_cache(None), 0)
+        path = os.path.join(self.tmp.name, "roto.json")
+        with open(path, "w") as f:
+            f.write("{no es json")
+        self.assertEqual(self.generator.load_response_cache(path), 0)
+        self.assertEqual(self.generator.response_cache, {})
+
+    def test_refresh_reloads_only_when_file_changes(self):
+        path = self._write_answers({"¿Quién es Rick?": "Un genio"})
+        self.assertEqual(self.generator.refresh_response_cache(path), 1)
+        self.assertEqual(self.generator.refresh_response_cache(path), 0)
+
+        self._write_answers({"¿Quién es Rick?": "Un genio", "¿Quién es Morty?": "Su nieto"})
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+        self.assertEqual(self.generator.refresh_response_cache(path), 2)
+        self.assertEqual(self.generator.response_cache[("rick_morty@0", Generator.cache_key("quién es morty"))], "Su nieto")
+
+    async def test_answers_are_only_served_for_their_index(self):
+        async def answer(query, context, language, history=""):
+            return "respuesta nueva", "modelo"
+
+        self.generator.generate_text = answer
+        path = self._write_answers({"¿Quién es Rick?": "Un genio"}, index="rick_morty_v1@0")
+        with mock.patch.object(settings, "RESPONSE_CACHE_PATH", path):
+            text, _, model = await self.generator.generate_response("¿Quién es Rick?", [], index="rick_morty_v1@0")
+            self.assertEqual((text, model), ("Un genio", "cache"))
+
+            # Tras un reindexado (u otra generación) la respuesta guardada no se usa
+            text, _, model = await self.generator.generate_response("¿Quién es Rick?", [], index="rick_morty_v2@0")
+            self.assertEqual((text, model), ("respuesta nueva", "modelo"))
+            self.assertEqual(set(key[0] for key in self.generator.response_cache), {"rick_morty_v2@0"})
+
+            text, _, model = await self.generator.generate_response("¿Quién es Rick?", [], index="rick_morty_v2@0")
+            self.assertEqual((text, model), ("respuesta nueva", "cache"))
+
+class TestConversationHistory(GeneratorTestCase):
+    def _add_messages(self, conversation_id, count, content="mensaje"):
+        for i in range(count):
+            role = 'user' if i % 2 == 0 else 'assistant'
+            self.generator.conversation_manager.add_message(conversation_id, role, f"{content} {i}")
+
+    def test_long_messages_are_truncated(self):
+        line = self.generator._format_message({'role': 'user', 'content': "a  b\n" + "x" * 1000})
+        limit = settings.HISTORY_MESSAGE_MAX_CHARS
+        self.assertTrue(line.startswith("Usuario: a b "))
+        self.assertEqual(len(line), len("Usuario: ") + limit + len("..."))
+
+    def test_history_keeps_summary_and_recent_window(self):
+        self._add_messages("c1", 10)
+        self.generator.conversation_manager.set_summary("c1", "resumen previo", 6)
+
+        lines = self.generator._build_history("c1").splitlines()
+        self.assertEqual(lines[0], "Resumen: resumen previo")
+        self.assertEqual(len(lines), 1 + settings.HISTORY_RECENT_MESSAGES)
+        self.assertTrue(lines[-1].endswith("mensaje 9"))
+
+    def test_history_keeps_messages_the_summary_has_not_caught_up_with(self):
+        recent = settings.HISTORY_RECENT_MESSAGES
+        self._add_messages("c1", recent + 3)
+        # El resumen en segundo plano todavía no incorporó los mensajes 1 y 2
+        self.generator.conversation_manager.set_summary("c1", "resumen previo", 1)
+
+        lines = self.generator._build_history("c1").splitlines()
+        self.assertEqual(lines[0], "Resumen: resumen previo")
+        self.assertEqual(len(lines), 1 + 2 + recent)
+        self.assertTrue(lines[1].endswith("mensaje 1"))
+        self.assertTrue(lines[-1].endswith(f"mensaje {recent + 2}"))
+
+    def test_unsummarized_messages_are_capped(self):
+        recent = settings.HISTORY_RECENT_MESSAGES
+        with mock.patch.object(settings, "HISTORY_UNSUMMARIZED_MAX_MESSAGES", 2):
+            self._add_messages("c1", recent + 10)
+            lines = self.generator._build_history("c1").splitlines()
+        # Sin resumen todavía: los 2 mensajes pendientes más nuevos y la ventana reciente
+        self.assertEqual(len(lines), 2 + recent)
+        self.assertTrue(lines[0].endswith("mensaje 8"))
+        self.assertTrue(lines[-1].endswith(f"mensaje {recent + 9}"))
+
+    def test_new_conversation_has_no_history(self):
+        self.assertEqual(self.generator._build_history("nueva"), "")
+
+    async def test_summary_folds_only_evicted_messages(self):
+        recent = settings.HISTORY_RECENT_MESSAGES
+        self._add_messages("c1", recent)
+        await self.generator._update_summary("c1")
+        self.assertEqual(self.model.calls, [])
+
+        self._add_messages("c1", 2, content="nuevo")
+        await self.generator._update_summary("c1")
+        summary = self.generator.conversation_manager.get_summary("c1")
+        self.assertEqual(summary['covers'], 2)
+        self.assertEqual(summary['text'], "resumen")
+        prompt = self.model.calls[0][1]
+        self.assertIn("mensaje 0", prompt)
+        self.assertNotIn("nuevo 1", prompt)
+
+    async def test_summary_is_capped(self):
+        self.model.reply = "z" * (settings.HISTORY_SUMMARY_MAX_CHARS * 2)
+        text = await self.generator._summarize("", ["Usuario: hola"])
+        self.assertEqual(len(text), settings.HISTORY_SUMMARY_MAX_CHARS)
+
+    async def test_summary_fallback_keeps_most_recent_text(self):
+        self.model.fail = True
+        messages = [f"Usuario: {'y' * 200} {i}" for i in range(10)]
+        text = await self.generator._summarize("previo", messages)
+        self.assertEqual(len(text), settings.HISTORY_SUMMARY_MAX_CHARS)
+        self.assertTrue(text.endswith(" 9"))
+
+class TestSummaryInBackground(GeneratorTestCase):
+    async def test_response_does_not_wait_for_summary(self):
+        release = asyncio.Event()
+
+        async def slow_summary(model, prompt, **kwargs):
+            await release.wait()
+            return "resumen"
+
+        async def answer(query, context, language, history=""):
+            return "respuesta", "modelo"
+
+        self.generator._call_model = slow_summary
+        self.generator.generate_text = answer
+        for i in range(settings.HISTORY_RECENT_MESSAGES):
+            self.generator.conversation_manager.add_message("c1", 'user', f"pregunta {i}")
+
+        text, conversation_id, model = await self.generator.generate_response("¿Quién es Rick?", [], "c1")
+        self.assertEqual((text, model), ("respuesta", "modelo"))
+        task = self.generator.summary_tasks["c1"]
+        self.assertFalse(task.done())
+
+        release.set()
+        await task
+        self.assertEqual(self.generator.conversation_manager.get_summary("c1")['covers'], 2)
+
+    async def test_error_path_updates_summary(self):
+        async def broken(query, context, language, history=""):
+            raise RuntimeError("sin modelo")
+
+        self.generator.generate_text = broken
+        for i in range(settings.HISTORY_RECENT_MESSAGES):
+            self.generator.conversation_manager.add_message("c1", 'user', f"pregunta {i}")
+
+        text, _, model = await self.generator.generate_response("¿Quién es Rick Sanchez?", [], "c1")
+        self.assertIsNone(model)
+        self.assertIn("Wubba Lubba Dub Dub", text)
+        await self.generator.summary_tasks["c1"]
+        self.assertEqual(self.generator.conversation_manager.get_summary("c1")['covers'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+import numpy as np
+from src.modules import index_snapshot
+from src.modules.index_snapshot import EMBEDDINGS_MEMBER, MANIFEST_MEMBER, RELATIONS_MEMBER, export_snapshot, import_snapshot, load_snapshot
+from src.modules.relation_graph import RelationGraph
+from tests.test_relation_graph import DATA
+
+class FakeCollection:
+    """
+    Minimal in-memory stand-in for a Chroma collection (count, get, upsert).
+    """
+    def __init__(self, name, ids=(), embeddings=(), documents=(), metadatas=()):
+        self.name = name
+        self.ids = list(ids)
+        self.embeddings = [list(map(float, vector)) for vector in embeddings]
+        self.documents = list(documents)
+        self.metadatas = list(metadatas)
+
+    def count(self):
+        return len(self.ids)
+
+    def get(self, limit, offset, include):
+        end = offset + limit
+        return {
+            "ids": self.ids[offset:end],
+            "embeddings": self.embeddings[offset:end],
+            "documents": self.documents[offset:end],
+            "metadatas": self.metadatas[offset:end]
+        }
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.ids += ids
+        self.embeddings += embeddings
+        self.documents += documents
+        self.metadatas += metadatas
+
+def _collection(name, doc_type, count, dim=4):
+    rng = np.random.default_rng(count)
+    return FakeCollection(
+        name,
+        ids=[f"{doc_type}_{i}" for i in range(count)],
+        embeddings=rng.random((count, dim)),
+        documents=[f"{doc_type} {i}" for i in range(count)],
+        metadatas=[{"type": doc_type, "name": f"{doc_type} {i}"} for i in range(count)]
+    )
+
+class TestIndexSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "index.snapshot")
+        self.collections = [_collection("rick_morty_episodes", "episode", 5), _collection("rick_morty_characters", "character", 3)]
+        self.graph = RelationGraph.from_api_data(DATA)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _rewrite_member(self, member, data):
+        # Reescribe el zip reemplazando un miembro, sin tocar el resto
+        with zipfile.ZipFile(self.path) as zf:
+            members = {info.filename: zf.read(info.filename) for info in zf.infolist()}
+        members[member] = data
+        with zipfile.ZipFile(self.path, "w", compression=zipfile.ZIP_STORED) as zf:
+            for name, content in members.items():
+                zf.writestr(name, content)
+
+    def test_round_trip_with_relations(self):
+        manifest = export_snapshot(self.collections, self.path, "model-a", dtype="float32", page_size=2,
+                                   name="rick_morty", relations=self.graph)
+        self.assertEqual(manifest["count"], 8)
+        self.assertTrue(manifest["relations"])
+
+        snapshot = load_snapshot(self.path, model_id="model-a")
+        target = FakeCollection("restored")
+        self.assertEqual(import_snapshot(snapshot, target, batch_size=3), 8)
+        self.assertEqual(target.ids, self.collections[0].ids + self.collections[1].ids)
+        self.assertEqual(target.metadatas[5], {"type": "character", "name": "character 0"})
+        np.testing.assert_allclose(target.embeddings, self.collections[0].embeddings + self.collections[1].embeddings, rtol=1e-6)
+
+        relations = snapshot.relations
+        self.assertIsNotNone(relations)
+        np.testing.assert_array_equal(relations.char_ids, self.graph.char_ids)
+        np.testing.assert_array_equal(relations.ep_characters, self.graph.ep_characters)
+        self.assertEqual(list(relations.ep_names), list(self.graph.ep_names))
+
+    def test_snapshot_without_relations(self):
+        manifest = export_snapshot(self.collections, self.path, "model-a")
+        self.assertFalse(manifest["relations"])
+        self.assertIsNone(load_snapshot(self.path).relations)
+
+    def test_model_id_mismatch(self):
+        export_snapshot(self.collections, self.path, "model-a", relations=self.graph)
+        with self.assertRaisesRegex(ValueError, "model-a"):
+            load_snapshot(self.path, model_id="model-b")
+
+    def test_checksum_covers_relations(self):
+        export_snapshot(self.collections, self.path, "model-a", relations=self.graph)
+        other = RelationGraph.from_api_data({"characters": DATA["characters"][:2], "episodes": DATA["episodes"]})
+        self._rewrite_member(RELATIONS_MEMBER, other.to_bytes())
+        with self.assertRaisesRegex(ValueError, "Checksum"):
+            load_snapshot(self.path)
+        self.assertIsNotNone(load_snapshot(self.path, verify=False).relations)
+
+    def test_checksum_mismatch(self):
+        export_snapshot(self.collections, self.path, "model-a", relations=self.graph)
+        with zipfile.ZipFile(self.path) as zf:
+            manifest = json.loads(zf.read(MANIFEST_MEMBER))
+        manifest["checksum"] = "sha256:" + "0" * 64
+        self._rewrite_member(MANIFEST_MEMBER, json.dumps(manifest).encode())
+        with self.assertRaisesRegex(ValueError, "Checksum"):
+            load_snapshot(self.path)
+
+    def test_checksum_is_verified_in_blocks(self):
+        export_snapshot(self.collections, self.path, "model-a", dtype="float32", relations=self.graph)
+        # Bloques de menos de una fila: se verifica de a una fila
+        with mock.patch.object(index_snapshot, "CHECKSUM_BLOCK_BYTES", 1):
+            self.assertEqual(len(load_snapshot(self.path)), 8)
+
+            with zipfile.ZipFile(self.path) as zf:
+                embeddings = np.load(zf.open(EMBEDDINGS_MEMBER))
+            embeddings[-1, -1] += 1
+            buffer = io.BytesIO()
+            np.save(buffer, embeddings)
+            self._rewrite_member(EMBEDDINGS_MEMBER, buffer.getvalue())
+            with self.assertRaisesRegex(ValueError, "Checksum"):
+                load_snapshot(self.path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import os
+import unittest
+from unittest import mock
+from src.config.settings import get_settings
+from src.migrate_collections import migrate_collections
+from src.modules.data_loader import DataLoader
+from src.modules.reindex import ReindexManager
+from src.modules.retriever import DOCUMENT_TYPES
+from src.modules.rick_morty_api import RickMortyAPI, transcript_title
+from src.utils.preprocessor import TextPreprocessor
+from tests.test_reindex import HashEmbedding, RetrieverTestCase, api_data
+
+settings = get_settings()
+
+TRANSCRIPT = "\n".join(f"Rick: línea {i} del episodio, Morty." for i in range(200))
+
+class TestChunkText(unittest.TestCase):
+    def test_chunks_are_bounded_and_cover_the_text(self):
+        chunks = list(TextPreprocessor.chunk_text(TRANSCRIPT, 300, 50))
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) <= 300 for chunk in chunks))
+        for line in TRANSCRIPT.splitlines():
+            self.assertTrue(any(line in chunk for chunk in chunks), line)
+
+    def test_cuts_at_line_breaks(self):
+        for chunk in TextPreprocessor.chunk_text(TRANSCRIPT, 300, 0):
+            self.assertTrue(chunk.startswith("Rick:"))
+            self.assertTrue(chunk.endswith("Morty."))
+
+    def test_short_and_empty_text(self):
+        self.assertEqual(list(TextPreprocessor.chunk_text("hola", 300, 50)), ["hola"])
+        self.assertEqual(list(TextPreprocessor.chunk_text("  \n ", 300, 50)), [])
+
+class TestTranscriptDocuments(unittest.TestCase):
+    def test_transcript_file_names_match_episodes(self):
+        self.assertEqual(transcript_title("PilotTranscript"), "Pilot")
+        self.assertEqual(transcript_title("Anatomy Park (episode)Transcript"), "Anatomy Park")
+
+    def test_episodes_with_transcript_emit_transcript_chunks(self):
+        data = api_data()
+        transcriptions = {"PilotTranscript": TRANSCRIPT, "Ricksy BusinessTranscript": "Rick: Wubba lubba dub dub"}
+        documents = list(RickMortyAPI().iter_documents_for_embedding(data, transcriptions))
+
+        episodes = {doc["metadata"]["name"]: doc for doc in documents if doc["metadata"]["type"] == "episode"}
+        self.assertTrue(episodes["Pilot"]["metadata"]["has_transcript"])
+        self.assertFalse(episodes["The Wedding Squanchers"]["metadata"]["has_transcript"])
+
+        transcripts = [doc for doc in documents if doc["metadata"]["type"] == "transcript"]
+        pilot = [doc for doc in transcripts if doc["metadata"]["name"] == "Pilot"]
+        self.assertGreater(len(pilot), 1)
+        self.assertEqual([doc["metadata"]["part"] for doc in pilot], list(range(len(pilot))))
+        self.assertTrue(all(doc["metadata"]["season"] == "S01" for doc in pilot))
+        self.assertEqual(len({doc["id"] for doc in documents}), len(documents))
+
+class TestIngestion(RetrieverTestCase):
+    def setUp(self):
+        super().setUp()
+        with open(os.path.join(self.tmp.name, "PilotTranscript.txt"), "w", encoding="utf-8") as f:
+            f.write(TRANSCRIPT)
+
+    def test_ingestion_fills_every_collection(self):
+        transcriptions = DataLoader(self.tmp.name, self.tmp.name).transcript_index()
+        documents = RickMortyAPI().iter_documents_for_embedding(api_data(), transcriptions)
+        for batch in DataLoader.iter_batches(documents, 50):
+            self.retriever.add_documents(batch)
+
+        counts = {doc_type: collection.count() for doc_type, collection in self.retriever.collections.items()}
+        self.assertEqual(set(counts), set(DOCUMENT_TYPES))
+        self.assertTrue(all(count > 0 for count in counts.values()), counts)
+
+        results = self.retriever.search("Rick: línea 10 del episodio")
+        self.assertIn("transcript", {meta["type"] for meta in results["metadatas"][0]})
+
+    async def test_reindex_fills_every_collection(self):
+        manager = ReindexManager(self.retriever)
+        manager.api.fetch_all_data = mock.AsyncMock(return_value=api_data())
+        manager.data_loader.transcripts_dir = self.tmp.name
+        job = await manager.start()
+        await manager._task
+        self.assertEqual(job.status, "completed", job.error)
+        self.assertTrue(all(job.counts[doc_type] > 0 for doc_type in DOCUMENT_TYPES), job.counts)
+        self.assertEqual(job.to_dict()["progress"], 1.0)
+
+class TestMigrateCollections(RetrieverTestCase):
+    def _legacy(self, count_by_type):
+        legacy = self.retriever.client.create_collection(name=settings.COLLECTION_NAME, embedding_function=HashEmbedding())
+        ids, texts, metadatas = [], [], []
+        for doc_type, count in count_by_type.items():
+            for i in range(count):
+                ids.append(f"{doc_type}_{i}")
+                texts.append(f"{doc_type} legado {i}")
+                metadatas.append({"type": doc_type, "name": f"{doc_type} {i}"})
+        legacy.add(ids=ids, documents=texts, metadatas=metadatas)
+        return legacy
+
+    def test_migrates_per_type_and_deletes_legacy(self):
+        self._legacy({"episode": 4, "character": 3, "transcript": 2})
+        self.assertEqual(migrate_collections(page_size=4), 9)
+        self.assertIsNone(self.retriever.legacy_collection())
+
+        self.retriever._activate(self.retriever.collection_name)
+        counts = {doc_type: collection.count() for doc_type, collection in self.retriever.collections.items()}
+        self.assertEqual(counts, {"episode": 4, "character": 3, "transcript": 2})
+
+        # En el siguiente arranque no hay nada que migrar ni versión que cambiar
+        generation = self.retriever.version.current()
+        self.assertEqual(migrate_collections(), 0)
+        self.assertEqual(self.retriever.version.current(), generation)
+
+    def test_missing_documents_of_one_type_fail_and_keep_legacy(self):
+        self._legacy({"episode": 2, "character": 2})
+        original = self.retriever.__class__.upsert
+
+        def drop_characters(retriever, ids, embeddings, documents, metadatas):
+            keep = [i for i, meta in enumerate(metadatas) if meta["type"] != "character"]
+            original(retriever, [ids[i] for i in keep], [embeddings[i] for i in keep],
+                     [documents[i] for i in keep], [metadatas[i] for i in keep])
+
+        with mock.patch.object(self.retriever.__class__, "upsert", drop_characters):
+            with self.assertRaisesRegex(RuntimeError, "character"):
+                migrate_collections()
+        self.assertIsNotNone(self.retriever.legacy_collection())
+
+    def test_versioned_set_is_not_mixed_with_legacy(self):
+        self._legacy({"episode": 2})
+        self._build_set("rick_morty_v1")
+        self.retriever.switch_to("rick_morty_v1")
+
+        self.assertEqual(migrate_collections(), 0)
+        self.retriever._activate("rick_morty_v1")
+        self.assertEqual(self.retriever.collections["episode"].count(), 1)
+        self.assertIsNotNone(self.retriever.legacy_collection())
+
+    def test_keep_legacy(self):
+        self._legacy({"episode": 1})
+        migrate_collections(delete_legacy=False)
+        self.assertIsNotNone(self.retriever.legacy_collection())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import asyncio
+import os
+import pstats
+import tempfile
+import time
+import unittest
+from src.utils.profiling import RequestProfiler
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+class TestRequestProfiler(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, "profiles")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_trigger(self):
+        profiler = RequestProfiler(self.directory, sample_rate=0.0)
+        self.assertTrue(profiler.should_profile("1"))
+        self.assertFalse(profiler.should_profile(None))
+        self.assertFalse(profiler.should_profile("0"))
+        self.assertTrue(RequestProfiler(self.directory, sample_rate=1.0).should_profile(None))
+        self.assertFalse(RequestProfiler(self.directory, enabled=False).should_profile("1"))
+
+    async def test_sample_mode_writes_collapsed_stacks(self):
+        profiler = RequestProfiler(self.directory, mode="sample", interval=0.001)
+        with profiler.profile("qa") as session:
+            await asyncio.sleep(0)
+            busy(0.05)
+
+        self.assertTrue(session.path.endswith(".folded"))
+        with open(session.path) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertGreater(int(count), 0)
+        self.assertTrue(any("busy" in line for line in lines))
+
+    async def test_cprofile_mode_writes_pstats(self):
+        profiler = RequestProfiler(self.directory, mode="cprofile")
+        with profiler.profile("qa") as session:
+            busy(0.01)
+
+        stats = pstats.Stats(session.path)
+        self.assertTrue(any(func[2] == "busy" for func in stats.stats))
+
+    def test_file_cap(self):
+        profiler = RequestProfiler(self.directory, max_files=2, mode="cprofile")
+        for _ in range(4):
+            with profiler.profile("qa"):
+                busy(0.001)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_one_profile_at_a_time(self):
+        profiler = RequestProfiler(self.directory, mode="cprofile")
+        with profiler.profile("outer") as outer:
+            with profiler.profile("inner") as inner:
+                busy(0.001)
+        self.assertIsNone(inner.path)
+        self.assertIsNotNone(outer.path)
+
+if __name__ == '__main__':
+    unittest.main()
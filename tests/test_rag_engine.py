@@ -0,0 +1,128 @@
+import unittest
+from unittest import mock
+from src.config.settings import get_settings
+from src.modules import rag_engine as rag_engine_module
+from src.modules.rag_engine import RAGEngine
+
+settings = get_settings()
+
+def _results(similarities, space="l2"):
+    """
+    Retriever results whose distances map back to the given cosine similarities.
+    """
+    if space == "l2":
+        distances = [2.0 - 2.0 * s for s in similarities]
+    else:
+        distances = [1.0 - s for s in similarities]
+    return {
+        "documents": [[f"doc {i}" for i in range(len(similarities))]],
+        "metadatas": [[{"type": "episode", "name": f"ep {i}"} for i in range(len(similarities))]],
+        "distances": [distances]
+    }
+
+class FakeRetriever:
+    def __init__(self, results, space="l2"):
+        self.results = results
+        self.relations = None
+        self.spaces = {"episode": space, "character": space, "transcript": space}
+
+    def index_version(self):
+        return "rick_morty@0"
+
+    async def asearch(self, question, n_results=None):
+        return self.results
+
+class FakeGenerator:
+    def __init__(self, history=False):
+        self.history = history
+        self.calls = []
+
+    def has_history(self, conversation_id):
+        return self.history
+
+    async def classified_response(self, question, conversation_id=None):
+        self.calls.append("classified")
+        return "Morty, esa información está clasificada", conversation_id or "c1", None
+
+    async def generate_response(self, question, context, conversation_id=None, index=None):
+        self.calls.append("generate")
+        return "respuesta", conversation_id or "c1", "modelo"
+
+def _engine(results=None, history=False):
+    # Sin Chroma ni Cohere: solo las piezas que usa process_query
+    engine = RAGEngine.__new__(RAGEngine)
+    engine.retriever = FakeRetriever(results or _results([]))
+    engine.generator = FakeGenerator(history)
+    return engine
+
+class TestConfidence(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(rag_engine_module.settings, CONFIDENCE_MIN_SIMILARITY=0.2,
+                                      CONFIDENCE_MAX_SIMILARITY=0.6, HNSW_SPACE="l2")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.engine = _engine()
+
+    def test_linear_mapping_between_thresholds(self):
+        self.assertEqual(self.engine._calculate_confidence(_results([0.2])), 0.0)
+        self.assertEqual(self.engine._calculate_confidence(_results([0.4])), 0.5)
+        self.assertEqual(self.engine._calculate_confidence(_results([0.6])), 1.0)
+
+    def test_mapping_is_clamped(self):
+        self.assertEqual(self.engine._calculate_confidence(_results([-0.5])), 0.0)
+        self.assertEqual(self.engine._calculate_confidence(_results([0.95])), 1.0)
+
+    def test_best_match_weighs_most(self):
+        # scores 1.0, 0.5, 0.0 (y un cuarto fuera del top 3): 0.7 * 1.0 + 0.3 * 0.5
+        confidence = self.engine._calculate_confidence(_results([0.4, 0.6, 0.2, 0.6]))
+        self.assertAlmostEqual(confidence, round(0.7 * 1.0 + 0.3 * (1.0 + 1.0 + 0.5) / 3, 2))
+        confidence = self.engine._calculate_confidence(_results([0.6, 0.4, 0.2]))
+        self.assertAlmostEqual(confidence, 0.85)
+
+    def test_same_similarity_in_every_space(self):
+        cosine_engine = _engine()
+        cosine_engine.retriever = FakeRetriever(None, space="cosine")
+        cosine = cosine_engine._calculate_confidence(_results([0.5, 0.3], space="cosine"))
+        self.assertEqual(cosine, self.engine._calculate_confidence(_results([0.5, 0.3])))
+
+    def test_uses_the_space_stored_in_each_collection(self):
+        # La configuración dice l2 pero la colección de episodios se creó con cosine
+        self.engine.retriever.spaces["episode"] = "cosine"
+        self.assertEqual(self.engine._calculate_confidence(_results([0.4], space="cosine")), 0.5)
+
+    def test_no_results(self):
+        self.assertEqual(self.engine._calculate_confidence({"documents": [[]], "metadatas": [[]], "distances": [[]]}), 0.0)
+        self.assertEqual(self.engine._calculate_confidence({}), 0.0)
+
+    def test_missing_distances_use_heuristic(self):
+        results = _results([0.5, 0.5])
+        results["distances"] = None
+        self.assertEqual(self.engine._calculate_confidence(results), self.engine._heuristic_confidence(results))
+
+class TestClassifiedShortCircuit(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(rag_engine_module.settings, CONFIDENCE_MIN_SIMILARITY=0.2,
+                                      CONFIDENCE_MAX_SIMILARITY=0.6, CONFIDENCE_THRESHOLD=0.1, HNSW_SPACE="l2")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_low_confidence_skips_the_model(self):
+        engine = _engine(_results([0.1, 0.05]))
+        response = await engine.process_query("¿Quién es el presidente de Francia?")
+        self.assertEqual(engine.generator.calls, ["classified"])
+        self.assertEqual(response["confidence"], 0.0)
+        self.assertIsNone(response["model"])
+
+    async def test_confident_results_call_the_model(self):
+        engine = _engine(_results([0.55, 0.5]))
+        response = await engine.process_query("¿Quién es Rick?")
+        self.assertEqual(engine.generator.calls, ["generate"])
+        self.assertEqual(response["model"], "modelo")
+
+    async def test_history_disables_the_short_circuit(self):
+        engine = _engine(_results([0.1]), history=True)
+        await engine.process_query("¿y él quién es?", conversation_id="c1")
+        self.assertEqual(engine.generator.calls, ["generate"])
+
+if __name__ == '__main__':
+    unittest.main()
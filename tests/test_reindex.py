@@ -0,0 +1,342 @@
+import asyncio
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import numpy as np
+from chromadb.api.client import SharedSystemClient
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from src.api import main
+from src.config.settings import get_settings
+from src.modules.collection_alias import CollectionAlias
+from src.modules.reindex import ReindexLock, ReindexManager, reindex_batch_size
+from src.modules.relation_graph import RelationGraph
+from src.modules.retriever import Retriever
+from tests.test_relation_graph import DATA
+
+settings = get_settings()
+
+class HashEmbedding(EmbeddingFunction[Documents]):
+    """
+    Deterministic local embedding function: no model download needed.
+    """
+    def __call__(self, input: Documents) -> Embeddings:
+        vectors = []
+        for text in input:
+            seed = int.from_bytes(hashlib.md5(text.encode()).digest()[:4], "little")
+            vector = np.random.default_rng(seed).random(8)
+            vectors.append(vector / np.linalg.norm(vector))
+        return vectors
+
+def api_data():
+    """
+    DATA with the fields RickMortyAPI.iter_documents_for_embedding needs.
+    """
+    place = {"name": "Earth (C-137)"}
+    return {
+        "characters": [dict(char, species="Human", status="Alive", origin=place, location=place) for char in DATA["characters"]],
+        "episodes": [dict(ep, air_date="December 2, 2013", characters=[]) for ep in DATA["episodes"]]
+    }
+
+class RetrieverTestCase(unittest.IsolatedAsyncioTestCase):
+    """
+    Runs each test in an empty working directory with its own Chroma store.
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        patcher = mock.patch("src.modules.retriever.create_embedding_function", HashEmbedding)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Sin precálculo de respuestas (llamaría al modelo) tras cada reindexado
+        patcher = mock.patch.object(settings, "WARM_CACHE", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.retriever = Retriever()
+
+    def tearDown(self):
+        self.retriever.executor.shutdown(wait=False)
+        # Chroma reutiliza el cliente por ruta ("chroma_db" es relativa)
+        SharedSystemClient.clear_system_cache()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def _build_set(self, name, graph=None):
+        collections = self.retriever.open_collections(name)
+        self.retriever.add_documents([
+            {"id": f"{name}_ep", "text": f"Episode of {name}", "metadata": {"type": "episode", "name": name}}
+        ], collections)
+        if graph is not None:
+            graph.save(self.retriever.relations_path_for(name))
+        return collections
+
+class TestVersionedRelations(RetrieverTestCase):
+    def test_relations_path_per_set(self):
+        self.assertEqual(self.retriever.relations_path_for(settings.COLLECTION_NAME), settings.RELATIONS_PATH)
+        self.assertEqual(self.retriever.relations_path_for("rick_morty_v2"), "chroma_db/relations_rick_morty_v2.npz")
+
+    def test_switch_and_rollback_swap_the_graph(self):
+        full = RelationGraph.from_api_data(DATA)
+        small = RelationGraph.from_api_data({"characters": DATA["characters"][:1], "episodes": DATA["episodes"]})
+        full.save(settings.RELATIONS_PATH)
+        self._build_set("rick_morty_v1", small)
+        self.retriever._activate(settings.COLLECTION_NAME)
+        self.assertEqual(len(self.retriever.relations.char_ids), len(full.char_ids))
+
+        self.retriever.switch_to("rick_morty_v1")
+        self.assertEqual(len(self.retriever.relations.char_ids), 1)
+
+        ReindexManager(self.retriever).rollback()
+        self.assertEqual(self.retriever.collection_name, settings.COLLECTION_NAME)
+        self.assertEqual(len(self.retriever.relations.char_ids), len(full.char_ids))
+
+    def test_set_without_graph_falls_back_to_unversioned(self):
+        RelationGraph.from_api_data(DATA).save(settings.RELATIONS_PATH)
+        self._build_set("rick_morty_v1")
+        self.retriever.switch_to("rick_morty_v1")
+        self.assertEqual(len(self.retriever.relations.char_ids), len(DATA["characters"]))
+
+    async def test_reindex_saves_graph_with_the_new_set(self):
+        manager = ReindexManager(self.retriever)
+        manager.api.fetch_all_data = mock.AsyncMock(return_value=api_data())
+        manager.data_loader.transcripts_dir = self.tmp.name
+
+        job = await manager.start()
+        await manager._task
+        self.assertEqual(job.status, "completed", job.error)
+        self.assertEqual(self.retriever.collection_name, "rick_morty_v1")
+        self.assertTrue(os.path.exists("chroma_db/relations_rick_morty_v1.npz"))
+        self.assertEqual(len(self.retriever.relations.char_ids), len(DATA["characters"]))
+
+        # Dos reindexados más: v1 se elimina junto con su grafo
+        for _ in range(2):
+            await manager.start()
+            await manager._task
+        self.assertEqual(self.retriever.collection_name, "rick_morty_v3")
+        self.assertFalse(os.path.exists("chroma_db/relations_rick_morty_v1.npz"))
+        self.assertTrue(os.path.exists("chroma_db/relations_rick_morty_v2.npz"))
+
+class TestWarmCacheAfterReindex(RetrieverTestCase):
+    async def test_completed_reindex_starts_a_warm_up(self):
+        manager = ReindexManager(self.retriever)
+        manager.api.fetch_all_data = mock.AsyncMock(return_value=api_data())
+        manager.data_loader.transcripts_dir = self.tmp.name
+        process = mock.Mock(returncode=None)
+        process.wait = mock.AsyncMock(return_value=0)
+        spawn = mock.AsyncMock(return_value=process)
+
+        with mock.patch.object(settings, "WARM_CACHE", True), \
+                mock.patch("src.modules.reindex.asyncio.create_subprocess_exec", spawn):
+            await manager.start()
+            await manager._task
+            await manager._warm_task
+        spawn.assert_awaited_once_with(sys.executable, "-m", "src.warm_cache")
+
+        # Un nuevo reindexado detiene el precálculo del conjunto anterior
+        with mock.patch.object(settings, "WARM_CACHE", True), \
+                mock.patch("src.modules.reindex.asyncio.create_subprocess_exec", spawn):
+            await manager.start()
+            await manager._task
+            await manager._warm_task
+        process.terminate.assert_called_once()
+
+    async def test_failed_reindex_does_not_warm(self):
+        manager = ReindexManager(self.retriever)
+        manager.api.fetch_all_data = mock.AsyncMock(side_effect=RuntimeError("API caída"))
+        manager.data_loader.has_local_data = lambda: False
+        with mock.patch.object(settings, "WARM_CACHE", True):
+            job = await manager.start()
+            await manager._task
+        self.assertEqual(job.status, "failed")
+        self.assertIsNone(manager._warm_task)
+
+class TestCollectionAlias(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "collection_alias.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_defaults_to_unversioned_set(self):
+        self.assertEqual(CollectionAlias(self.path, "rick_morty").state()["active"], "rick_morty")
+
+    def test_switch_and_rollback_are_seen_by_other_processes(self):
+        worker = CollectionAlias(self.path, "rick_morty")
+        admin = CollectionAlias(self.path, "rick_morty")
+        self.assertEqual(worker.active(), "rick_morty")
+
+        admin.switch("rick_morty_v1")
+        self.assertEqual(worker.state()["active"], "rick_morty_v1")
+        self.assertEqual(worker.state()["previous"], "rick_morty")
+
+        admin.rollback()
+        self.assertEqual((worker.active(), worker.state()["previous"]), ("rick_morty", "rick_morty_v1"))
+        with self.assertRaises(ValueError):
+            CollectionAlias(os.path.join(self.tmp.name, "otro.json"), "rick_morty").rollback()
+
+class TestSwitchAndRollback(RetrieverTestCase):
+    def _other_process_alias(self):
+        return CollectionAlias(settings.COLLECTION_ALIAS_PATH, settings.COLLECTION_NAME)
+
+    def _count_activations(self):
+        calls = []
+        original = self.retriever._activate
+
+        def activate(collection_set, create=False):
+            calls.append((collection_set, threading.current_thread() is threading.main_thread()))
+            return original(collection_set, create)
+
+        self.retriever._activate = activate
+        return calls
+
+    def test_switch_to_missing_set_fails_without_creating_it(self):
+        with self.assertRaisesRegex(ValueError, "rick_morty_v9"):
+            self.retriever.switch_to("rick_morty_v9")
+        self.assertEqual(self.retriever.collection_name, settings.COLLECTION_NAME)
+        self.assertEqual(self.retriever.alias.active(), settings.COLLECTION_NAME)
+        names = [c if isinstance(c, str) else c.name for c in self.retriever.client.list_collections()]
+        self.assertFalse(any(name.startswith("rick_morty_v9") for name in names))
+
+    async def test_alias_switch_is_followed_off_the_event_loop(self):
+        self._build_set("rick_morty_v1")
+        calls = self._count_activations()
+        self._other_process_alias().switch("rick_morty_v1")
+
+        results = await self.retriever.asearch("Episode of rick_morty_v1")
+        self.assertEqual(self.retriever.collection_name, "rick_morty_v1")
+        self.assertEqual(calls, [("rick_morty_v1", False)])
+        self.assertIn("rick_morty_v1", [meta.get("name") for meta in results["metadatas"][0]])
+
+        await self.retriever.asearch("Episode of rick_morty_v1")
+        self.assertEqual(len(calls), 1)
+
+    def test_concurrent_syncs_activate_once(self):
+        self._build_set("rick_morty_v1")
+        calls = self._count_activations()
+        self._other_process_alias().switch("rick_morty_v1")
+
+        threads = [threading.Thread(target=self.retriever._sync_alias) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([name for name, _ in calls], ["rick_morty_v1"])
+
+    async def test_alias_to_missing_set_keeps_serving(self):
+        self.retriever.add_documents([{"id": "ep_1", "text": "Pilot", "metadata": {"type": "episode", "name": "Pilot"}}])
+        calls = self._count_activations()
+        self._other_process_alias().switch("rick_morty_v9")
+
+        for _ in range(2):
+            results = await self.retriever.asearch("Pilot")
+            self.assertEqual(results["metadatas"][0][0]["name"], "Pilot")
+        self.assertEqual(self.retriever.collection_name, settings.COLLECTION_NAME)
+        self.assertEqual(len(calls), 1)
+
+    def test_rollback_to_deleted_set_fails(self):
+        self._build_set("rick_morty_v1")
+        self.retriever.switch_to("rick_morty_v1")
+        manager = ReindexManager(self.retriever)
+        manager._drop_set(settings.COLLECTION_NAME)
+
+        with self.assertRaises(ValueError):
+            manager.rollback()
+        self.assertEqual(self.retriever.collection_name, "rick_morty_v1")
+        self.assertEqual(self.retriever.alias.active(), "rick_morty_v1")
+        self.assertIsNone(manager.lock.holder())
+
+    async def test_rollback_endpoint_runs_off_the_event_loop(self):
+        self._build_set("rick_morty_v1")
+        self.retriever.switch_to("rick_morty_v1")
+        calls = self._count_activations()
+        engine = mock.Mock(reindexer=ReindexManager(self.retriever))
+        with mock.patch.object(main, "rag_engine", engine):
+            state = await main.rollback_collections()
+        self.assertEqual(state["active"], settings.COLLECTION_NAME)
+        self.assertEqual(calls, [(settings.COLLECTION_NAME, False)])
+
+class TestReindexLock(RetrieverTestCase):
+    def _write_lock(self, pid):
+        with open(settings.REINDEX_LOCK_PATH, "w") as f:
+            json.dump({"pid": pid, "owner": "job-de-otro-worker"}, f)
+
+    def _dead_pid(self):
+        process = subprocess.Popen([sys.executable, "-c", "pass"])
+        process.wait()
+        return process.pid
+
+    async def test_another_worker_blocks_reindex_and_rollback(self):
+        self._build_set("rick_morty_v1")
+        self.retriever.switch_to("rick_morty_v1")
+        self._write_lock(os.getppid())
+        manager = ReindexManager(self.retriever)
+
+        with self.assertRaisesRegex(RuntimeError, "job-de-otro-worker"):
+            await manager.start()
+        with self.assertRaisesRegex(RuntimeError, "job-de-otro-worker"):
+            manager.rollback()
+        self.assertEqual(self.retriever.collection_name, "rick_morty_v1")
+        self.assertTrue(os.path.exists(settings.REINDEX_LOCK_PATH))
+
+    def test_lock_of_a_dead_process_is_taken_over(self):
+        self._build_set("rick_morty_v1")
+        self.retriever.switch_to("rick_morty_v1")
+        self._write_lock(self._dead_pid())
+
+        ReindexManager(self.retriever).rollback()
+        self.assertEqual(self.retriever.collection_name, settings.COLLECTION_NAME)
+        self.assertFalse(os.path.exists(settings.REINDEX_LOCK_PATH))
+
+    async def test_reindex_holds_the_lock_until_it_finishes(self):
+        manager = ReindexManager(self.retriever)
+        manager.api.fetch_all_data = mock.AsyncMock(return_value=api_data())
+        manager.data_loader.transcripts_dir = self.tmp.name
+        other_worker = ReindexManager(self.retriever)
+
+        job = await manager.start()
+        self.assertEqual(manager.lock.holder()["pid"], os.getpid())
+        self.assertFalse(other_worker.lock.acquire("rollback"))
+        await manager._task
+        self.assertEqual(job.status, "completed", job.error)
+        self.assertIsNone(other_worker.lock.holder())
+
+    async def test_concurrent_starts_build_one_set(self):
+        manager = ReindexManager(self.retriever)
+        manager.api.fetch_all_data = mock.AsyncMock(return_value=api_data())
+        manager.data_loader.transcripts_dir = self.tmp.name
+
+        results = await asyncio.gather(manager.start(), manager.start(), return_exceptions=True)
+        self.assertEqual(sum(isinstance(result, RuntimeError) for result in results), 1, results)
+        await manager._task
+        self.assertEqual(self.retriever.collection_name, "rick_morty_v1")
+
+    def test_lock_is_exclusive(self):
+        first, second = ReindexLock(settings.REINDEX_LOCK_PATH), ReindexLock(settings.REINDEX_LOCK_PATH)
+        self.assertTrue(first.acquire("a"))
+        self.assertFalse(second.acquire("b"))
+        second.release()
+        self.assertTrue(os.path.exists(settings.REINDEX_LOCK_PATH))
+        first.release()
+        self.assertTrue(second.acquire("b"))
+        second.release()
+
+class TestReindexBatchSize(unittest.TestCase):
+    def test_server_batches_leave_room_for_queries(self):
+        with mock.patch.object(settings, "REINDEX_BATCH_SIZE", 100), \
+                mock.patch.object(settings, "EMBEDDING_BATCH_MAX_SIZE", 64):
+            with mock.patch.object(settings, "EMBEDDING_BACKEND", "local"):
+                self.assertEqual(reindex_batch_size(), 100)
+            with mock.patch.object(settings, "EMBEDDING_BACKEND", "server"):
+                self.assertEqual(reindex_batch_size(), 32)
+                with mock.patch.object(settings, "EMBEDDING_BATCH_MAX_SIZE", 1):
+                    self.assertEqual(reindex_batch_size(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
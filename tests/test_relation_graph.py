@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from src.modules.relation_graph import RelationGraph
+
+API = "https://rickandmortyapi.com/api"
+
+def _character(char_id, name, episodes):
+    return {"id": char_id, "name": name, "episode": [f"{API}/episode/{ep}" for ep in episodes]}
+
+def _episode(ep_id, name, code):
+    return {"id": ep_id, "name": name, "episode": code}
+
+DATA = {
+    "characters": [
+        _character(1, "Rick Sanchez", [1, 2, 3]),
+        _character(2, "Morty Smith", [1, 2, 3]),
+        _character(47, "Birdperson", [2, 3]),
+        _character(331, "Squanchy", [3]),
+        _character(500, "Rick D. Sanchez III", [2]),
+    ],
+    "episodes": [
+        _episode(1, "Pilot", "S01E01"),
+        _episode(2, "Ricksy Business", "S01E11"),
+        _episode(3, "The Wedding Squanchers", "S02E10"),
+    ],
+}
+
+class TestRelationGraph(unittest.TestCase):
+    def setUp(self):
+        self.graph = RelationGraph.from_api_data(DATA)
+
+    def _char(self, name):
+        return list(self.graph.char_names).index(name)
+
+    def test_adjacency_is_symmetric(self):
+        birdperson = self._char("Birdperson")
+        episodes = [self.graph.ep_codes[e] for e in self.graph.episodes_of(birdperson)]
+        self.assertEqual(episodes, ["S01E11", "S02E10"])
+        for ep_row in self.graph.episodes_of(birdperson):
+            self.assertIn(birdperson, self.graph.characters_in(ep_row))
+        self.assertEqual(len(self.graph.characters_in(2)), 4)
+
+    def test_co_appearances(self):
+        partners = dict(self.graph.co_appearances(self._char("Squanchy")))
+        self.assertEqual(partners[self._char("Rick Sanchez")], 1)
+        self.assertNotIn(self._char("Squanchy"), partners)
+
+    def test_find_characters_prefers_full_names(self):
+        self.assertEqual(self.graph.find_characters("¿Quién es Rick Sanchez?"), [self._char("Rick Sanchez")])
+        self.assertEqual(self.graph.find_characters("Rick y birdperson"),
+                         [self._char("Birdperson"), self._char("Rick Sanchez")])
+        self.assertEqual(self.graph.find_characters("rick sanchez"), [self._char("Rick Sanchez")])
+
+    def test_facts_for_relational_questions(self):
+        facts = self.graph.facts_for("¿En qué episodios aparece Birdperson?")
+        self.assertEqual(len(facts), 1)
+        self.assertIn("2 episodios", facts[0])
+        self.assertIn("S02E10", facts[0])
+        self.assertTrue(self.graph.facts_for("¿Con quién aparece Squanchy?"))
+        self.assertTrue(self.graph.facts_for("¿Qué personajes salen en Pilot?"))
+        self.assertEqual(self.graph.facts_for("¿Qué es un Plumbus?"), [])
+
+    def test_builds_from_single_pass_iterators_in_any_order(self):
+        streamed = RelationGraph.from_api_data({
+            "characters": iter(reversed(DATA["characters"])),
+            "episodes": iter(reversed(DATA["episodes"])),
+        })
+        for name in ("char_ids", "char_names", "ep_ids", "ep_codes", "char_offsets", "char_episodes",
+                     "ep_offsets", "ep_characters"):
+            self.assertEqual(getattr(streamed, name).tolist(), getattr(self.graph, name).tolist(), name)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "relations.npz")
+            self.graph.save(path)
+            loaded = RelationGraph.load(path)
+        self.assertEqual(loaded.facts_for("which episodes does Birdperson appear in"),
+                         self.graph.facts_for("which episodes does Birdperson appear in"))
+        self.assertIsNone(RelationGraph.load(os.path.join(tmp, "missing.npz")))
+
+class TestFirstNames(unittest.TestCase):
+    def setUp(self):
+        data = {
+            "characters": DATA["characters"] + [
+                _character(6, "Alien Googah", [1]),
+                _character(4, "Summer Smith", [1, 2, 3]),
+                _character(380, "King Jellybean", [2]),
+                _character(600, "Alien", [3]),
+            ],
+            "episodes": DATA["episodes"]
+        }
+        self.graph = RelationGraph.from_api_data(data)
+
+    def _char(self, name):
+        return list(self.graph.char_names).index(name)
+
+    def test_common_words_are_not_names(self):
+        self.assertEqual(self.graph.facts_for("¿En qué episodios aparece un alien?"), [])
+        self.assertEqual(self.graph.facts_for("What episodes air in summer?"), [])
+        self.assertEqual(self.graph.facts_for("Which episodes have a king?"), [])
+        # Ni con mayúscula: "King" o "Alien" solos no identifican a nadie
+        self.assertEqual(self.graph.find_characters("Which episodes have a King?"), [])
+
+    def test_capitalized_first_names_and_full_names(self):
+        self.assertEqual(self.graph.find_characters("¿En qué episodios aparece Summer?"), [self._char("Summer Smith")])
+        self.assertEqual(self.graph.find_characters("which episodes have king jellybean"), [self._char("King Jellybean")])
+        self.assertEqual(self.graph.find_characters("¿Qué hace Alien Googah?"), [self._char("Alien Googah")])
+        # Un personaje llamado solo como una palabra común necesita la mayúscula
+        self.assertEqual(self.graph.find_characters("¿Dónde sale Alien?"), [self._char("Alien")])
+        self.assertTrue(self.graph.facts_for("¿En qué episodios aparece Summer?")[0].startswith("Summer Smith aparece en 3"))
+
+if __name__ == '__main__':
+    unittest.main()
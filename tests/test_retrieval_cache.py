@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from src.modules.retrieval_cache import CollectionVersion, LRUCache, normalize_query, search_cache_key
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats()["size"], 2)
+
+    def test_disabled_cache(self):
+        cache = LRUCache(0)
+        cache.put("a", 1)
+        self.assertIsNone(cache.get("a"))
+
+    def test_values_are_copied(self):
+        cache = LRUCache(4)
+        stored = {"documents": [["Rick"]], "embeddings": [np.ones(3)]}
+        cache.put("q", stored)
+        stored["documents"][0].append("modificado después de guardar")
+
+        first = cache.get("q")
+        first["documents"][0].append("modificado por quien lo leyó")
+        first["embeddings"][0][0] = 99.0
+
+        second = cache.get("q")
+        self.assertEqual(second["documents"], [["Rick"]])
+        np.testing.assert_array_equal(second["embeddings"][0], np.ones(3))
+
+    def test_ttl_expires_entries(self):
+        cache = LRUCache(4, ttl=10)
+        with mock.patch("src.modules.retrieval_cache.time.monotonic", return_value=100.0):
+            cache.put("q", "resultado")
+        with mock.patch("src.modules.retrieval_cache.time.monotonic", return_value=109.0):
+            self.assertEqual(cache.get("q"), "resultado")
+        with mock.patch("src.modules.retrieval_cache.time.monotonic", return_value=110.5):
+            self.assertIsNone(cache.get("q"))
+        self.assertEqual(cache.stats()["size"], 0)
+        self.assertEqual((cache.stats()["hits"], cache.stats()["misses"]), (1, 1))
+
+    def test_no_ttl_by_default(self):
+        cache = LRUCache(4, ttl=0)
+        cache.put("q", "resultado")
+        with mock.patch("src.modules.retrieval_cache.time.monotonic", return_value=1e12):
+            self.assertEqual(cache.get("q"), "resultado")
+
+class TestCacheInvalidation(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "collection_version.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_version_change_misses_cached_results(self):
+        cache = LRUCache(8)
+        plan = {"episodes": {"type": "episode", "n_results": 5, "where": None}}
+        api_worker = CollectionVersion(self.path, "rick_morty")
+        ingestion = CollectionVersion(self.path, "rick_morty")
+
+        cache.put(search_cache_key("¿Quién es Rick?", plan, api_worker.current(), "rick_morty"), "viejo")
+        self.assertEqual(cache.get(search_cache_key("¿quién  es RICK?", plan, api_worker.current(), "rick_morty")), "viejo")
+
+        # Otro proceso modifica la colección: la generación cambia y la clave también
+        self.assertEqual(ingestion.bump(), 1)
+        self.assertEqual(api_worker.current(), 1)
+        self.assertIsNone(cache.get(search_cache_key("¿Quién es Rick?", plan, api_worker.current(), "rick_morty")))
+
+    def test_key_depends_on_collection_set_and_plan(self):
+        plan = {"episodes": {"type": "episode", "n_results": 5, "where": None}}
+        other_plan = {"episodes": {"type": "episode", "n_results": 5, "where": {"season": "S01"}}}
+        key = search_cache_key("rick", plan, 3, "rick_morty_v1")
+        self.assertNotEqual(key, search_cache_key("rick", plan, 3, "rick_morty_v2"))
+        self.assertNotEqual(key, search_cache_key("rick", other_plan, 3, "rick_morty_v1"))
+        self.assertEqual(normalize_query("  Quién   ES rick "), "quién es rick")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import asyncio
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+import unittest
+from unittest import mock
+from src.modules import retriever as retriever_module
+from tests.test_reindex import HashEmbedding, RetrieverTestCase
+
+class FakeBackend:
+    """
+    Search backend that answers after `delay` seconds, or fails.
+    """
+    def __init__(self, doc_type, delay=0.0, fail=False):
+        self.doc_type = doc_type
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def query(self, query_embeddings, n_results, where=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("backend caído")
+        return {
+            "ids": [[f"{self.doc_type}_1"]],
+            "documents": [[f"{self.doc_type} doc"]],
+            "metadatas": [[{"type": self.doc_type}]],
+            "distances": [[0.5]]
+        }
+
+    def invalidate(self):
+        pass
+
+class TestAsyncSearch(RetrieverTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(retriever_module.settings, "RETRIEVAL_QUERY_TIMEOUT", 0.1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _use_backends(self, **overrides):
+        self.retriever.backends = {
+            doc_type: overrides.get(doc_type, FakeBackend(doc_type))
+            for doc_type in retriever_module.DOCUMENT_TYPES
+        }
+
+    async def _wait_for_free_slots(self, slots, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            acquired = 0
+            while acquired < slots and self.retriever.admission.acquire(blocking=False):
+                acquired += 1
+            for _ in range(acquired):
+                self.retriever.admission.release()
+            if acquired == slots:
+                return
+            await asyncio.sleep(0.05)
+        self.fail("los hilos abandonados no liberaron el pool")
+
+    def _types(self, results):
+        return sorted(meta["type"] for meta in results["metadatas"][0])
+
+    async def test_all_subqueries_are_combined_and_cached(self):
+        self._use_backends()
+        results = await self.retriever.asearch("¿Quién es Rick?")
+        self.assertEqual(self._types(results), ["character", "episode", "transcript"])
+        await self.retriever.asearch("¿Quién es Rick?")
+        self.assertEqual(self.retriever.backends["episode"].calls, 1)
+
+    async def test_timed_out_subquery_is_dropped_and_not_cached(self):
+        self._use_backends(transcript=FakeBackend("transcript", delay=0.5))
+        started = time.perf_counter()
+        results = await self.retriever.asearch("¿Quién es Rick?")
+        self.assertLess(time.perf_counter() - started, 0.4)
+        self.assertEqual(self._types(results), ["character", "episode"])
+        self.assertEqual(self.retriever.search_cache.stats()["size"], 0)
+
+    async def test_failed_subquery_falls_back_to_the_others(self):
+        self._use_backends(character=FakeBackend("character", fail=True))
+        results = await self.retriever.asearch("¿Quién es Rick?")
+        self.assertEqual(self._types(results), ["episode", "transcript"])
+
+    async def test_pool_admission_counts_abandoned_threads(self):
+        self.retriever.admission = threading.BoundedSemaphore(2)
+        slow = {doc_type: FakeBackend(doc_type, delay=1.0) for doc_type in retriever_module.DOCUMENT_TYPES}
+        self._use_backends(**slow)
+
+        # 2 subconsultas admitidas (y abandonadas por timeout), la tercera rechazada
+        results = await self.retriever.asearch("¿Quién es Rick?")
+        self.assertEqual(results["documents"], [[]])
+        self.assertEqual(sum(backend.calls for backend in slow.values()), 2)
+
+        # Los hilos abandonados siguen ocupando el pool: se rechaza sin encolar
+        started = time.perf_counter()
+        results = await self.retriever.asearch("¿Quién es Morty?")
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(results["documents"], [[]])
+        self.assertEqual(sum(backend.calls for backend in slow.values()), 2)
+
+        # Al terminar, los lugares se liberan: con 2 lugares, al menos 2 de las 3
+        # subconsultas se admiten (la tercera depende de si alguna ya terminó)
+        await self._wait_for_free_slots(2)
+        self._use_backends()
+        results = await self.retriever.asearch("¿Quién es Morty?")
+        self.assertGreaterEqual(len(self._types(results)), 2)
+
+class TestStoredDistanceSpace(RetrieverTestCase):
+    def test_backends_use_the_space_stored_in_the_collection(self):
+        # Colecciones creadas con cosine y otros parámetros; la configuración dice l2
+        for doc_type in retriever_module.DOCUMENT_TYPES:
+            self.retriever.client.create_collection(
+                name=self.retriever.collection_name_for(doc_type, "rick_morty_v1"),
+                embedding_function=HashEmbedding(),
+                metadata={"hnsw:space": "cosine", "hnsw:M": 4}
+            )
+        output = io.StringIO()
+        with mock.patch.multiple(retriever_module.settings, HNSW_SPACE="l2", SEARCH_BACKEND="numpy"):
+            with contextlib.redirect_stdout(output):
+                self.retriever._activate("rick_morty_v1")
+
+        self.assertEqual(set(self.retriever.spaces.values()), {"cosine"})
+        self.assertEqual(self.retriever.backends["episode"].space, "cosine")
+        self.assertIn("hnsw:space=cosine (configurado l2)", output.getvalue())
+        self.assertIn("hnsw:M=4", output.getvalue())
+
+    def test_no_warning_when_configuration_matches(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.retriever._activate(self.retriever.collection_name)
+        self.assertNotIn("ADVERTENCIA", output.getvalue())
+        self.assertEqual(set(self.retriever.spaces.values()), {retriever_module.settings.HNSW_SPACE})
+
+# Escribe en chroma_db (directorio actual) desde otro proceso, como init_db o una importación
+WRITER = textwrap.dedent("""
+    import sys
+    from unittest import mock
+    sys.path.insert(0, sys.argv[1])
+    from tests.test_reindex import HashEmbedding
+    with mock.patch("src.modules.retriever.create_embedding_function", HashEmbedding):
+        from src.modules.retriever import Retriever
+        Retriever().add_documents([
+            {"id": "ep_2", "text": "Anatomy Park", "metadata": {"type": "episode", "name": "Anatomy Park"}}
+        ])
+""")
+
+class TestWritesFromAnotherProcess(RetrieverTestCase):
+    def _write_from_another_process(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        # Sin el .env del repositorio en el directorio de la prueba
+        env = dict(os.environ, COHERE_API_KEY=retriever_module.settings.COHERE_API_KEY)
+        subprocess.run([sys.executable, "-c", WRITER, root], check=True, capture_output=True, env=env)
+
+    async def _names(self, query):
+        results = await self.retriever.asearch(query)
+        return [meta["name"] for meta in results["metadatas"][0] if meta["type"] == "episode"]
+
+    async def test_documents_written_by_another_process_are_served(self):
+        for backend in ("chroma", "numpy"):
+            with self.subTest(backend=backend), mock.patch.object(retriever_module.settings, "SEARCH_BACKEND", backend):
+                self.retriever._activate(self.retriever.collection_name)
+                self.retriever.add_documents([
+                    {"id": "ep_1", "text": "Pilot", "metadata": {"type": "episode", "name": "Pilot"}}
+                ])
+                self.assertEqual(await self._names("Anatomy Park"), ["Pilot"])
+
+                self._write_from_another_process()
+                self.assertEqual((await self._names("Anatomy Park"))[0], "Anatomy Park")
+                self.assertEqual(self.retriever.collections["episode"].count(), 2)
+                self.retriever.collections["episode"].delete(ids=["ep_1", "ep_2"])
+                self.retriever.mark_modified()
+
+if __name__ == '__main__':
+    unittest.main()
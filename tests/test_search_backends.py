@@ -0,0 +1,114 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.modules.search_backends import NumpyBackend, create_backend, distance_to_similarity
+
+def _data(count=40, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = [f"doc_{i}" for i in range(count)]
+    documents = [f"documento {i}" for i in range(count)]
+    metadatas = [{"type": "episode", "season": f"S0{i % 3 + 1}"} for i in range(count)]
+    return ids, documents, metadatas, rng.standard_normal((count, dim)).astype(np.float32)
+
+class SlowCollection:
+    """
+    Chroma-like collection whose get() is slow and counted.
+    """
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+        self.ids, self.documents, self.metadatas, self.vectors = _data()
+
+    def get(self, include):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {"ids": self.ids, "documents": self.documents, "metadatas": self.metadatas, "embeddings": self.vectors}
+
+class TestNumpyBackend(unittest.TestCase):
+    def setUp(self):
+        self.ids, self.documents, self.metadatas, self.vectors = _data()
+        self.query = np.random.default_rng(1).standard_normal((2, 16)).astype(np.float32)
+
+    def _backend(self, dtype="float32", space="l2", chunk_rows=None):
+        backend = NumpyBackend(dtype=dtype, space=space)
+        if chunk_rows:
+            backend.SCORE_CHUNK_ROWS = chunk_rows
+        backend.set_data(self.ids, self.documents, self.metadatas, self.vectors)
+        return backend
+
+    def test_exact_ranking_and_l2_distances(self):
+        result = self._backend().query(self.query.tolist(), n_results=5)
+        vectors = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        queries = self.query / np.linalg.norm(self.query, axis=1, keepdims=True)
+        for row, query in enumerate(queries):
+            expected = np.argsort(-(vectors @ query))[:5]
+            self.assertEqual(result["ids"][row], [self.ids[i] for i in expected])
+            squared = ((vectors[expected] - query) ** 2).sum(axis=1)
+            np.testing.assert_allclose(result["distances"][row], squared, rtol=1e-5, atol=1e-6)
+
+    def test_float16_scored_in_chunks_matches_float32(self):
+        exact = self._backend().query(self.query.tolist(), n_results=10)
+        # 40 filas en bloques de 7: varios bloques y uno incompleto
+        compact = self._backend(dtype="float16", chunk_rows=7)
+        self.assertEqual(compact.embeddings.dtype, np.float16)
+        result = compact.query(self.query.tolist(), n_results=10)
+        self.assertEqual(result["ids"][0][:3], exact["ids"][0][:3])
+        np.testing.assert_allclose(result["distances"], exact["distances"], atol=2e-3)
+
+    def test_float16_matrix_is_kept_in_float16(self):
+        backend = self._backend(dtype="float16", chunk_rows=8)
+        matrix = backend.embeddings
+        backend.query(self.query.tolist(), n_results=3)
+        self.assertIs(backend.embeddings, matrix)
+        scores = backend._scores(self.query, matrix)
+        self.assertEqual(scores.dtype, np.float32)
+        self.assertEqual(scores.shape, (2, 40))
+
+    def test_cosine_space_and_similarity_mapping(self):
+        l2 = self._backend().query(self.query.tolist(), n_results=3)
+        cosine = self._backend(space="cosine").query(self.query.tolist(), n_results=3)
+        self.assertEqual(l2["ids"], cosine["ids"])
+        for d_l2, d_cos in zip(l2["distances"][0], cosine["distances"][0]):
+            self.assertAlmostEqual(distance_to_similarity(d_l2, "l2"), distance_to_similarity(d_cos, "cosine"), places=5)
+        with self.assertRaises(ValueError):
+            NumpyBackend(space="manhattan")
+
+    def test_filters(self):
+        backend = self._backend()
+        result = backend.query(self.query[:1].tolist(), n_results=50, where={"season": "S02"})
+        self.assertEqual(len(result["ids"][0]), 13)
+        self.assertTrue(all(meta["season"] == "S02" for meta in result["metadatas"][0]))
+        result = backend.query(self.query[:1].tolist(), n_results=5, where={"$and": [{"season": {"$eq": "S01"}}, {"type": "episode"}]})
+        self.assertTrue(all(meta["season"] == "S01" for meta in result["metadatas"][0]))
+        self.assertEqual(backend.query(self.query[:1].tolist(), n_results=5, where={"season": "S09"})["ids"], [[]])
+        with self.assertRaises(ValueError):
+            backend.query(self.query[:1].tolist(), n_results=5, where={"season": {"$gt": "S01"}})
+
+    def test_empty_collection(self):
+        backend = NumpyBackend()
+        backend.set_data([], [], [], np.zeros((0, 16), dtype=np.float32))
+        self.assertEqual(backend.query(self.query.tolist(), n_results=3)["ids"], [[], []])
+
+    def test_concurrent_queries_load_once(self):
+        collection = SlowCollection()
+        backend = create_backend("numpy", collection, "float16")
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: backend.query(self.query[:1].tolist(), n_results=3), range(16)))
+        self.assertEqual(collection.calls, 1)
+        self.assertTrue(all(result["ids"] == results[0]["ids"] for result in results))
+
+    def test_invalidate_during_load_reloads(self):
+        collection = SlowCollection(delay=0.2)
+        backend = NumpyBackend(collection)
+        loader = threading.Thread(target=backend.load)
+        loader.start()
+        time.sleep(0.05)
+        backend.invalidate()
+        loader.join()
+        self.assertEqual(backend.count(), 40)
+        self.assertEqual(collection.calls, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from src.modules.retriever import DOCUMENT_TYPES
+from src.modules.search_backends import ChromaBackend
+from src.tune_retrieval import build_index, evaluate, load_questions, report, run_sweep
+from tests.test_reindex import RetrieverTestCase
+
+def _corpus(dim=8):
+    """
+    Three documents per type, each with its own basis vector as embedding.
+    """
+    corpus = {}
+    axis = 0
+    for doc_type in DOCUMENT_TYPES:
+        data = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+        for i in range(3):
+            vector = np.zeros(dim)
+            vector[axis % dim] = 1.0
+            vector[(axis + 1) % dim] = 0.1
+            axis += 1
+            data["ids"].append(f"{doc_type}_{i}")
+            data["documents"].append(f"{doc_type} {i}")
+            data["metadatas"].append({"type": doc_type, "season": "S01"})
+            data["embeddings"].append(vector / np.linalg.norm(vector))
+        corpus[doc_type] = data
+    return corpus
+
+class TestTuneRetrieval(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_load_questions_skips_unlabelled(self):
+        path = os.path.join(self.tmp, "questions.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([{"question": "a", "relevant": ["ep_1"]}, {"question": "b", "relevant": []}, {"question": "c"}], f)
+        self.assertEqual([item["question"] for item in load_questions(path)], ["a"])
+
+    def test_bundled_questions_are_labelled(self):
+        questions = load_questions("src/data/eval/questions.json")
+        self.assertGreater(len(questions), 0)
+        self.assertTrue(all(item["relevant"] for item in questions))
+
+    def test_build_index_uses_the_requested_space(self):
+        params = {"hnsw:M": 8, "hnsw:construction_ef": 100, "hnsw:search_ef": 10}
+        collections, build_time, size = build_index(_corpus(), params, "cosine", os.path.join(self.tmp, "index"))
+        self.assertEqual(set(collections), set(DOCUMENT_TYPES))
+        self.assertEqual(collections["episode"].metadata["hnsw:space"], "cosine")
+        self.assertEqual(collections["episode"].metadata["hnsw:M"], 8)
+        self.assertEqual(collections["character"].count(), 3)
+        self.assertGreater(size, 0)
+
+    def test_evaluate_scores_recall_and_mrr(self):
+        corpus = _corpus()
+        collections, _, _ = build_index(corpus, {"hnsw:M": 8}, "l2", os.path.join(self.tmp, "index"))
+        backends = {doc_type: ChromaBackend(collections[doc_type]) for doc_type in DOCUMENT_TYPES}
+        questions = [
+            {"question": "¿Quién es Rick?", "relevant": ["character_1"]},
+            {"question": "¿Qué pasa en el piloto?", "relevant": ["episode_0", "transcript_2"]},
+        ]
+        embeddings = [list(corpus["character"]["embeddings"][1]), list(corpus["episode"]["embeddings"][0])]
+        counts = {"episode": 2, "character": 2, "transcript": 2}
+
+        metrics = evaluate(backends, questions, embeddings, counts, k=1)
+        self.assertEqual(metrics["mrr"], 1.0)
+        # La segunda pregunta solo encuentra uno de sus dos relevantes en el top 1
+        self.assertAlmostEqual(metrics["recall"], (1.0 + 0.5) / 2)
+        self.assertGreaterEqual(metrics["p95_ms"], metrics["p50_ms"])
+
+    def test_report_picks_fastest_passing_configuration(self):
+        rows = [
+            {"space": "l2", "M": 8, "construction_ef": 100, "search_ef": 10, "episode": 5, "character": 3, "transcript": 5,
+             "recall": 0.80, "mrr": 0.7, "p95_ms": 1.0},
+            {"space": "l2", "M": 16, "construction_ef": 200, "search_ef": 50, "episode": 5, "character": 3, "transcript": 5,
+             "recall": 0.95, "mrr": 0.9, "p95_ms": 2.0},
+            {"space": "cosine", "M": 32, "construction_ef": 200, "search_ef": 100, "episode": 5, "character": 3, "transcript": 5,
+             "recall": 0.97, "mrr": 0.9, "p95_ms": 3.0},
+        ]
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            report(rows, min_recall=0.9)
+            report(rows, min_recall=0.99)
+        text = output.getvalue()
+        self.assertIn("hnsw:M=16 hnsw:construction_ef=200 hnsw:search_ef=50", text)
+        self.assertIn("Ninguna configuración alcanza recall >= 0.99", text)
+
+class TestRunSweep(RetrieverTestCase):
+    def test_sweep_over_the_served_collections(self):
+        documents = [
+            {"id": f"ep_{i}", "text": f"Episode {i}", "metadata": {"type": "episode", "season": "S01"}} for i in range(3)
+        ] + [
+            {"id": f"char_{i}", "text": f"Character {i}", "metadata": {"type": "character"}} for i in range(3)
+        ] + [
+            {"id": f"tr_{i}", "text": f"Transcript {i}", "metadata": {"type": "transcript"}} for i in range(3)
+        ]
+        self.retriever.add_documents(documents)
+        with open("questions.json", "w", encoding="utf-8") as f:
+            json.dump([{"question": "Episode 1", "relevant": ["ep_1"]}, {"question": "Character 2", "relevant": ["char_2"]}], f)
+
+        args = argparse.Namespace(questions="questions.json", space=["l2", "cosine"], m=[8], construction_ef=[100],
+                                  search_ef=[10], episode_results=[1, 3], character_results=[1], transcript_results=[1], k=3)
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows = run_sweep(args)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual({row["space"] for row in rows}, {"l2", "cosine"})
+        # Con las mismas embeddings de la consulta y del documento, el relevante aparece primero
+        self.assertTrue(all(row["mrr"] == 1.0 for row in rows), rows)
+
+if __name__ == '__main__':
+    unittest.main()
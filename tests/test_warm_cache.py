@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from src import warm_cache as warm_cache_module
+from src.modules.generator import Generator
+from src.warm_cache import build_canonical_questions, mine_frequent_questions, warm_cache
+
+settings = warm_cache_module.settings
+
+DATA = {
+    "characters": [{"name": "Rick Sanchez"}, {"name": "Morty Smith"}, {"name": "Rick Sanchez"}],
+    "episodes": [
+        {"name": "Pilot", "episode": "S01E01"},
+        {"name": "The Rickshank Rickdemption", "episode": "S03E01"},
+        {"name": "Lawnmower Dog", "episode": "S01E02"}
+    ]
+}
+
+def _conversations():
+    return {
+        "c1": [
+            {"role": "user", "content": "¿Quién es Rick?"},
+            {"role": "assistant", "content": "¿Quién es Rick?"},
+            {"role": "user", "content": "¿Qué es la Ciudadela?"}
+        ],
+        "c2": [{"role": "user", "content": "quién es rick"}, {"role": "user", "content": "¿Qué es la ciudadela?"}],
+        "c3": [{"role": "user", "content": "  ¿QUIÉN ES RICK?? "}, {"role": "user", "content": "¿Y Morty?"}]
+    }
+
+class TestCanonicalQuestions(unittest.TestCase):
+    def test_characters_episodes_and_seasons(self):
+        questions = build_canonical_questions(DATA)
+        self.assertEqual(questions, [
+            "¿Quién es Rick Sanchez?",
+            "¿Quién es Morty Smith?",
+            "¿Qué sucede en el episodio Pilot?",
+            "¿Qué sucede en el episodio The Rickshank Rickdemption?",
+            "¿Qué sucede en el episodio Lawnmower Dog?",
+            "¿Qué episodios tiene la temporada 1?",
+            "¿Qué episodios tiene la temporada 3?"
+        ])
+
+    def test_empty_data(self):
+        self.assertEqual(build_canonical_questions({"characters": [], "episodes": []}), [])
+
+class TestMineFrequentQuestions(unittest.TestCase):
+    def test_counts_normalized_user_questions(self):
+        # Las variantes de "¿Quién es Rick?" cuentan juntas; las respuestas no cuentan
+        questions = mine_frequent_questions(_conversations(), min_frequency=2, limit=10)
+        self.assertEqual(questions, ["¿Quién es Rick?", "¿Qué es la Ciudadela?"])
+
+    def test_minimum_frequency_and_limit(self):
+        self.assertEqual(mine_frequent_questions(_conversations(), min_frequency=3, limit=10), ["¿Quién es Rick?"])
+        self.assertEqual(mine_frequent_questions(_conversations(), min_frequency=1, limit=1), ["¿Quién es Rick?"])
+        self.assertEqual(mine_frequent_questions({}, min_frequency=1, limit=10), [])
+
+class FakeEngine:
+    def __init__(self, index):
+        self.retriever = mock.Mock()
+        self.retriever.index_version.return_value = index
+        self.generator = mock.Mock()
+        self.generator.conversation_manager.get_all_conversations.return_value = _conversations()
+        self.questions = []
+
+    async def precompute_answer(self, question):
+        self.questions.append(question)
+        return f"respuesta a {question}"
+
+class TestWarmCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "response_cache.json")
+        for name, value in (("RESPONSE_CACHE_PATH", self.path), ("WARM_CACHE_REQUESTS_PER_MINUTE", 60000),
+                            ("WARM_CACHE_MIN_FREQUENCY", 2), ("WARM_CACHE_MAX_MINED", 10)):
+            patcher = mock.patch.object(settings, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.api = mock.Mock()
+        self.api.fetch_all_data = mock.AsyncMock(return_value=DATA)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def test_saves_answers_tagged_with_the_index(self):
+        engine = FakeEngine("rick_morty_v2@0")
+        await warm_cache(engine, self.api)
+
+        index, answers = Generator.read_response_cache(self.path)
+        self.assertEqual(index, "rick_morty_v2@0")
+        # Preguntas minadas primero; "¿Quién es Rick?" no se repite
+        self.assertEqual(engine.questions[:2], ["¿Quién es Rick?", "¿Qué es la Ciudadela?"])
+        self.assertEqual(len(answers), 2 + len(build_canonical_questions(DATA)))
+        self.assertEqual(answers["¿Quién es Rick Sanchez?"], "respuesta a ¿Quién es Rick Sanchez?")
+
+    async def test_resumes_with_the_same_index_and_discards_other_indexes(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"index": "rick_morty_v2@0", "answers": {"¿Quién es Morty Smith?": "guardada"}}, f)
+
+        engine = FakeEngine("rick_morty_v2@0")
+        await warm_cache(engine, self.api)
+        self.assertNotIn("¿Quién es Morty Smith?", engine.questions)
+        self.assertEqual(Generator.read_response_cache(self.path)[1]["¿Quién es Morty Smith?"], "guardada")
+
+        engine = FakeEngine("rick_morty_v3@0")
+        await warm_cache(engine, self.api)
+        self.assertIn("¿Quién es Morty Smith?", engine.questions)
+        index, answers = Generator.read_response_cache(self.path)
+        self.assertEqual(index, "rick_morty_v3@0")
+        self.assertNotEqual(answers["¿Quién es Morty Smith?"], "guardada")
+
+if __name__ == '__main__':
+    unittest.main()